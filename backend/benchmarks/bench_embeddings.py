@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import argparse
+import json
+from dictionary.nlp.languages import Lang
+from dictionary.nlp.embeddings import BACKEND_DIMS, get_backend
+
+# --------------------------------------------------------------------------------------------------
+# Usage (from backend/):
+#   python -m benchmarks.bench_embeddings --json filler_data/him_terms.json --backends spacy hashing
+# --------------------------------------------------------------------------------------------------
+
+
+def load_texts(path: str, lang: Lang, limit: int) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    key = "definition" if lang == Lang.Russian else "definition_translated"
+    texts = [e.get(key, "").strip() for e in entries]
+    return [text for text in texts if text][:limit]
+
+
+def main():
+    p = argparse.ArgumentParser(description="Compare embedding backends on throughput and memory")
+    p.add_argument("--json", required=True, help="Path to filler JSON file")
+    p.add_argument("--language", default="russian", choices=[lang.value for lang in Lang])
+    p.add_argument("--limit", type=int, default=2000, help="Number of descriptions")
+    p.add_argument("--backends", nargs="+", default=list(BACKEND_DIMS), choices=list(BACKEND_DIMS))
+    args = p.parse_args()
+
+    lang = Lang(args.language)
+    texts = load_texts(args.json, lang, args.limit)
+    print(f"{len(texts)} descriptions")
+    print(f"{'backend':<10}{'dim':>6}{'texts/s':>12}{'load s':>10}{'load MiB':>10}")
+
+    for name in args.backends:
+        backend = get_backend(name)
+        # warm up so model loading is reported separately from throughput
+        if backend.vectorize_batch(texts=texts[:1], lang=lang) is None:
+            print(f"{name:<10} unavailable")
+            continue
+        backend.texts, backend.seconds = 0, 0.0
+        backend.vectorize_batch(texts=texts, lang=lang)
+        report = backend.report()
+        print(
+            f"{name:<10}{report['dim']:>6}{report['texts_per_second'] or 0:>12.1f}"
+            f"{report['load_seconds']:>10.2f}{report['load_rss_bytes'] / 2**20:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import argparse
+import time
+import uuid
+from datetime import datetime
+from typing import List
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from dictionary.database.models import Terms
+from dictionary.misc.serialization import json_response
+from dictionary.nlp.languages import Lang
+from dictionary.views import Term, ProcessedTerm, TermsResponse, dump_term
+
+# --------------------------------------------------------------------------------------------------
+# Usage (from backend/):
+#   python -m benchmarks.bench_serialization --sizes 10 100 1000 10000
+# --------------------------------------------------------------------------------------------------
+
+
+def make_terms(n: int) -> List[Terms]:
+    topic_id = uuid.uuid4()
+    return [
+        Terms(
+            id=uuid.uuid4(),
+            topic_id=topic_id,
+            language="russian",
+            raw_text=f"хлорид натрия {i}",
+            cleaned_text=f"хлорид натрия {i}",
+            stemmed_text=f"хлорид натр {i}",
+            first_letter="х",
+            info=None,
+            created_at=datetime.now(),
+        )
+        for i in range(n)
+    ]
+
+
+def build_app(terms_objects: List[Terms]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/models", response_model=List[TermsResponse])
+    async def fetch_models():
+        return [
+            TermsResponse(
+                id=terms_object.id,
+                term=Term(
+                    topic_id=terms_object.topic_id,
+                    language=Lang(terms_object.language),
+                    raw_text=terms_object.raw_text,
+                    processed_text=ProcessedTerm(
+                        cleaned_text=terms_object.cleaned_text,
+                        stemmed_text=terms_object.stemmed_text,
+                        first_letter=terms_object.first_letter,
+                    ),
+                    info=terms_object.info,
+                ),
+                created_at=terms_object.created_at,
+            )
+            for terms_object in terms_objects
+        ]
+
+    @app.get("/dicts", response_model=List[TermsResponse])
+    @json_response
+    async def fetch_dicts():
+        return [dump_term(terms_object) for terms_object in terms_objects]
+
+    return app
+
+
+def measure(client: TestClient, path: str, seconds: float) -> float:
+    client.get(path)
+    requests, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        client.get(path)
+        requests += 1
+    return requests / (time.perf_counter() - started)
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Compare model-validated and direct JSON serialization of term lists"
+    )
+    p.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    p.add_argument("--seconds", type=float, default=2.0, help="Time per measurement")
+    args = p.parse_args()
+
+    print(f"{'items':>8}{'models req/s':>15}{'direct req/s':>15}{'items/s':>14}{'speedup':>9}")
+    for size in args.sizes:
+        client = TestClient(build_app(make_terms(size)))
+        if client.get("/models").json() != client.get("/dicts").json():
+            raise SystemExit(f"Responses differ for {size} items")
+        models = measure(client, "/models", args.seconds)
+        dicts = measure(client, "/dicts", args.seconds)
+        print(
+            f"{size:>8}{models:>15.1f}{dicts:>15.1f}{dicts * size:>14.0f}{dicts / models:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
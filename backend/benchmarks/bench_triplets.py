@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import time
+from dictionary.nlp.languages import Lang
+from dictionary.nlp.triplets import (
+    extract_triplets,
+    extract_triplets_batch,
+    split_sentences_batch,
+)
+
+# --------------------------------------------------------------------------------------------------
+# Usage (from backend/):
+#   python -m benchmarks.bench_triplets --json filler_data/him_terms.json --limit 500
+# --------------------------------------------------------------------------------------------------
+
+
+def load_texts(path: str, lang: Lang, limit: int) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    key = "definition" if lang == Lang.Russian else "definition_translated"
+    texts = [e.get(key, "").strip() for e in entries]
+    return [text for text in texts if text][:limit]
+
+
+def main():
+    p = argparse.ArgumentParser(description="Compare per-text and batched triplet extraction")
+    p.add_argument("--json", required=True, help="Path to filler JSON file")
+    p.add_argument("--language", default="russian", choices=[lang.value for lang in Lang])
+    p.add_argument("--limit", type=int, default=500, help="Number of descriptions")
+    args = p.parse_args()
+
+    lang = Lang(args.language)
+    texts = load_texts(args.json, lang, args.limit)
+    sentence_count = sum(len(s) for s in split_sentences_batch(texts=texts, lang=lang))
+    print(f"{len(texts)} descriptions, {sentence_count} sentences")
+
+    started = time.perf_counter()
+    single = [extract_triplets(text=text, lang=lang) for text in texts]
+    single_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = extract_triplets_batch(texts=dict(enumerate(texts)), lang=lang)
+    batch_elapsed = time.perf_counter() - started
+
+    print(f"triplets: per-text {sum(map(len, single))}, batched {sum(map(len, batched.values()))}")
+    print(f"per-text: {single_elapsed:8.2f}s  {sentence_count / single_elapsed:8.1f} sentences/s")
+    print(f"batched:  {batch_elapsed:8.2f}s  {sentence_count / batch_elapsed:8.1f} sentences/s")
+    print(f"speedup:  {single_elapsed / batch_elapsed:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import sys
+import uuid
+import numpy as np
+from sqlalchemy import insert, text
+from dictionary.database.engine import async_session
+from dictionary.database.models import Topics, Terms, Descriptions, Embeddings
+from dictionary.database.queries import search_terms_by_embedding, search_results_by_embedding
+from dictionary.nlp.embeddings import EMBEDDING_DIM, get_active_version, set_embedding_versions
+
+# --------------------------------------------------------------------------------------------------
+# Usage (from backend/, against a database with the HNSW index built):
+#   python -m benchmarks.bench_vector_search --rows 3000 --versions 2 --k 10 100 200
+# Rows are written and searched in one transaction that is rolled back. Every description gets a
+# vector per version, as during a backfill; each search must still return k rows of the active one.
+# --------------------------------------------------------------------------------------------------
+
+
+def unit_vectors(rng, n: int) -> np.ndarray:
+    vectors = rng.normal(size=(n, EMBEDDING_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def seed(session, rows: int, versions: list[str], rng) -> None:
+    topic_id = uuid.uuid4()
+    await session.execute(insert(Topics).values(id=topic_id, name=f"bench-{topic_id}"))
+    term_ids = [uuid.uuid4() for _ in range(rows)]
+    description_ids = [uuid.uuid4() for _ in range(rows)]
+    await session.execute(
+        insert(Terms),
+        [
+            {
+                "id": term_id, "topic_id": topic_id, "language": "english", "raw_text": f"bench {i}",
+                "cleaned_text": f"bench {i}", "stemmed_text": f"bench {i}", "first_letter": "b",
+            }
+            for i, term_id in enumerate(term_ids)
+        ],
+    )
+    await session.execute(
+        insert(Descriptions),
+        [
+            {
+                "id": description_id, "term_id": term_id, "language": "english",
+                "raw_text": f"bench {description_id}", "cleaned_text": f"bench {description_id}",
+                "stemmed_text": f"bench {description_id}",
+            }
+            for description_id, term_id in zip(description_ids, term_ids)
+        ],
+    )
+    for version in versions:
+        vectors = unit_vectors(rng, rows)
+        await session.execute(
+            insert(Embeddings),
+            [
+                {
+                    "id": uuid.uuid4(), "description_id": description_id, "model_version": version,
+                    "embedding": vector.tolist(), "language": "english",
+                }
+                for description_id, vector in zip(description_ids, vectors)
+            ],
+        )
+    await session.execute(text("ANALYZE embeddings"))
+    await session.execute(text("SET LOCAL enable_seqscan = off"))
+
+
+async def run(args) -> bool:
+    active = get_active_version()
+    versions = [active] + [f"bench:{i}" for i in range(1, args.versions)]
+    rng = np.random.default_rng(0)
+    ok = True
+    async with async_session() as session:
+        await seed(session, args.rows, versions, rng)
+        queries = unit_vectors(rng, args.queries)
+        print(f"{args.rows} descriptions x {len(versions)} versions")
+        print(f"{'k':>6}{'stored':>8}{'terms min':>11}{'results min':>13}")
+        # stored=1 is the depth a single version would get, for comparison
+        for k in args.k:
+            for stored in sorted({1, len(versions)}):
+                set_embedding_versions(active=active, backfilling=[], stored=stored)
+                terms, results = [], []
+                for qv in queries:
+                    terms.append(len(await search_terms_by_embedding(qv=qv.tolist(), k=k, session=session)))
+                    results.append(len(await search_results_by_embedding(qv=qv.tolist(), k=k, session=session)))
+                print(f"{k:>6}{stored:>8}{min(terms):>11}{min(results):>13}")
+                if stored == len(versions) and min(terms + results) < k:
+                    ok = False
+        await session.rollback()
+    print("ok" if ok else "FAIL: fewer than k rows of the active version")
+    return ok
+
+
+def main():
+    p = argparse.ArgumentParser(description="Check that vector search returns k rows while several versions are stored")
+    p.add_argument("--rows", type=int, default=3000, help="Number of descriptions")
+    p.add_argument("--versions", type=int, default=2, help="Stored embedding versions, the active one included")
+    p.add_argument("--queries", type=int, default=20, help="Random query vectors per k")
+    p.add_argument("--k", type=int, nargs="+", default=[10, 100, 200])
+    args = p.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
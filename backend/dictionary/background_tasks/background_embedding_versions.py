@@ -0,0 +1,61 @@
+import asyncio
+import os
+from loguru import logger
+from dictionary.database.engine import async_session
+from dictionary.database.models import EmbeddingVersions
+from dictionary.database.queries import (
+    select_embedding_versions,
+    save_embedding_version,
+    assign_unversioned_embeddings,
+)
+from dictionary.nlp.embeddings import get_backend, set_embedding_versions
+
+
+EMBEDDING_VERSION_REFRESH_SECONDS = float(
+    os.environ.get("EMBEDDING_VERSION_REFRESH_SECONDS", 10.0)
+)
+
+
+async def refresh_embedding_versions() -> None:
+    async with async_session() as session:
+        versions = await select_embedding_versions(session=session)
+        if not any(version.status == "active" for version in versions):
+            # first start: the configured backend becomes the active version
+            # and owns every vector written before versions existed
+            backend = get_backend()
+            await save_embedding_version(
+                version=EmbeddingVersions(
+                    model_version=backend.model_version, status="active", dim=backend.dim
+                ),
+                session=session,
+            )
+            assigned = await assign_unversioned_embeddings(
+                model_version=backend.model_version, session=session
+            )
+            logger.info(f"Registered {backend.model_version} as active, {assigned} vectors")
+            versions = await select_embedding_versions(session=session)
+
+    # none is active when the configured version was already registered with
+    # another status, e.g. retired, so the insert above did nothing
+    active = next((version for version in versions if version.status == "active"), None)
+    if active is None:
+        active_version = get_backend().model_version
+        logger.error(f"No active embedding version, using the configured {active_version}")
+    else:
+        active_version = active.model_version
+    set_embedding_versions(
+        active=active_version,
+        backfilling=[
+            version.model_version for version in versions if version.status == "backfilling"
+        ],
+        stored=len(versions),
+    )
+
+
+async def run_embedding_version_refresher() -> None:
+    while True:
+        await asyncio.sleep(EMBEDDING_VERSION_REFRESH_SECONDS)
+        try:
+            await refresh_embedding_versions()
+        except Exception as e:
+            logger.error(f"Embedding version refresh failed: {e}")
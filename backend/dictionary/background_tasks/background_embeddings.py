@@ -1,42 +1,44 @@
+import asyncio
 from loguru import logger
 from pydantic import UUID4
 from dictionary.database.engine import async_session
 from dictionary.database.models import Embeddings
 from dictionary.nlp.languages import Lang
-from dictionary.database.queries import save_embedding, select_embedding_by_description_id
-from dictionary.nlp.embeddings import vectorize_text
-
-
-async def create_embedding(text: str, lang: Lang, description_id: UUID4) -> None:
-    embedding = vectorize_text(text=text, lang=lang)
-
-    if not embedding:
-        logger.error(f"Couldn't vectorize {text=}")
-        return
+from dictionary.database.queries import upsert_embeddings
+from dictionary.nlp.embeddings import vectorize_text, get_write_versions
+from dictionary.background_tasks.background_related_terms import update_related_terms
+
+
+async def save_embeddings(text: str, lang: Lang, description_id: UUID4) -> bool:
+    # the active version and every version being back-filled get a vector, so
+    # a back-fill never has to chase descriptions written while it runs
+    embeddings = []
+    for version in get_write_versions():
+        embedding = await asyncio.to_thread(vectorize_text, text, lang, version)
+        if not embedding:
+            logger.error(f"Couldn't vectorize {text=} with {version}")
+            continue
+        embeddings.append(
+            Embeddings(
+                description_id=description_id,
+                model_version=version,
+                embedding=embedding,
+                language=lang.value,
+            )
+        )
+    if not embeddings:
+        return False
 
     async with async_session() as session:
-        await save_embedding(
-            embedding=Embeddings(
-                description_id=description_id, embedding=embedding, language=lang.value
-            ),
-            session=session,
-        )
+        await upsert_embeddings(embeddings=embeddings, session=session)
+    return True
 
 
-async def update_embedding(text: str, lang: Lang, description_id: UUID4) -> None:
-    embedding = vectorize_text(text=text, lang=lang)
+async def create_embedding(text: str, lang: Lang, description_id: UUID4) -> None:
+    if await save_embeddings(text=text, lang=lang, description_id=description_id):
+        await update_related_terms(description_id=description_id)
 
-    if not embedding:
-        logger.error(f"Couldn't vectorize {text=}")
-        return
 
-    async with async_session() as session:
-        embeddings_object = await select_embedding_by_description_id(description_id=description_id, session=session)
-        if not embeddings_object:
-            logger.error(f"No embedding for description with {description_id=}")
-            return
-        embeddings_object.embedding = embedding
-        await save_embedding(
-            embedding=embeddings_object,
-            session=session,
-        )
+async def update_embedding(text: str, lang: Lang, description_id: UUID4) -> None:
+    if await save_embeddings(text=text, lang=lang, description_id=description_id):
+        await update_related_terms(description_id=description_id)
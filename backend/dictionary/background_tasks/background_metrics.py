@@ -0,0 +1,16 @@
+import asyncio
+from loguru import logger
+from dictionary.misc.metrics import METRICS_FLUSH_SECONDS, flush_snapshot
+
+
+async def run_metrics_flusher() -> None:
+    try:
+        while True:
+            await asyncio.sleep(METRICS_FLUSH_SECONDS)
+            try:
+                flush_snapshot()
+            except OSError as e:
+                logger.error(f"Failed to write the metrics snapshot: {e}")
+    finally:
+        # counters of a stopping worker still count after it exits
+        flush_snapshot()
@@ -0,0 +1,77 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List, Tuple
+import numpy as np
+from pydantic import UUID4
+from sqlalchemy.ext.asyncio import AsyncSession
+from dictionary.database.engine import async_session
+from dictionary.database.models import Descriptions, DescriptionMinhashes
+from dictionary.database.queries import (
+    save_description_minhashes,
+    select_description_minhashes,
+    select_existing_description_ids,
+)
+from dictionary.nlp.minhash import get_hasher, get_lsh_index
+
+
+MINHASH_SYNC_SECONDS = float(os.environ.get("MINHASH_SYNC_SECONDS", 1.0))
+# created_at comes from each worker's clock; re-read a window to absorb skew
+MINHASH_SYNC_OVERLAP = timedelta(seconds=int(os.environ.get("MINHASH_SYNC_OVERLAP", 60)))
+
+_synced_until: Optional[datetime] = None
+_synced_at = 0.0
+
+
+def minhash_signature(stemmed_text: str) -> np.ndarray:
+    return get_hasher().signature(stemmed_text.split())
+
+
+async def sync_minhash_index(session: AsyncSession) -> None:
+    global _synced_until, _synced_at
+    if time.monotonic() - _synced_at < MINHASH_SYNC_SECONDS:
+        return
+    created_after = _synced_until - MINHASH_SYNC_OVERLAP if _synced_until else None
+    minhashes = await select_description_minhashes(
+        created_after=created_after, session=session
+    )
+    for minhash in minhashes:
+        get_lsh_index(minhash.language).add(
+            minhash.description_id, np.frombuffer(minhash.signature, dtype=np.uint32)
+        )
+        if _synced_until is None or minhash.created_at > _synced_until:
+            _synced_until = minhash.created_at
+    _synced_at = time.monotonic()
+
+
+async def find_near_duplicates(
+    signature: np.ndarray, language: str, session: AsyncSession
+) -> List[Tuple[UUID4, float]]:
+    await sync_minhash_index(session=session)
+    matches = get_lsh_index(language).query(signature)
+    if not matches:
+        return []
+    # other workers' deletes only reach this index through the database
+    existing = set(
+        await select_existing_description_ids(
+            description_ids=[description_id for description_id, _ in matches],
+            session=session,
+        )
+    )
+    return [match for match in matches if match[0] in existing]
+
+
+async def register_minhashes(descriptions_objects: List[Descriptions]) -> None:
+    minhashes = []
+    for descriptions_object in descriptions_objects:
+        signature = minhash_signature(descriptions_object.stemmed_text)
+        get_lsh_index(descriptions_object.language).add(descriptions_object.id, signature)
+        minhashes.append(
+            DescriptionMinhashes(
+                description_id=descriptions_object.id,
+                language=descriptions_object.language,
+                signature=signature.tobytes(),
+            )
+        )
+    async with async_session() as session:
+        await save_description_minhashes(minhashes=minhashes, session=session)
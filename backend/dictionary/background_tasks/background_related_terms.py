@@ -0,0 +1,62 @@
+import os
+from typing import List, Set
+from loguru import logger
+from pydantic import UUID4
+from dictionary.database.engine import async_session
+from dictionary.database.queries import (
+    refresh_related_terms,
+    select_reverse_related_terms,
+    select_related_terms_admitting,
+    delete_related_terms,
+)
+
+
+RELATED_TERMS_N = int(os.environ.get("RELATED_TERMS_N", 20))
+# nearest descriptions whose lists are checked for a new or changed vector
+RELATED_TERMS_REVERSE_DEPTH = int(
+    os.environ.get("RELATED_TERMS_REVERSE_DEPTH", RELATED_TERMS_N * 5)
+)
+
+
+async def update_related_terms(description_id: UUID4) -> None:
+    # lists that contained the description may lose or reorder it, and lists whose
+    # farthest neighbour is now farther than the description have to take it in
+    async with async_session() as session:
+        affected: Set[UUID4] = set(
+            await select_reverse_related_terms(
+                neighbour_description_ids=[description_id], session=session
+            )
+        )
+        await refresh_related_terms(
+            description_ids=[description_id], depth=RELATED_TERMS_N, session=session
+        )
+        affected.update(
+            await select_related_terms_admitting(
+                description_id=description_id,
+                depth=RELATED_TERMS_N,
+                candidates=RELATED_TERMS_REVERSE_DEPTH,
+                session=session,
+            )
+        )
+        affected.discard(description_id)
+
+        await refresh_related_terms(
+            description_ids=list(affected), depth=RELATED_TERMS_N, session=session
+        )
+    logger.info(f"Related terms of {description_id=} and {len(affected)} neighbours refreshed")
+
+
+async def remove_related_terms(description_ids: List[UUID4]) -> None:
+    if not description_ids:
+        return
+    async with async_session() as session:
+        affected = set(
+            await select_reverse_related_terms(
+                neighbour_description_ids=description_ids, session=session
+            )
+        ).difference(description_ids)
+        await delete_related_terms(description_ids=description_ids, session=session)
+        await refresh_related_terms(
+            description_ids=list(affected), depth=RELATED_TERMS_N, session=session
+        )
+    logger.info(f"Related terms of {len(affected)} descriptions refreshed after delete")
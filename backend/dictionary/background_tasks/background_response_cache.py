@@ -0,0 +1,36 @@
+import asyncio
+from loguru import logger
+from dictionary.database.engine import engine
+from dictionary.misc.response_cache import (
+    CHANGES_CHANNEL,
+    bump_all,
+    on_change_notification,
+)
+
+
+RESPONSE_CACHE_LISTEN_PING_SECONDS = 30.0
+RESPONSE_CACHE_LISTEN_RETRY_SECONDS = 5.0
+
+
+async def run_change_listener() -> None:
+    while True:
+        try:
+            async with engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                driver = raw.driver_connection
+                await driver.add_listener(CHANGES_CHANNEL, on_change_notification)
+                try:
+                    # whatever changed while we were not listening is unknown
+                    bump_all()
+                    logger.info(f"Listening for {CHANGES_CHANNEL} notifications")
+                    while True:
+                        await asyncio.sleep(RESPONSE_CACHE_LISTEN_PING_SECONDS)
+                        await driver.execute("SELECT 1")
+                finally:
+                    await driver.remove_listener(CHANGES_CHANNEL, on_change_notification)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Change listener failed: {e}")
+            bump_all()
+        await asyncio.sleep(RESPONSE_CACHE_LISTEN_RETRY_SECONDS)
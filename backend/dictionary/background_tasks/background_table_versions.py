@@ -0,0 +1,20 @@
+import asyncio
+import os
+from loguru import logger
+from dictionary.database.engine import async_session
+from dictionary.database.queries import compact_table_changes
+
+
+TABLE_CHANGES_COMPACT_SECONDS = float(os.environ.get("TABLE_CHANGES_COMPACT_SECONDS", 60.0))
+
+
+async def run_table_changes_compactor() -> None:
+    while True:
+        await asyncio.sleep(TABLE_CHANGES_COMPACT_SECONDS)
+        try:
+            async with async_session() as session:
+                compacted = await compact_table_changes(session=session)
+            if compacted:
+                logger.info(f"Folded {compacted} table changes into table_versions")
+        except Exception as e:
+            logger.error(f"Table change compaction failed: {e}")
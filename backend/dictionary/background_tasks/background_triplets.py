@@ -1,30 +1,203 @@
+import asyncio
+from typing import List, Dict, Optional
 from loguru import logger
 from pydantic import UUID4
 from dictionary.database.engine import async_session
-from dictionary.database.models import Triplets, Graphs
+from dictionary.database.models import Triplets, Graphs, SentenceParses, Parses
 from dictionary.nlp.languages import Lang
-from dictionary.database.queries import save_triplet, save_graph, select_graph_by_description_id, delete_triplets_by_description_id
-from dictionary.nlp.triplets import extract_triplets, TripletData
+from dictionary.database.queries import (
+    save_triplet,
+    save_graph,
+    select_graph_by_description_id,
+    delete_triplets_by_description_id,
+    select_sentence_parses_by_hashes,
+    save_sentence_parses,
+    save_parses,
+    replace_triplets_and_graphs,
+)
+from dictionary.nlp.parses import (
+    TokenizedSentence,
+    ParsedSentence,
+    sentence_hash,
+    to_conllu,
+    from_conllu,
+    to_conllu_document,
+)
+from dictionary.nlp.triplets import (
+    PARSER_MODEL_VERSION,
+    split_sentences_batch,
+    parse_documents,
+    derive_triplets,
+    TripletData,
+)
 from dictionary.nlp.graphs import (
-    create_graph,
+    build_graph,
     add_triplets_to_graph,
     remove_triplets_from_graph,
-    serialize_graph,
-    deserialize_graph,
 )
 
 
+def parsed_only(sentences: List[Optional[ParsedSentence]]) -> List[ParsedSentence]:
+    return [sentence for sentence in sentences if sentence is not None]
+
+
+async def parse_with_cache_batch(
+    texts: List[str], lang: Lang
+) -> List[List[Optional[ParsedSentence]]]:
+    # aligned with the sentences of every text; None where parsing missed the
+    # time budget
+    split = await asyncio.to_thread(split_sentences_batch, texts=texts, lang=lang)
+    hashes = [
+        [
+            sentence_hash(
+                text=sentence.text, lang=lang, model_version=PARSER_MODEL_VERSION
+            )
+            for sentence in sentences
+        ]
+        for sentences in split
+    ]
+
+    async with async_session() as session:
+        cached = await select_sentence_parses_by_hashes(
+            sentence_hashes=list({h for doc_hashes in hashes for h in doc_hashes}),
+            session=session,
+        )
+    parsed = {
+        sentence_parse.sentence_hash: from_conllu(sentence_parse.conllu)
+        for sentence_parse in cached
+    }
+
+    # a sentence shared by several texts is parsed once, with the first of them
+    missing: List[Dict[str, TokenizedSentence]] = []
+    seen = set(parsed)
+    for doc_hashes, sentences in zip(hashes, split):
+        doc_missing = {}
+        for h, sentence in zip(doc_hashes, sentences):
+            if h not in seen:
+                doc_missing[h] = sentence
+                seen.add(h)
+        missing.append(doc_missing)
+    sentence_count = sum(len(doc_hashes) for doc_hashes in hashes)
+    missing_count = sum(len(doc_missing) for doc_missing in missing)
+    logger.info(
+        f"Parse cache: {sentence_count - missing_count} of {sentence_count} sentences reused"
+    )
+
+    if missing_count:
+        new_documents = await asyncio.to_thread(
+            parse_documents,
+            documents=[list(doc_missing.values()) for doc_missing in missing],
+            lang=lang,
+        )
+        new_parses = {
+            h: sentence
+            for doc_missing, new_document in zip(missing, new_documents)
+            for h, sentence in zip(doc_missing.keys(), new_document)
+            if sentence is not None
+        }
+        parsed.update(new_parses)
+
+        async with async_session() as session:
+            await save_sentence_parses(
+                sentence_parses=[
+                    SentenceParses(
+                        sentence_hash=h,
+                        model_version=PARSER_MODEL_VERSION,
+                        conllu=to_conllu(sentence),
+                        language=lang.value,
+                    )
+                    for h, sentence in new_parses.items()
+                ],
+                session=session,
+            )
+
+    return [[parsed.get(h) for h in doc_hashes] for doc_hashes in hashes]
+
+
+async def parse_with_cache(text: str, lang: Lang) -> List[Optional[ParsedSentence]]:
+    parsed = await parse_with_cache_batch(texts=[text], lang=lang)
+    return parsed[0]
+
+
+async def store_parses(
+    parsed: Dict[UUID4, List[Optional[ParsedSentence]]], lang: Lang
+) -> None:
+    async with async_session() as session:
+        await save_parses(
+            parses=[
+                Parses(
+                    description_id=description_id,
+                    model_version=PARSER_MODEL_VERSION,
+                    sentence_count=len(parsed_only(sentences)),
+                    complete=None not in sentences,
+                    conllu=to_conllu_document(parsed_only(sentences)),
+                    language=lang.value,
+                )
+                for description_id, sentences in parsed.items()
+            ],
+            session=session,
+        )
+
+
+async def create_triplets_and_graphs_batch(
+    texts: Dict[UUID4, str], lang: Lang
+) -> None:
+    description_ids = list(texts.keys())
+    parsed = await parse_with_cache_batch(
+        texts=[texts[description_id] for description_id in description_ids],
+        lang=lang,
+    )
+    parsed_by_description = dict(zip(description_ids, parsed))
+    await store_parses(parsed=parsed_by_description, lang=lang)
+
+    triplets_objects = []
+    graphs_objects = []
+    for description_id, sentences in parsed_by_description.items():
+        triplets = derive_triplets(sentences=parsed_only(sentences), lang=lang)
+        if not triplets:
+            logger.error(f"Couldn't extract triplets from description {description_id=}")
+
+        graphs_objects.append(
+            Graphs(
+                description_id=description_id,
+                triplet_count=len(triplets),
+                graph=build_graph(triplets=triplets),
+                language=lang.value,
+            )
+        )
+        triplets_objects.extend(
+            Triplets(
+                description_id=description_id,
+                position=triplet.position,
+                subject=triplet.subject,
+                subject_type=triplet.subject_type,
+                predicate=triplet.predicate,
+                predicate_type=triplet.predicate_type,
+                object=triplet.object,
+                object_type=triplet.object_type,
+                language=lang.value,
+            )
+            for triplet in triplets
+        )
+
+    async with async_session() as session:
+        await replace_triplets_and_graphs(
+            triplets=triplets_objects, graphs=graphs_objects, session=session
+        )
+    logger.info(f"Extracted {len(triplets_objects)} triplets for {len(texts)} descriptions")
+
+
 async def create_triplets_and_graphs(
     text: str, lang: Lang, description_id: UUID4
 ) -> None:
-    triplets = extract_triplets(text=text, lang=lang)
+    sentences = await parse_with_cache(text=text, lang=lang)
+    await store_parses(parsed={description_id: sentences}, lang=lang)
+    triplets = derive_triplets(sentences=parsed_only(sentences), lang=lang)
 
     if not triplets:
         logger.error(f"Couldn't extract triplets from {text=}")
 
-    graph = await create_graph()
-    graph = await add_triplets_to_graph(graph=graph, triplets=triplets)
-    serialized_graph = await serialize_graph(graph)
+    serialized_graph = build_graph(triplets=triplets)
 
     async with async_session() as session:
         await save_graph(
@@ -58,14 +231,14 @@ async def create_triplets_and_graphs(
 async def update_triplets_and_graphs(
     text: str, lang: Lang, description_id: UUID4
 ) -> None:
-    triplets = extract_triplets(text=text, lang=lang)
+    sentences = await parse_with_cache(text=text, lang=lang)
+    await store_parses(parsed={description_id: sentences}, lang=lang)
+    triplets = derive_triplets(sentences=parsed_only(sentences), lang=lang)
 
     if not triplets:
         logger.error(f"Couldn't extract triplets from {text=}")
 
-    graph = await create_graph()
-    graph = await add_triplets_to_graph(graph=graph, triplets=triplets)
-    serialized_graph = await serialize_graph(graph)
+    serialized_graph = build_graph(triplets=triplets)
 
     async with async_session() as session:
         graphs_object = await select_graph_by_description_id(description_id=description_id, session=session)
@@ -95,10 +268,9 @@ async def update_triplets_and_graphs(
 
 
 async def add_triplet_to_graph(graphs_object: Graphs, triplet: TripletData) -> None:
-    graph = await deserialize_graph(graph_data=graphs_object.graph)
-    graph = await add_triplets_to_graph(graph=graph, triplets=[triplet])
-
-    graphs_object.graph = await serialize_graph(graph)
+    graphs_object.graph = add_triplets_to_graph(
+        graph_data=graphs_object.graph, triplets=[triplet]
+    )
     graphs_object.triplet_count += 1
 
     async with async_session() as session:
@@ -110,10 +282,9 @@ async def add_triplet_to_graph(graphs_object: Graphs, triplet: TripletData) -> N
 async def remove_triplet_from_graph(
     graphs_object: Graphs, triplet: TripletData
 ) -> None:
-    graph = await deserialize_graph(graph_data=graphs_object.graph)
-    graph = await remove_triplets_from_graph(graph=graph, triplets=[triplet])
-
-    graphs_object.graph = await serialize_graph(graph)
+    graphs_object.graph = remove_triplets_from_graph(
+        graph_data=graphs_object.graph, triplets=[triplet]
+    )
     graphs_object.triplet_count -= 1
 
     async with async_session() as session:
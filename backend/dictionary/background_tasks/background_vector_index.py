@@ -0,0 +1,157 @@
+import asyncio
+import os
+from typing import Optional, List, Dict, Set
+import numpy as np
+from loguru import logger
+from dictionary.database.engine import async_session
+from dictionary.database.queries import (
+    select_embeddings_batch,
+    select_embeddings_by_description_ids,
+    select_last_embedding_change_id,
+    select_embedding_changes,
+    delete_embedding_changes,
+    delete_embedding_changes_older_than,
+)
+from dictionary.nlp.embeddings import get_active_version
+from dictionary.nlp.vector_index import (
+    VECTOR_INDEX_DIR,
+    VECTOR_INDEX_CHANGES_RETENTION,
+    SnapshotWriter,
+    export_lock,
+    read_manifest,
+    get_vector_index,
+)
+
+
+VECTOR_INDEX_REFRESH_SECONDS = float(os.environ.get("VECTOR_INDEX_REFRESH_SECONDS", 2.0))
+VECTOR_INDEX_EXPORT_BATCH = int(os.environ.get("VECTOR_INDEX_EXPORT_BATCH", 5000))
+VECTOR_INDEX_CHANGES_BATCH = int(os.environ.get("VECTOR_INDEX_CHANGES_BATCH", 1000))
+VECTOR_INDEX_SNAPSHOT_AFTER = int(os.environ.get("VECTOR_INDEX_SNAPSHOT_AFTER", 2000))
+# change ids are allocated before commit, so a slow transaction can land below
+# ids we have already consumed; the last few are re-read on every refresh
+VECTOR_INDEX_CHANGE_OVERLAP = int(os.environ.get("VECTOR_INDEX_CHANGE_OVERLAP", 64))
+VECTOR_INDEX_PRUNE_SECONDS = float(os.environ.get("VECTOR_INDEX_PRUNE_SECONDS", 3600))
+
+_applied_changes: Set[int] = set()
+
+
+async def export_snapshot() -> bool:
+    with export_lock(VECTOR_INDEX_DIR) as acquired:
+        if not acquired:
+            logger.info("Another worker is exporting the vector snapshot")
+            return False
+
+        previous = read_manifest(VECTOR_INDEX_DIR)
+        async with async_session() as session:
+            change_id = await select_last_embedding_change_id(session=session)
+        writer = SnapshotWriter(
+            directory=VECTOR_INDEX_DIR,
+            change_id=change_id,
+            model_version=get_active_version(),
+        )
+
+        after_description_id = None
+        while True:
+            async with async_session() as session:
+                rows = await select_embeddings_batch(
+                    after_description_id=after_description_id,
+                    limit=VECTOR_INDEX_EXPORT_BATCH,
+                    session=session,
+                )
+            if not rows:
+                break
+            after_description_id = rows[-1].description_id
+            rows = [row for row in rows if row.embedding is not None]
+            if rows:
+                writer.append(
+                    ids=[row.description_id.bytes for row in rows],
+                    vectors=np.asarray([row.embedding for row in rows], dtype=np.float32),
+                )
+        await asyncio.to_thread(writer.commit)
+
+    # keep one snapshot generation of the feed for workers that are mid-reload
+    if previous is not None:
+        async with async_session() as session:
+            await delete_embedding_changes(up_to_id=previous["change_id"], session=session)
+    return True
+
+
+async def apply_embedding_changes() -> int:
+    index = get_vector_index()
+    after_id = max(0, index.change_id - VECTOR_INDEX_CHANGE_OVERLAP)
+    applied = 0
+
+    while True:
+        async with async_session() as session:
+            changes = await select_embedding_changes(
+                after_id=after_id, limit=VECTOR_INDEX_CHANGES_BATCH, session=session
+            )
+            changes = [change for change in changes if change.id not in _applied_changes]
+            if not changes:
+                break
+            # deletes included: the feed does not say which model version a
+            # change touched, so the active row decides, e.g. a gc of a
+            # retired version must not drop a description from the index
+            description_ids = list({change.description_id for change in changes})
+            rows = await select_embeddings_by_description_ids(
+                description_ids=description_ids, session=session
+            )
+
+        # the current row wins over the change that announced it, so replaying
+        # a change twice is harmless
+        vectors = {row.description_id: row.embedding for row in rows}
+        updates: Dict[bytes, Optional[List[float]]] = {
+            change.description_id.bytes: vectors.get(change.description_id)
+            for change in changes
+        }
+        index.apply(updates=updates, change_id=max(index.change_id, changes[-1].id))
+        _applied_changes.update(change.id for change in changes)
+        after_id = changes[-1].id
+        applied += len(changes)
+
+    horizon = index.change_id - VECTOR_INDEX_CHANGE_OVERLAP
+    _applied_changes.difference_update({i for i in _applied_changes if i <= horizon})
+    return applied
+
+
+async def refresh_vector_index() -> None:
+    index = get_vector_index()
+    previous_generation = index.generation
+    if not index.load():
+        if not await export_snapshot() or not index.load():
+            return
+    if index.generation != previous_generation:
+        _applied_changes.clear()
+
+    applied = await apply_embedding_changes()
+    if applied:
+        logger.info(f"Applied {applied} embedding changes to the vector index")
+
+    if index.pending >= VECTOR_INDEX_SNAPSHOT_AFTER and await export_snapshot():
+        index.load()
+        _applied_changes.clear()
+
+
+async def run_vector_index_refresher() -> None:
+    while True:
+        try:
+            await refresh_vector_index()
+        except Exception as e:
+            logger.error(f"Vector index refresh failed: {e}")
+        await asyncio.sleep(VECTOR_INDEX_REFRESH_SECONDS)
+
+
+# Without in-process search nothing consumes the feed and no snapshot export
+# trims it; rows past the retention are dropped here instead.
+async def run_embedding_changes_pruner() -> None:
+    while True:
+        try:
+            async with async_session() as session:
+                pruned = await delete_embedding_changes_older_than(
+                    seconds=VECTOR_INDEX_CHANGES_RETENTION, session=session
+                )
+            if pruned:
+                logger.info(f"Pruned {pruned} embedding changes")
+        except Exception as e:
+            logger.error(f"Embedding change pruning failed: {e}")
+        await asyncio.sleep(VECTOR_INDEX_PRUNE_SECONDS)
@@ -5,6 +5,9 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from loguru import logger
 import os
+from dictionary.database.models import SCHEMA_MIGRATIONS, VECTOR_INDEXES
+from dictionary.nlp.embeddings import EMBEDDING_DIM
+from dictionary.misc.metrics import Gauge
 
 
 DB_USERNAME = os.environ.get("DB_USERNAME")
@@ -31,11 +34,73 @@ async_session = sessionmaker(
 )
 
 
+def _pool_stats():
+    pool = engine.pool
+    return {
+        ("size",): pool.size(),
+        ("checked_in",): pool.checkedin(),
+        ("checked_out",): pool.checkedout(),
+        ("overflow",): pool.overflow(),
+    }
+
+
+Gauge(
+    "dictionary_db_pool_connections",
+    "Connections of the database pool by state",
+    ("state",),
+    collect=_pool_stats,
+)
+
+
+async def check_embedding_dim(conn) -> None:
+    # create_all does not alter an existing column, so a changed EMBEDDING_DIM
+    # would otherwise only show up as failing inserts; pgvector keeps the
+    # dimension in the type modifier
+    column_dim = (
+        await conn.execute(
+            text(
+                "SELECT atttypmod FROM pg_attribute "
+                "WHERE attrelid = 'embeddings'::regclass AND attname = 'embedding'"
+            )
+        )
+    ).scalar_one()
+    if column_dim != EMBEDDING_DIM:
+        raise RuntimeError(
+            f"embeddings.embedding holds {column_dim}-dim vectors but EMBEDDING_DIM is "
+            f"{EMBEDDING_DIM}; start with EMBEDDING_DIM={column_dim} or migrate the column"
+        )
+
+
+async def warn_missing_vector_indexes(conn) -> None:
+    existing = set(
+        (
+            await conn.execute(
+                text(
+                    "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE i.indrelid = 'embeddings'::regclass AND i.indisvalid"
+                )
+            )
+        ).scalars()
+    )
+    missing = [name for name in VECTOR_INDEXES if name not in existing]
+    if missing:
+        logger.warning(
+            f"Vector indexes {missing} are missing and vector searches scan the table; "
+            "build them with `python -m dictionary.jobs.build_vector_indexes`"
+        )
+
+
 async def init_db() -> None:
     logger.info("Creating database metadata...")
     async with engine.begin() as conn:
+        # forked workers start together; only one of them runs the DDL at a time
+        await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('init_db'))"))
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         await conn.run_sync(SQLModel.metadata.create_all)
+        for statement in SCHEMA_MIGRATIONS:
+            await conn.execute(text(statement))
+        await check_embedding_dim(conn)
+        await warn_missing_vector_indexes(conn)
     logger.info("Metadata creation complete.")
 
 
@@ -1,13 +1,22 @@
 from pydantic import UUID4
+import os
 import uuid
 from datetime import datetime
 from typing import Optional, List, Dict
 from sqlmodel import Field, SQLModel, Column
-from pgvector.sqlalchemy import Vector
-from sqlalchemy.dialects.postgresql import JSONB
-
-
-DEFAULT_VECTOR_DIM = 300
+from pgvector.sqlalchemy import Vector, HALFVEC, BIT
+from sqlalchemy import (
+    Computed,
+    Index,
+    BigInteger,
+    Identity,
+    LargeBinary,
+    UniqueConstraint,
+    DateTime,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from dictionary.nlp.embeddings import EMBEDDING_DIM
 
 
 class Topics(SQLModel, table=True):
@@ -43,16 +52,124 @@ class Descriptions(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.now)
 
 
+def _search_vector_expression(column: str) -> str:
+    return (
+        "CASE language "
+        f"WHEN 'russian' THEN to_tsvector('russian'::regconfig, {column}) "
+        f"ELSE to_tsvector('english'::regconfig, {column}) END "
+        f"|| to_tsvector('simple'::regconfig, {column})"
+    )
+
+
+# Full-text columns are generated by Postgres and left unmapped, so ORM selects
+# of terms and descriptions do not load them.
+for _table in (Terms.__table__, Descriptions.__table__):
+    _table.append_column(
+        Column(
+            "search_vector",
+            TSVECTOR,
+            Computed(_search_vector_expression("raw_text"), persisted=True),
+        )
+    )
+    Index(
+        f"ix_{_table.name}_search_vector",
+        _table.c.search_vector,
+        postgresql_using="gin",
+    )
+
+
+# One row per description and embedding model version; searches read the
+# active version only (see `EmbeddingVersions`).
 class Embeddings(SQLModel, table=True):
     __tablename__ = "embeddings"
+    __table_args__ = (
+        UniqueConstraint(
+            "description_id",
+            "model_version",
+            name="uq_embeddings_description_id_model_version",
+        ),
+    )
     id: UUID4 = Field(default_factory=uuid.uuid4, primary_key=True)
-    description_id: UUID4 = Field(foreign_key="descriptions.id", unique=True, index=True)
-    embedding: List[float] = Field(sa_column=Column(Vector(DEFAULT_VECTOR_DIM)))
+    description_id: UUID4 = Field(foreign_key="descriptions.id", index=True)
+    model_version: str = Field(nullable=False, index=True)
+    embedding: List[float] = Field(sa_column=Column(Vector(EMBEDDING_DIM)))
     language: str = Field(nullable=False)
     info: Optional[str] = Field(default=None, nullable=True)
     created_at: datetime = Field(default_factory=datetime.now)
 
 
+EMBEDDING_SHADOW_COLUMNS = [
+    column.strip()
+    for column in os.environ.get("EMBEDDING_SHADOW_COLUMNS", "").split(",")
+    if column.strip()
+]
+
+# Quantized copies of `embedding`, generated by Postgres and indexed on their own.
+# Search runs its first pass on one of them and re-ranks against `embedding`.
+SHADOW_COLUMNS = {
+    "halfvec": (
+        "embedding_half",
+        HALFVEC(EMBEDDING_DIM),
+        f"embedding::halfvec({EMBEDDING_DIM})",
+        "halfvec_ip_ops",
+    ),
+    "binary": (
+        "embedding_bits",
+        BIT(EMBEDDING_DIM),
+        f"binary_quantize(embedding)::bit({EMBEDDING_DIM})",
+        "bit_hamming_ops",
+    ),
+}
+
+# With shadow columns the first search pass runs on their smaller indexes and
+# an HNSW index over the full vectors only costs memory; it can still be asked
+# for, e.g. for related-term rebuilds that rank full vectors.
+EMBEDDING_FULL_INDEX = os.environ.get(
+    "EMBEDDING_FULL_INDEX", "0" if EMBEDDING_SHADOW_COLUMNS else "1"
+) == "1"
+
+# HNSW indexes by name. They are not part of the metadata: building one takes
+# long on a full table and would block writes inside init_db, so
+# `dictionary.jobs.build_vector_indexes` creates them concurrently.
+VECTOR_INDEXES: Dict[str, str] = {}
+
+for _quantization in EMBEDDING_SHADOW_COLUMNS:
+    if _quantization not in SHADOW_COLUMNS:
+        raise ValueError(f"Unsupported embedding shadow column: {_quantization}")
+    _name, _type, _expression, _ops = SHADOW_COLUMNS[_quantization]
+    Embeddings.__table__.append_column(
+        Column(_name, _type, Computed(_expression, persisted=True))
+    )
+    VECTOR_INDEXES[f"ix_embeddings_{_name}_{_ops}"] = f"embeddings USING hnsw ({_name} {_ops})"
+
+# Vectors are L2-normalized on write, so the inner-product opclass serves
+# cosine ranking with a plain dot product.
+if EMBEDDING_FULL_INDEX:
+    VECTOR_INDEXES["ix_embeddings_embedding_vector_ip_ops"] = (
+        "embeddings USING hnsw (embedding vector_ip_ops)"
+    )
+
+
+# Lifecycle of an embedding model version: "backfilling" while its vectors are
+# written next to the active ones, "active" once every description has one,
+# "retired" until its rows are garbage-collected.
+class EmbeddingVersions(SQLModel, table=True):
+    __tablename__ = "embedding_versions"
+    model_version: str = Field(primary_key=True)
+    status: str = Field(nullable=False)
+    dim: int = Field(nullable=False)
+    created_at: datetime = Field(default_factory=datetime.now)
+    activated_at: Optional[datetime] = Field(default=None, nullable=True)
+
+
+Index(
+    "ix_embedding_versions_active",
+    EmbeddingVersions.__table__.c.status,
+    unique=True,
+    postgresql_where=text("status = 'active'"),
+)
+
+
 class Triplets(SQLModel, table=True):
     __tablename__ = "triplets"
     id: UUID4 = Field(default_factory=uuid.uuid4, primary_key=True)
@@ -78,3 +195,180 @@ class Graphs(SQLModel, table=True):
     language: str = Field(nullable=False)
     info: Optional[str] = Field(default=None, nullable=True)
     created_at: datetime = Field(default_factory=datetime.now)
+
+
+class SentenceParses(SQLModel, table=True):
+    __tablename__ = "sentence_parses"
+    id: UUID4 = Field(default_factory=uuid.uuid4, primary_key=True)
+    sentence_hash: str = Field(nullable=False, unique=True, index=True)
+    model_version: str = Field(nullable=False, index=True)
+    conllu: str = Field(nullable=False)
+    language: str = Field(nullable=False)
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+class Parses(SQLModel, table=True):
+    __tablename__ = "parses"
+    id: UUID4 = Field(default_factory=uuid.uuid4, primary_key=True)
+    description_id: UUID4 = Field(foreign_key="descriptions.id", unique=True, index=True)
+    model_version: str = Field(nullable=False)
+    sentence_count: int = Field(nullable=False, default=0)
+    # False when some sentences missed the parse time budget and are absent
+    # from `conllu`; such descriptions are re-parsed by rebuild_triplets
+    complete: bool = Field(nullable=False, default=True)
+    conllu: str = Field(nullable=False)
+    language: str = Field(nullable=False)
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+# MinHash signature of the stemmed text; workers rebuild their in-memory LSH
+# index from this table and pull rows newer than the last sync.
+class DescriptionMinhashes(SQLModel, table=True):
+    __tablename__ = "description_minhashes"
+    description_id: UUID4 = Field(primary_key=True)
+    language: str = Field(nullable=False)
+    signature: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    created_at: datetime = Field(default_factory=datetime.now, index=True)
+
+
+# Top-N nearest descriptions of other terms for every embedded description,
+# keyed for a primary-key range read; `neighbour_description_id` is indexed so
+# the lists that mention a changed description can be found and recomputed.
+class RelatedTerms(SQLModel, table=True):
+    __tablename__ = "related_terms"
+    description_id: UUID4 = Field(primary_key=True)
+    rank: int = Field(primary_key=True)
+    neighbour_description_id: UUID4 = Field(nullable=False, index=True)
+    neighbour_term_id: UUID4 = Field(nullable=False)
+    distance: float = Field(nullable=False)
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+# Append-only feed of embedding writes, filled by a trigger; in-process search
+# indexes replay it on top of their snapshot instead of re-reading the table.
+class EmbeddingChanges(SQLModel, table=True):
+    __tablename__ = "embedding_changes"
+    id: Optional[int] = Field(
+        default=None, sa_column=Column(BigInteger, Identity(), primary_key=True)
+    )
+    description_id: UUID4 = Field(nullable=False)
+    deleted: bool = Field(nullable=False, default=False)
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+# Write counter and time of the last write per table; conditional GETs derive
+# ETag and Last-Modified from it plus the not yet compacted `table_changes`.
+class TableVersions(SQLModel, table=True):
+    __tablename__ = "table_versions"
+    table_name: str = Field(primary_key=True)
+    version: int = Field(sa_column=Column(BigInteger, nullable=False))
+    updated_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+
+
+# One row per writing statement, inserted by a statement trigger. Writers only
+# append, so they never wait on each other's counter row; rows become visible
+# with the commit that wrote them, so a version is never ahead of the data.
+# They are periodically folded into `table_versions`.
+class TableChanges(SQLModel, table=True):
+    __tablename__ = "table_changes"
+    id: Optional[int] = Field(
+        default=None, sa_column=Column(BigInteger, Identity(), primary_key=True)
+    )
+    table_name: str = Field(nullable=False, index=True)
+    created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+
+
+VERSIONED_TABLES = (
+    "topics",
+    "terms",
+    "descriptions",
+    "triplets",
+    "graphs",
+    "embeddings",
+    "embedding_versions",
+    "related_terms",
+)
+
+
+# Idempotent DDL for databases created before a column or index was added;
+# fresh databases get the same objects from SQLModel.metadata.create_all.
+SCHEMA_MIGRATIONS = [
+    *(
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({_search_vector_expression('raw_text')}) STORED"
+        for table in ("terms", "descriptions")
+    ),
+    *(
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector "
+        f"ON {table} USING gin (search_vector)"
+        for table in ("terms", "descriptions")
+    ),
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS model_version varchar",
+    "ALTER TABLE parses ADD COLUMN IF NOT EXISTS complete boolean NOT NULL DEFAULT true",
+    "CREATE INDEX IF NOT EXISTS ix_embeddings_model_version ON embeddings (model_version)",
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM pg_indexes
+            WHERE indexname = 'ix_embeddings_description_id' AND indexdef LIKE 'CREATE UNIQUE%'
+        ) THEN
+            DROP INDEX ix_embeddings_description_id;
+            CREATE INDEX ix_embeddings_description_id ON embeddings (description_id);
+        END IF;
+    END
+    $$
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_embeddings_description_id_model_version "
+    "ON embeddings (description_id, model_version)",
+    "DROP INDEX IF EXISTS ix_embeddings_embedding_hnsw",
+    """
+    CREATE OR REPLACE FUNCTION log_embedding_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO embedding_changes (description_id, deleted, created_at)
+            VALUES (OLD.description_id, true, now());
+            RETURN OLD;
+        END IF;
+        INSERT INTO embedding_changes (description_id, deleted, created_at)
+        VALUES (NEW.description_id, false, now());
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS embeddings_change_feed ON embeddings",
+    "CREATE TRIGGER embeddings_change_feed AFTER INSERT OR UPDATE OR DELETE "
+    "ON embeddings FOR EACH ROW EXECUTE FUNCTION log_embedding_change()",
+    # per written table: append a change row and send one notification per
+    # transaction for response caches
+    """
+    CREATE OR REPLACE FUNCTION notify_dictionary_change() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO table_changes (table_name, created_at)
+        VALUES (TG_TABLE_NAME, clock_timestamp());
+        PERFORM pg_notify('dictionary_changes', TG_TABLE_NAME);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    *(
+        statement
+        for table in VERSIONED_TABLES
+        for statement in (
+            f"DROP TRIGGER IF EXISTS {table}_change_notify ON {table}",
+            f"CREATE TRIGGER {table}_change_notify "
+            f"AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION notify_dictionary_change()",
+        )
+    ),
+    "INSERT INTO table_versions (table_name, version, updated_at) "
+    f"SELECT unnest(ARRAY{list(VERSIONED_TABLES)}), 0, now() ON CONFLICT DO NOTHING",
+]
+
+for _quantization in EMBEDDING_SHADOW_COLUMNS:
+    _name, _type, _expression, _ops = SHADOW_COLUMNS[_quantization]
+    SCHEMA_MIGRATIONS += [
+        f"ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS {_name} {_type.compile()} "
+        f"GENERATED ALWAYS AS ({_expression}) STORED",
+        f"DROP INDEX IF EXISTS ix_embeddings_{_name}_hnsw",
+    ]
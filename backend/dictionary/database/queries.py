@@ -1,7 +1,28 @@
-from typing import Sequence, Optional, List
+import inspect
+import os
+from datetime import datetime, timedelta
+from typing import Sequence, Optional, List, Dict, Tuple
 from pydantic import UUID4
+from sqlalchemy import (
+    delete,
+    update,
+    func,
+    cast,
+    literal,
+    or_,
+    text,
+    true,
+    union_all,
+    Float,
+    Integer,
+    Text,
+    Uuid,
+)
+from sqlalchemy.dialects.postgresql import insert, aggregate_order_by, REGCONFIG, ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from sqlmodel import select
+from pgvector.sqlalchemy import Vector, HALFVEC
 from dictionary.database.models import (
     Topics,
     Terms,
@@ -9,7 +30,38 @@ from dictionary.database.models import (
     Embeddings,
     Triplets,
     Graphs,
+    SentenceParses,
+    Parses,
+    EmbeddingChanges,
+    EmbeddingVersions,
+    TableVersions,
+    TableChanges,
+    RelatedTerms,
+    DescriptionMinhashes,
+    EMBEDDING_DIM,
+    EMBEDDING_SHADOW_COLUMNS,
+    SHADOW_COLUMNS,
 )
+from dictionary.nlp.embeddings import get_active_version, get_stored_version_count
+from dictionary.misc.metrics import QUERY_SECONDS, timed
+
+
+EMBEDDING_SEARCH_QUANTIZATION = os.environ.get("EMBEDDING_SEARCH_QUANTIZATION", "none")
+if (
+    EMBEDDING_SEARCH_QUANTIZATION != "none"
+    and EMBEDDING_SEARCH_QUANTIZATION not in EMBEDDING_SHADOW_COLUMNS
+):
+    raise ValueError(
+        f"{EMBEDDING_SEARCH_QUANTIZATION=} needs a matching EMBEDDING_SHADOW_COLUMNS entry"
+    )
+EMBEDDING_RERANK_OVERFETCH = int(os.environ.get("EMBEDDING_RERANK_OVERFETCH", 10))
+# asyncpg allows at most 32767 bind parameters per statement; multi-row
+# inserts of unbounded size are split into chunks of this many rows
+INSERT_CHUNK_ROWS = int(os.environ.get("INSERT_CHUNK_ROWS", 1000))
+# an HNSW scan returns at most `hnsw.ef_search` rows whatever the LIMIT; the
+# default of 40 is kept as a floor, pgvector accepts up to 1000
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", 40))
+HNSW_EF_SEARCH_MAX = 1000
 
 
 async def save_topic(topic: Topics, session: AsyncSession) -> Topics:
@@ -141,8 +193,8 @@ async def delete_term_by_id(id: UUID4, session: AsyncSession) -> bool:
     if description:
         emb_stmt = select(Embeddings).where(Embeddings.description_id == description.id)
         emb_result = await session.execute(emb_stmt)
-        embedding = emb_result.scalars().first()
-        if embedding:
+        embeddings = emb_result.scalars().all()
+        for embedding in embeddings:
             await session.delete(embedding)
 
         trip_stmt = select(Triplets).where(Triplets.description_id == description.id)
@@ -157,6 +209,18 @@ async def delete_term_by_id(id: UUID4, session: AsyncSession) -> bool:
         if graph:
             await session.delete(graph)
 
+        parse_stmt = select(Parses).where(Parses.description_id == description.id)
+        parse_result = await session.execute(parse_stmt)
+        parse = parse_result.scalars().first()
+        if parse:
+            await session.delete(parse)
+
+        await session.execute(
+            delete(DescriptionMinhashes).where(
+                DescriptionMinhashes.description_id == description.id
+            )
+        )
+
         await session.flush()
 
         await session.delete(description)
@@ -192,6 +256,16 @@ async def save_description(
     return description
 
 
+async def save_descriptions(
+    descriptions: List[Descriptions], session: AsyncSession
+) -> List[Descriptions]:
+    session.add_all(descriptions)
+    await session.commit()
+    for description in descriptions:
+        await session.refresh(description)
+    return descriptions
+
+
 async def select_description_by_raw_text(
     raw_text: str, session: AsyncSession
 ) -> Optional[Descriptions]:
@@ -262,6 +336,112 @@ async def select_description_by_term_id(
     return result.scalars().first()
 
 
+async def select_descriptions_batch(
+    after_description_id: Optional[UUID4],
+    limit: int,
+    session: AsyncSession,
+    language: Optional[str] = None,
+    missing_version: Optional[str] = None,
+    incomplete_parse: bool = False,
+) -> Sequence[Descriptions]:
+    statement = select(Descriptions).order_by(Descriptions.id).limit(limit)
+    if after_description_id is not None:
+        statement = statement.where(Descriptions.id > after_description_id)
+    if language is not None:
+        statement = statement.where(Descriptions.language == language)
+    if missing_version is not None:
+        statement = statement.where(~has_embedding(missing_version))
+    if incomplete_parse:
+        statement = statement.where(
+            Descriptions.id.in_(select(Parses.description_id).where(Parses.complete.is_(False)))
+        )
+    result = await session.execute(statement)
+    return result.scalars().all()
+
+
+async def save_description_minhashes(
+    minhashes: List[DescriptionMinhashes], session: AsyncSession
+) -> None:
+    if not minhashes:
+        return
+    statement = insert(DescriptionMinhashes).values(
+        [minhash.model_dump() for minhash in minhashes]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["description_id"],
+        set_={
+            "language": statement.excluded.language,
+            "signature": statement.excluded.signature,
+            "created_at": statement.excluded.created_at,
+        },
+    )
+    await session.execute(statement)
+    await session.commit()
+
+
+async def select_description_minhashes(
+    session: AsyncSession, created_after: Optional[datetime] = None
+) -> Sequence[DescriptionMinhashes]:
+    statement = select(DescriptionMinhashes)
+    if created_after is not None:
+        statement = statement.where(DescriptionMinhashes.created_at > created_after)
+    result = await session.execute(statement)
+    return result.scalars().all()
+
+
+async def select_existing_description_ids(
+    description_ids: List[UUID4], session: AsyncSession
+) -> List[UUID4]:
+    if not description_ids:
+        return []
+    statement = select(Descriptions.id).where(Descriptions.id.in_(description_ids))
+    result = await session.execute(statement)
+    return list(result.scalars().all())
+
+
+async def select_description_ids_by_term_ids(
+    term_ids: List[UUID4], session: AsyncSession
+) -> Dict[UUID4, Optional[UUID4]]:
+    # every existing term of `term_ids` mapped to its description, if it has one
+    if not term_ids:
+        return {}
+    statement = (
+        select(Terms.id, Descriptions.id)
+        .outerjoin(Descriptions, Descriptions.term_id == Terms.id)
+        .where(Terms.id.in_(term_ids))
+    )
+    result = await session.execute(statement)
+    return dict(result.all())
+
+
+def has_embedding(model_version: str):
+    return (
+        select(Embeddings.id)
+        .where(
+            Embeddings.description_id == Descriptions.id,
+            Embeddings.model_version == model_version,
+        )
+        .exists()
+    )
+
+
+async def count_descriptions(
+    session: AsyncSession,
+    after_description_id: Optional[UUID4] = None,
+    language: Optional[str] = None,
+    missing_version: Optional[str] = None,
+) -> int:
+    statement = select(func.count()).select_from(Descriptions)
+    if after_description_id is not None:
+        statement = statement.where(Descriptions.id > after_description_id)
+    if language is not None:
+        statement = statement.where(Descriptions.language == language)
+    if missing_version is not None:
+        statement = statement.where(~has_embedding(missing_version))
+    result = await session.execute(statement)
+    return result.scalar()
+
+
 async def save_embedding(embedding: Embeddings, session: AsyncSession) -> Embeddings:
     session.add(embedding)
     await session.commit()
@@ -269,11 +449,29 @@ async def save_embedding(embedding: Embeddings, session: AsyncSession) -> Embedd
     return embedding
 
 
+async def upsert_embeddings(embeddings: List[Embeddings], session: AsyncSession) -> None:
+    if not embeddings:
+        return
+    statement = insert(Embeddings).values(
+        [embedding.model_dump() for embedding in embeddings]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["description_id", "model_version"],
+        set_={
+            "embedding": statement.excluded.embedding,
+            "language": statement.excluded.language,
+        },
+    )
+    await session.execute(statement)
+    await session.commit()
+
+
 async def select_embedding_by_description_id(description_id: UUID4, session: AsyncSession) -> Optional[Embeddings]:
     statement = (
         select(Embeddings)
         .where(
             Embeddings.description_id == description_id,
+            Embeddings.model_version == get_active_version(),
         )
         .limit(1)
     )
@@ -282,12 +480,95 @@ async def select_embedding_by_description_id(description_id: UUID4, session: Asy
 
 
 async def delete_embedding_by_description_id(description_id: UUID4, session: AsyncSession) -> bool:
-    embedding = await select_embedding_by_description_id(description_id=description_id, session=session)
-    if not embedding:
-        return False
-    await session.delete(embedding)
+    result = await session.execute(
+        delete(Embeddings).where(Embeddings.description_id == description_id)
+    )
     await session.commit()
-    return True
+    return result.rowcount > 0
+
+
+async def select_embeddings_batch(
+    after_description_id: Optional[UUID4], limit: int, session: AsyncSession
+) -> Sequence:
+    statement = (
+        select(Embeddings.description_id, Embeddings.embedding)
+        .where(Embeddings.model_version == get_active_version())
+        .order_by(Embeddings.description_id)
+        .limit(limit)
+    )
+    if after_description_id is not None:
+        statement = statement.where(Embeddings.description_id > after_description_id)
+    result = await session.execute(statement)
+    return result.all()
+
+
+async def select_embedding_vectors_batch(
+    after_id: Optional[UUID4], limit: int, session: AsyncSession
+) -> Sequence:
+    # every version, keyed by row id
+    statement = select(Embeddings.id, Embeddings.embedding).order_by(Embeddings.id).limit(limit)
+    if after_id is not None:
+        statement = statement.where(Embeddings.id > after_id)
+    result = await session.execute(statement)
+    return result.all()
+
+
+async def update_embedding_vectors(
+    vectors: Dict[UUID4, List[float]], session: AsyncSession
+) -> None:
+    if not vectors:
+        return
+    await session.execute(
+        update(Embeddings),
+        [{"id": id, "embedding": vector} for id, vector in vectors.items()],
+    )
+    await session.commit()
+
+
+async def select_embeddings_by_description_ids(
+    description_ids: List[UUID4], session: AsyncSession
+) -> Sequence:
+    if not description_ids:
+        return []
+    statement = select(Embeddings.description_id, Embeddings.embedding).where(
+        Embeddings.description_id.in_(description_ids),
+        Embeddings.model_version == get_active_version(),
+    )
+    result = await session.execute(statement)
+    return result.all()
+
+
+async def select_last_embedding_change_id(session: AsyncSession) -> int:
+    result = await session.execute(select(func.max(EmbeddingChanges.id)))
+    return result.scalar() or 0
+
+
+async def select_embedding_changes(
+    after_id: int, limit: int, session: AsyncSession
+) -> Sequence[EmbeddingChanges]:
+    statement = (
+        select(EmbeddingChanges)
+        .where(EmbeddingChanges.id > after_id)
+        .order_by(EmbeddingChanges.id)
+        .limit(limit)
+    )
+    result = await session.execute(statement)
+    return result.scalars().all()
+
+
+async def delete_embedding_changes(up_to_id: int, session: AsyncSession) -> None:
+    await session.execute(delete(EmbeddingChanges).where(EmbeddingChanges.id <= up_to_id))
+    await session.commit()
+
+
+async def delete_embedding_changes_older_than(seconds: float, session: AsyncSession) -> int:
+    result = await session.execute(
+        delete(EmbeddingChanges).where(
+            EmbeddingChanges.created_at < func.now() - timedelta(seconds=seconds)
+        )
+    )
+    await session.commit()
+    return result.rowcount
 
 
 async def save_triplet(triplet: Triplets, session: AsyncSession) -> Triplets:
@@ -359,20 +640,796 @@ async def select_graph_by_description_id(
     return result.scalars().first()
 
 
+async def select_sentence_parses_by_hashes(
+    sentence_hashes: List[str], session: AsyncSession
+) -> Sequence[SentenceParses]:
+    if not sentence_hashes:
+        return []
+    statement = select(SentenceParses).where(
+        SentenceParses.sentence_hash.in_(sentence_hashes),
+    )
+    result = await session.execute(statement)
+    return result.scalars().all()
+
+
+async def save_sentence_parses(
+    sentence_parses: List[SentenceParses], session: AsyncSession
+) -> None:
+    if not sentence_parses:
+        return
+    statement = (
+        insert(SentenceParses)
+        .values([sentence_parse.model_dump() for sentence_parse in sentence_parses])
+        .on_conflict_do_nothing(index_elements=["sentence_hash"])
+    )
+    await session.execute(statement)
+    await session.commit()
+
+
+async def save_parses(parses: List[Parses], session: AsyncSession) -> None:
+    if not parses:
+        return
+    statement = insert(Parses).values([parse.model_dump() for parse in parses])
+    statement = statement.on_conflict_do_update(
+        index_elements=["description_id"],
+        set_={
+            "model_version": statement.excluded.model_version,
+            "sentence_count": statement.excluded.sentence_count,
+            "complete": statement.excluded.complete,
+            "conllu": statement.excluded.conllu,
+            "language": statement.excluded.language,
+        },
+    )
+    await session.execute(statement)
+    await session.commit()
+
+
+async def select_parse_by_description_id(
+    description_id: UUID4, session: AsyncSession
+) -> Optional[Parses]:
+    statement = (
+        select(Parses)
+        .where(
+            Parses.description_id == description_id,
+        )
+        .limit(1)
+    )
+    result = await session.execute(statement)
+    return result.scalars().first()
+
+
+async def select_parses_batch(
+    after_description_id: Optional[UUID4],
+    limit: int,
+    session: AsyncSession,
+    language: Optional[str] = None,
+) -> Sequence[Parses]:
+    statement = select(Parses).order_by(Parses.description_id).limit(limit)
+    if after_description_id is not None:
+        statement = statement.where(Parses.description_id > after_description_id)
+    if language is not None:
+        statement = statement.where(Parses.language == language)
+    result = await session.execute(statement)
+    return result.scalars().all()
+
+
+async def replace_triplets_and_graphs(
+    triplets: List[Triplets], graphs: List[Graphs], session: AsyncSession
+) -> None:
+    if not graphs:
+        return
+
+    await session.execute(
+        delete(Triplets).where(
+            Triplets.description_id.in_([graph.description_id for graph in graphs])
+        )
+    )
+    for i in range(0, len(triplets), INSERT_CHUNK_ROWS):
+        await session.execute(
+            insert(Triplets).values(
+                [triplet.model_dump() for triplet in triplets[i:i + INSERT_CHUNK_ROWS]]
+            )
+        )
+
+    statement = insert(Graphs).values([graph.model_dump() for graph in graphs])
+    statement = statement.on_conflict_do_update(
+        index_elements=["description_id"],
+        set_={
+            "graph": statement.excluded.graph,
+            "triplet_count": statement.excluded.triplet_count,
+            "language": statement.excluded.language,
+        },
+    )
+    await session.execute(statement)
+    await session.commit()
+
+
+def embedding_distance(column, qv: List[float]):
+    # vectors are unit length, so the negative inner product ranks like cosine
+    # and L2 distance, costs a single dot product and is what the
+    # vector_ip_ops index serves; order by this, report `cosine_distance`
+    return column.op("<#>", return_type=Float)(qv)
+
+
+def cosine_distance(column, qv: List[float]):
+    return 1 + embedding_distance(column, qv)
+
+
+def query_vector(qv):
+    if isinstance(qv, list):
+        return cast(literal(qv, type_=Vector(EMBEDDING_DIM)), Vector(EMBEDDING_DIM))
+    return qv
+
+
+def quantized_distance(quantization: str, qv):
+    name = SHADOW_COLUMNS[quantization][0]
+    column = Embeddings.__table__.c[name]
+    if quantization == "halfvec":
+        return column.op("<#>", return_type=Float)(
+            cast(query_vector(qv), HALFVEC(EMBEDDING_DIM))
+        )
+    return column.op("<~>", return_type=Float)(func.binary_quantize(query_vector(qv)))
+
+
+def scan_depth(limit: int, quantization: str = EMBEDDING_SEARCH_QUANTIZATION) -> int:
+    # rows the index scan has to produce for `select_nearest_embeddings(limit)`
+    return limit if quantization == "none" else limit * EMBEDDING_RERANK_OVERFETCH
+
+
+async def set_scan_depth(rows: int, session: AsyncSession) -> None:
+    # for the current transaction only, so pooled connections keep the default.
+    # The index holds every stored version and the version filter runs after
+    # the scan, so while a backfill or a retired version shares the table only
+    # about 1/versions of the candidates belong to the version searched; that
+    # share varies per query, hence twice the proportional depth
+    ef_search = max(rows, HNSW_EF_SEARCH)
+    versions = get_stored_version_count()
+    if versions > 1:
+        ef_search *= versions * 2
+    ef_search = min(ef_search, HNSW_EF_SEARCH_MAX)
+    await session.execute(text(f"SET LOCAL hnsw.ef_search = {ef_search}"))
+
+
+def select_nearest_embeddings(
+    qv, limit, quantization: str = EMBEDDING_SEARCH_QUANTIZATION
+):
+    # `qv` and `limit` may be plain values or columns of an outer query (LATERAL)
+    if quantization == "none":
+        distance_expr = embedding_distance(Embeddings.embedding, qv)
+        return (
+            select(
+                Embeddings.description_id,
+                cosine_distance(Embeddings.embedding, qv).label("distance"),
+            )
+            .where(Embeddings.model_version == get_active_version())
+            .order_by(distance_expr)
+            .limit(limit)
+        )
+
+    first_pass = quantized_distance(quantization=quantization, qv=qv)
+    candidates = (
+        select(Embeddings.description_id, Embeddings.embedding)
+        .where(Embeddings.model_version == get_active_version())
+        .order_by(first_pass)
+        .limit(limit * EMBEDDING_RERANK_OVERFETCH)
+        .subquery("candidates")
+    )
+    distance_expr = embedding_distance(candidates.c.embedding, qv)
+    return (
+        select(
+            candidates.c.description_id,
+            cosine_distance(candidates.c.embedding, qv).label("distance"),
+        )
+        .order_by(distance_expr)
+        .limit(limit)
+    )
+
+
+def nearest_embeddings(
+    qv: List[float], limit: int, quantization: str = EMBEDDING_SEARCH_QUANTIZATION
+):
+    return select_nearest_embeddings(
+        qv=qv, limit=limit, quantization=quantization
+    ).subquery("nearest")
+
+
 async def search_terms_by_embedding(
     qv: List[float],
     k: int,
     session: AsyncSession
 ) -> Sequence[Terms]:
-    distance_expr = Embeddings.embedding.op("<->")(qv)
+    await set_scan_depth(scan_depth(k), session=session)
+    nearest = nearest_embeddings(qv=qv, limit=k)
 
     stmt = (
         select(Terms)
         .join(Descriptions, Descriptions.term_id == Terms.id)
-        .join(Embeddings, Embeddings.description_id == Descriptions.id)
+        .join(nearest, nearest.c.description_id == Descriptions.id)
+        .order_by(nearest.c.distance)
+        .limit(k)
+    )
+
+    result = await session.execute(stmt)
+    return result.scalars().all()
+
+
+async def search_terms_by_embeddings_batch(
+    qvs: List[List[float]], ks: List[int], session: AsyncSession
+) -> List[List[Terms]]:
+    if not qvs:
+        return []
+    await set_scan_depth(scan_depth(max(ks)), session=session)
+    queries = select(
+        func.unnest(literal(list(range(len(qvs))), type_=ARRAY(Integer))).label("position"),
+        cast(
+            func.unnest(
+                literal([str(list(map(float, qv))) for qv in qvs], type_=ARRAY(Text))
+            ),
+            Vector(EMBEDDING_DIM),
+        ).label("qv"),
+        func.unnest(literal(ks, type_=ARRAY(Integer))).label("k"),
+    ).subquery("queries")
+    nearest = select_nearest_embeddings(
+        qv=queries.c.qv, limit=queries.c.k
+    ).lateral("nearest")
+
+    statement = (
+        select(queries.c.position, Terms)
+        .select_from(queries)
+        .join(nearest, true())
+        .join(Descriptions, Descriptions.id == nearest.c.description_id)
+        .join(Terms, Terms.id == Descriptions.term_id)
+        .order_by(queries.c.position, nearest.c.distance)
+    )
+    result = await session.execute(statement)
+
+    terms_by_query: List[List[Terms]] = [[] for _ in qvs]
+    for position, term in result.all():
+        terms_by_query[position].append(term)
+    return terms_by_query
+
+
+async def select_similar_terms(
+    term_id: UUID4,
+    k: int,
+    depth: int,
+    session: AsyncSession,
+    topic_id: Optional[UUID4] = None,
+    language: Optional[str] = None,
+) -> Sequence[Terms]:
+    # every stored description vector of the term probes its own `depth` nearest
+    # descriptions; neighbours are ranked by their closest description. Topic
+    # and language filters only see the rows the HNSW scan returned, so a
+    # filtered probe scans as deep as pgvector allows
+    filtered = topic_id is not None or language is not None
+    await set_scan_depth(HNSW_EF_SEARCH_MAX if filtered else depth + 1, session=session)
+    source = aliased(Embeddings, name="source")
+    source_description = aliased(Descriptions, name="source_description")
+
+    distance_expr = embedding_distance(Embeddings.embedding, source.embedding)
+    candidates = (
+        select(
+            Descriptions.term_id,
+            cosine_distance(Embeddings.embedding, source.embedding).label("distance"),
+        )
+        .join(Descriptions, Descriptions.id == Embeddings.description_id)
+        .join(Terms, Terms.id == Descriptions.term_id)
+        .where(Terms.id != term_id, Embeddings.model_version == source.model_version)
+        .order_by(distance_expr)
+        .limit(depth)
+    )
+    if topic_id is not None:
+        candidates = candidates.where(Terms.topic_id == topic_id)
+    if language is not None:
+        candidates = candidates.where(Terms.language == language)
+    candidates = candidates.lateral("candidates")
+
+    similar = (
+        select(candidates.c.term_id, func.min(candidates.c.distance).label("distance"))
+        .select_from(source)
+        .join(source_description, source_description.id == source.description_id)
+        .join(candidates, true())
+        .where(
+            source_description.term_id == term_id,
+            source.model_version == get_active_version(),
+        )
+        .group_by(candidates.c.term_id)
+        .subquery("similar")
+    )
+    statement = (
+        select(Terms)
+        .join(similar, similar.c.term_id == Terms.id)
+        .order_by(similar.c.distance)
+        .limit(k)
+    )
+    result = await session.execute(statement)
+    return result.scalars().all()
+
+
+async def select_description_ids(
+    session: AsyncSession,
+    term_id: Optional[UUID4] = None,
+    topic_id: Optional[UUID4] = None,
+) -> List[UUID4]:
+    statement = select(Descriptions.id).join(Terms, Terms.id == Descriptions.term_id)
+    if term_id is not None:
+        statement = statement.where(Terms.id == term_id)
+    if topic_id is not None:
+        statement = statement.where(Terms.topic_id == topic_id)
+    result = await session.execute(statement)
+    return list(result.scalars().all())
+
+
+async def refresh_related_terms(
+    description_ids: List[UUID4], depth: int, session: AsyncSession
+) -> None:
+    if not description_ids:
+        return
+    await set_scan_depth(depth, session=session)
+    source = aliased(Embeddings, name="source")
+    source_description = aliased(Descriptions, name="source_description")
+
+    distance_expr = embedding_distance(Embeddings.embedding, source.embedding)
+    neighbours = (
+        select(
+            Embeddings.description_id.label("neighbour_description_id"),
+            Descriptions.term_id.label("neighbour_term_id"),
+            cosine_distance(Embeddings.embedding, source.embedding).label("distance"),
+        )
+        .join(Descriptions, Descriptions.id == Embeddings.description_id)
+        .where(
+            Descriptions.term_id != source_description.term_id,
+            Embeddings.model_version == source.model_version,
+        )
         .order_by(distance_expr)
+        .limit(depth)
+        .lateral("neighbours")
+    )
+    ranked = (
+        select(
+            source.description_id,
+            func.row_number()
+            .over(partition_by=source.description_id, order_by=neighbours.c.distance)
+            .label("rank"),
+            neighbours.c.neighbour_description_id,
+            neighbours.c.neighbour_term_id,
+            neighbours.c.distance,
+            func.now(),
+        )
+        .select_from(source)
+        .join(source_description, source_description.id == source.description_id)
+        .join(neighbours, true())
+        .where(
+            source.description_id.in_(description_ids),
+            source.model_version == get_active_version(),
+        )
+    )
+
+    await session.execute(
+        delete(RelatedTerms).where(RelatedTerms.description_id.in_(description_ids))
+    )
+    await session.execute(
+        insert(RelatedTerms).from_select(
+            [
+                "description_id",
+                "rank",
+                "neighbour_description_id",
+                "neighbour_term_id",
+                "distance",
+                "created_at",
+            ],
+            ranked,
+        )
+    )
+    await session.commit()
+
+
+async def select_reverse_related_terms(
+    neighbour_description_ids: List[UUID4], session: AsyncSession
+) -> List[UUID4]:
+    if not neighbour_description_ids:
+        return []
+    statement = (
+        select(RelatedTerms.description_id)
+        .where(RelatedTerms.neighbour_description_id.in_(neighbour_description_ids))
+        .distinct()
+    )
+    result = await session.execute(statement)
+    return list(result.scalars().all())
+
+
+async def select_related_terms_admitting(
+    description_id: UUID4, depth: int, candidates: int, session: AsyncSession
+) -> List[UUID4]:
+    # lists that are short or whose farthest neighbour is farther than this
+    # description. No index answers reverse kNN, so only the `candidates`
+    # nearest descriptions are checked: a list that should take the new vector
+    # in almost always belongs to one of them
+    active_version = get_active_version()
+    target_embedding = (
+        select(Embeddings.embedding)
+        .where(
+            Embeddings.description_id == description_id,
+            Embeddings.model_version == active_version,
+        )
+        .scalar_subquery()
+    )
+    target_term_id = (
+        select(Descriptions.term_id).where(Descriptions.id == description_id).scalar_subquery()
+    )
+    await set_scan_depth(candidates + 1, session=session)
+    nearest = (
+        select(
+            Embeddings.description_id,
+            cosine_distance(Embeddings.embedding, target_embedding).label("distance"),
+        )
+        .join(Descriptions, Descriptions.id == Embeddings.description_id)
+        .where(
+            Embeddings.model_version == active_version,
+            Descriptions.term_id != target_term_id,
+        )
+        .order_by(embedding_distance(Embeddings.embedding, target_embedding))
+        .limit(candidates)
+        .cte("nearest")
+    )
+    worst = (
+        select(
+            RelatedTerms.description_id,
+            func.count().label("count"),
+            func.max(RelatedTerms.distance).label("worst"),
+        )
+        .where(RelatedTerms.description_id.in_(select(nearest.c.description_id)))
+        .group_by(RelatedTerms.description_id)
+        .subquery("worst")
+    )
+    statement = (
+        select(nearest.c.description_id)
+        .outerjoin(worst, worst.c.description_id == nearest.c.description_id)
+        .where(
+            or_(
+                worst.c.count.is_(None),
+                worst.c.count < depth,
+                nearest.c.distance < worst.c.worst,
+            )
+        )
+    )
+    result = await session.execute(statement)
+    return list(result.scalars().all())
+
+
+async def delete_related_terms(description_ids: List[UUID4], session: AsyncSession) -> None:
+    if not description_ids:
+        return
+    await session.execute(
+        delete(RelatedTerms).where(
+            or_(
+                RelatedTerms.description_id.in_(description_ids),
+                RelatedTerms.neighbour_description_id.in_(description_ids),
+            )
+        )
+    )
+    await session.commit()
+
+
+async def select_related_terms_by_term_id(
+    term_id: UUID4, k: int, session: AsyncSession
+) -> Sequence[Terms]:
+    related = (
+        select(
+            RelatedTerms.neighbour_term_id,
+            func.min(RelatedTerms.distance).label("distance"),
+        )
+        .join(Descriptions, Descriptions.id == RelatedTerms.description_id)
+        .where(Descriptions.term_id == term_id)
+        .group_by(RelatedTerms.neighbour_term_id)
+        .subquery("related")
+    )
+    statement = (
+        select(Terms)
+        .join(related, related.c.neighbour_term_id == Terms.id)
+        .order_by(related.c.distance)
+        .limit(k)
+    )
+    result = await session.execute(statement)
+    return result.scalars().all()
+
+
+def search_results_statement(nearest, triplet_limit: int = 0):
+    statement = (
+        select(
+            Terms.id.label("term_id"),
+            Terms.raw_text.label("term"),
+            Terms.language,
+            Descriptions.id.label("description_id"),
+            Descriptions.raw_text.label("definition"),
+            nearest.c.distance,
+        )
+        .select_from(nearest)
+        .join(Descriptions, Descriptions.id == nearest.c.description_id)
+        .join(Terms, Terms.id == Descriptions.term_id)
+        .order_by(nearest.c.distance)
+    )
+    if triplet_limit:
+        triplet_text = func.concat_ws(" ", Triplets.subject, Triplets.predicate, Triplets.object)
+        summary = (
+            select(
+                func.array_agg(
+                    aggregate_order_by(triplet_text, Triplets.position, Triplets.id),
+                    type_=ARRAY(Text),
+                )[1:triplet_limit]
+            )
+            .where(Triplets.description_id == Descriptions.id)
+            .scalar_subquery()
+        )
+        statement = statement.add_columns(summary.label("triplets"))
+    return statement
+
+
+async def search_results_by_embedding(
+    qv: List[float], k: int, session: AsyncSession, triplet_limit: int = 0
+) -> Sequence:
+    await set_scan_depth(scan_depth(k), session=session)
+    nearest = nearest_embeddings(qv=qv, limit=k)
+    result = await session.execute(
+        search_results_statement(nearest=nearest, triplet_limit=triplet_limit)
+    )
+    return result.all()
+
+
+async def select_search_results(
+    hits: List[Tuple[UUID4, float]], session: AsyncSession, triplet_limit: int = 0
+) -> Sequence:
+    if not hits:
+        return []
+    nearest = select(
+        func.unnest(
+            literal([description_id for description_id, _ in hits], type_=ARRAY(Uuid))
+        ).label("description_id"),
+        func.unnest(
+            literal([distance for _, distance in hits], type_=ARRAY(Float))
+        ).label("distance"),
+    ).subquery("nearest")
+    result = await session.execute(
+        search_results_statement(nearest=nearest, triplet_limit=triplet_limit)
+    )
+    return result.all()
+
+
+async def select_terms_by_description_ids(
+    description_ids: List[UUID4], session: AsyncSession
+) -> Dict[UUID4, Terms]:
+    if not description_ids:
+        return {}
+    statement = (
+        select(Descriptions.id, Terms)
+        .join(Terms, Terms.id == Descriptions.term_id)
+        .where(Descriptions.id.in_(description_ids))
+    )
+    result = await session.execute(statement)
+    return {description_id: term for description_id, term in result.all()}
+
+
+async def search_terms_hybrid(
+    query: str,
+    qv: List[float],
+    language: str,
+    k: int,
+    lexical_depth: int,
+    vector_depth: int,
+    session: AsyncSession,
+    rrf_k: int = 60,
+) -> Sequence[Terms]:
+    terms_search_vector = Terms.__table__.c.search_vector
+    descriptions_search_vector = Descriptions.__table__.c.search_vector
+    tsquery = func.websearch_to_tsquery(cast(language, REGCONFIG), query).op("||")(
+        func.websearch_to_tsquery(cast("simple", REGCONFIG), query)
+    )
+    # one candidate query per table, so each is served by its own GIN index;
+    # a term matching in both gets both scores
+    terms_score = func.ts_rank_cd(terms_search_vector, tsquery) * 2
+    descriptions_score = func.ts_rank_cd(descriptions_search_vector, tsquery)
+    lexical_matches = union_all(
+        select(Terms.id.label("term_id"), terms_score.label("score"))
+        .where(terms_search_vector.op("@@")(tsquery))
+        .order_by(terms_score.desc())
+        .limit(lexical_depth),
+        select(Descriptions.term_id.label("term_id"), descriptions_score.label("score"))
+        .where(descriptions_search_vector.op("@@")(tsquery))
+        .order_by(descriptions_score.desc())
+        .limit(lexical_depth),
+    ).subquery("lexical_matches")
+    lexical_score = func.sum(lexical_matches.c.score)
+    lexical_candidates = (
+        select(lexical_matches.c.term_id, lexical_score.label("score"))
+        .group_by(lexical_matches.c.term_id)
+        .order_by(lexical_score.desc())
+        .limit(lexical_depth)
+        .subquery("lexical_candidates")
+    )
+    lexical = select(
+        lexical_candidates.c.term_id,
+        func.row_number()
+        .over(order_by=lexical_candidates.c.score.desc())
+        .label("rank"),
+    ).cte("lexical")
+
+    await set_scan_depth(scan_depth(vector_depth), session=session)
+    nearest = nearest_embeddings(qv=qv, limit=vector_depth)
+    vector_candidates = (
+        select(Descriptions.term_id.label("term_id"), nearest.c.distance)
+        .join(nearest, nearest.c.description_id == Descriptions.id)
+        .subquery("vector_candidates")
+    )
+    vector = select(
+        vector_candidates.c.term_id,
+        func.row_number()
+        .over(order_by=vector_candidates.c.distance)
+        .label("rank"),
+    ).cte("vector")
+
+    fused = (
+        select(
+            func.coalesce(lexical.c.term_id, vector.c.term_id).label("term_id"),
+            (
+                func.coalesce(literal(1.0) / (rrf_k + lexical.c.rank), 0.0)
+                + func.coalesce(literal(1.0) / (rrf_k + vector.c.rank), 0.0)
+            ).label("score"),
+        )
+        .select_from(
+            lexical.join(vector, lexical.c.term_id == vector.c.term_id, full=True)
+        )
+        .subquery("fused")
+    )
+
+    stmt = (
+        select(Terms)
+        .join(fused, fused.c.term_id == Terms.id)
+        .order_by(fused.c.score.desc())
         .limit(k)
     )
 
     result = await session.execute(stmt)
     return result.scalars().all()
+
+
+async def select_embedding_versions(session: AsyncSession) -> Sequence[EmbeddingVersions]:
+    result = await session.execute(
+        select(EmbeddingVersions).order_by(EmbeddingVersions.created_at)
+    )
+    return result.scalars().all()
+
+
+async def save_embedding_version(version: EmbeddingVersions, session: AsyncSession) -> None:
+    await session.execute(
+        insert(EmbeddingVersions).values(version.model_dump()).on_conflict_do_nothing()
+    )
+    await session.commit()
+
+
+async def assign_unversioned_embeddings(model_version: str, session: AsyncSession) -> int:
+    # rows written before embeddings were versioned
+    result = await session.execute(
+        update(Embeddings)
+        .where(Embeddings.model_version.is_(None))
+        .values(model_version=model_version)
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def select_embedding_version_counts(session: AsyncSession) -> Dict[str, int]:
+    result = await session.execute(
+        select(Embeddings.model_version, func.count()).group_by(Embeddings.model_version)
+    )
+    return dict(result.all())
+
+
+async def activate_embedding_version(model_version: str, session: AsyncSession) -> int:
+    # versions are locked so the coverage check and the switch see the same
+    # state; returns the number of descriptions still missing a vector
+    await session.execute(select(EmbeddingVersions).with_for_update())
+    missing = await count_descriptions(missing_version=model_version, session=session)
+    if missing:
+        await session.rollback()
+        return missing
+    await session.execute(
+        update(EmbeddingVersions)
+        .where(EmbeddingVersions.status == "active")
+        .values(status="retired")
+    )
+    await session.execute(
+        update(EmbeddingVersions)
+        .where(EmbeddingVersions.model_version == model_version)
+        .values(status="active", activated_at=datetime.now())
+    )
+    await session.commit()
+    return 0
+
+
+async def delete_embeddings_by_version(
+    model_version: str, limit: int, session: AsyncSession
+) -> int:
+    batch = (
+        select(Embeddings.id)
+        .where(Embeddings.model_version == model_version)
+        .limit(limit)
+        .scalar_subquery()
+    )
+    result = await session.execute(delete(Embeddings).where(Embeddings.id.in_(batch)))
+    await session.commit()
+    return result.rowcount
+
+
+async def delete_embedding_version(model_version: str, session: AsyncSession) -> None:
+    await session.execute(
+        delete(EmbeddingVersions).where(EmbeddingVersions.model_version == model_version)
+    )
+    await session.commit()
+
+
+async def select_table_versions(tables: Sequence[str], session: AsyncSession) -> Sequence:
+    # one statement, so a concurrent compaction is seen entirely or not at all
+    changes = (
+        select(
+            TableChanges.table_name,
+            func.count().label("count"),
+            func.max(TableChanges.created_at).label("updated_at"),
+        )
+        .where(TableChanges.table_name.in_(tables))
+        .group_by(TableChanges.table_name)
+        .subquery("changes")
+    )
+    statement = (
+        select(
+            TableVersions.table_name,
+            (TableVersions.version + func.coalesce(changes.c.count, 0)).label("version"),
+            func.greatest(TableVersions.updated_at, changes.c.updated_at).label("updated_at"),
+        )
+        .outerjoin(changes, changes.c.table_name == TableVersions.table_name)
+        .where(TableVersions.table_name.in_(tables))
+    )
+    result = await session.execute(statement)
+    return result.all()
+
+
+async def compact_table_changes(session: AsyncSession) -> int:
+    # committed change rows move into the counters in one transaction; rows of
+    # transactions still in flight are not visible and stay for the next run
+    moved = (
+        delete(TableChanges)
+        .returning(TableChanges.table_name, TableChanges.created_at)
+        .cte("moved")
+    )
+    counts = (
+        select(
+            moved.c.table_name,
+            func.count().label("count"),
+            func.max(moved.c.created_at).label("updated_at"),
+        )
+        .group_by(moved.c.table_name)
+        .subquery("counts")
+    )
+    result = await session.execute(
+        update(TableVersions)
+        .where(TableVersions.table_name == counts.c.table_name)
+        .values(
+            version=TableVersions.version + counts.c.count,
+            updated_at=func.greatest(TableVersions.updated_at, counts.c.updated_at),
+        )
+        .returning(counts.c.count)
+        .execution_options(synchronize_session=False)
+    )
+    compacted = sum(result.scalars().all())
+    await session.commit()
+    return compacted
+
+
+# every query function reports its duration; wrapped here rather than one by
+# one so new queries are covered too
+for _name, _function in list(globals().items()):
+    if (
+        inspect.isfunction(_function)
+        and inspect.iscoroutinefunction(_function)
+        and _function.__module__ == __name__
+    ):
+        globals()[_name] = timed(QUERY_SECONDS, _name)(_function)
@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import time
+from typing import Optional
+from loguru import logger
+from sqlalchemy import text
+from dictionary.database.engine import engine
+from dictionary.database.models import VECTOR_INDEXES
+
+
+async def build_vector_indexes(drop_unused: bool, maintenance_work_mem: Optional[str]) -> None:
+    async with engine.connect() as conn:
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if maintenance_work_mem:
+            await conn.execute(
+                text("SELECT set_config('maintenance_work_mem', :value, false)"),
+                {"value": maintenance_work_mem},
+            )
+        rows = (
+            await conn.execute(
+                text(
+                    "SELECT c.relname, i.indisvalid, am.amname FROM pg_index i "
+                    "JOIN pg_class c ON c.oid = i.indexrelid "
+                    "JOIN pg_am am ON am.oid = c.relam "
+                    "WHERE i.indrelid = 'embeddings'::regclass"
+                )
+            )
+        ).all()
+        existing = {name: valid for name, valid, _ in rows}
+
+        for name, definition in VECTOR_INDEXES.items():
+            if existing.get(name):
+                logger.info(f"{name} exists")
+                continue
+            if name in existing:
+                # left behind by an interrupted concurrent build
+                logger.warning(f"{name} is invalid, rebuilding")
+                await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            started = time.perf_counter()
+            logger.info(f"Building {name}")
+            await conn.execute(text(f"CREATE INDEX CONCURRENTLY {name} ON {definition}"))
+            logger.info(f"Built {name} in {time.perf_counter() - started:.1f}s")
+
+        if drop_unused:
+            for name, _, method in rows:
+                if method == "hnsw" and name not in VECTOR_INDEXES:
+                    logger.info(f"Dropping {name}, not used by this configuration")
+                    await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Build the HNSW indexes of the embeddings table without blocking writes"
+    )
+    p.add_argument(
+        "--drop-unused",
+        action="store_true",
+        help="Drop HNSW indexes the current configuration does not use",
+    )
+    p.add_argument(
+        "--maintenance-work-mem",
+        default=None,
+        help="maintenance_work_mem for the builds, e.g. 2GB; HNSW builds are much "
+        "faster when the graph fits in it",
+    )
+    args = p.parse_args()
+
+    asyncio.run(
+        build_vector_indexes(
+            drop_unused=args.drop_unused, maintenance_work_mem=args.maintenance_work_mem
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from loguru import logger
+from dictionary.database.engine import async_session
+from dictionary.database.queries import (
+    select_embedding_versions,
+    select_embedding_version_counts,
+    count_descriptions,
+    activate_embedding_version,
+    delete_embeddings_by_version,
+    delete_embedding_version,
+)
+from dictionary.background_tasks.background_embedding_versions import (
+    EMBEDDING_VERSION_REFRESH_SECONDS,
+    refresh_embedding_versions,
+)
+
+
+async def status() -> None:
+    async with async_session() as session:
+        versions = await select_embedding_versions(session=session)
+        counts = await select_embedding_version_counts(session=session)
+        total = await count_descriptions(session=session)
+    for version in versions:
+        rows = counts.get(version.model_version, 0)
+        logger.info(
+            f"{version.model_version}: {version.status}, {rows}/{total} descriptions "
+            f"({100 * rows / max(1, total):.1f}%)"
+        )
+
+
+async def activate(model_version: str) -> None:
+    async with async_session() as session:
+        versions = {
+            version.model_version: version
+            for version in await select_embedding_versions(session=session)
+        }
+        if model_version not in versions:
+            raise SystemExit(f"Unknown embedding version {model_version}")
+        if versions[model_version].status == "active":
+            logger.info(f"{model_version} is already active")
+            return
+        missing = await activate_embedding_version(
+            model_version=model_version, session=session
+        )
+    if missing:
+        raise SystemExit(
+            f"{missing} descriptions have no {model_version} vector yet; "
+            f"run dictionary.jobs.reembed --missing-only first"
+        )
+    logger.info(
+        f"Activated {model_version}; workers switch within "
+        f"{EMBEDDING_VERSION_REFRESH_SECONDS:.0f}s"
+    )
+
+
+async def gc(batch_size: int, grace_seconds: float) -> None:
+    async with async_session() as session:
+        versions = await select_embedding_versions(session=session)
+    active = next(version for version in versions if version.status == "active")
+    # workers that have not refreshed yet still search the previous version
+    if active.activated_at and datetime.now() - active.activated_at < timedelta(
+        seconds=grace_seconds
+    ):
+        raise SystemExit(f"{active.model_version} was activated less than {grace_seconds}s ago")
+
+    for version in versions:
+        if version.status != "retired":
+            continue
+        deleted = 0
+        while True:
+            async with async_session() as session:
+                batch = await delete_embeddings_by_version(
+                    model_version=version.model_version, limit=batch_size, session=session
+                )
+            if not batch:
+                break
+            deleted += batch
+            logger.info(f"{version.model_version}: deleted {deleted} vectors")
+        async with async_session() as session:
+            await delete_embedding_version(
+                model_version=version.model_version, session=session
+            )
+        logger.info(f"Removed {version.model_version}")
+
+
+async def run(args) -> None:
+    await refresh_embedding_versions()
+    if args.command == "status":
+        await status()
+    elif args.command == "activate":
+        await activate(model_version=args.model_version)
+    elif args.command == "gc":
+        await gc(batch_size=args.batch_size, grace_seconds=args.grace_seconds)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Inspect, switch and clean up embedding versions")
+    commands = p.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Coverage of every version")
+    activate_parser = commands.add_parser(
+        "activate", help="Switch searches to a fully back-filled version"
+    )
+    activate_parser.add_argument("model_version")
+    gc_parser = commands.add_parser("gc", help="Delete the vectors of retired versions")
+    gc_parser.add_argument("--batch-size", type=int, default=5000, help="Rows per delete")
+    gc_parser.add_argument(
+        "--grace-seconds",
+        type=float,
+        default=3 * EMBEDDING_VERSION_REFRESH_SECONDS,
+        help="Minimum age of the active version before old vectors are dropped",
+    )
+    args = p.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
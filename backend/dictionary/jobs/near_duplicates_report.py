@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import json
+import time
+from typing import Optional, Dict
+from loguru import logger
+from pydantic import UUID4
+from dictionary.database.engine import async_session
+from dictionary.database.queries import select_descriptions_batch
+from dictionary.nlp.minhash import NEAR_DUPLICATE_THRESHOLD, LSHIndex, similarity
+from dictionary.background_tasks.background_near_duplicates import (
+    minhash_signature,
+    register_minhashes,
+)
+
+
+async def near_duplicates_report(
+    batch_size: int, threshold: float, store: bool, output: Optional[str]
+) -> None:
+    indexes: Dict[str, LSHIndex] = {}
+    texts: Dict[UUID4, str] = {}
+    after_description_id: Optional[UUID4] = None
+    started = time.perf_counter()
+
+    while True:
+        async with async_session() as session:
+            descriptions = await select_descriptions_batch(
+                after_description_id=after_description_id,
+                limit=batch_size,
+                session=session,
+            )
+        if not descriptions:
+            break
+        for description in descriptions:
+            indexes.setdefault(description.language, LSHIndex()).add(
+                description.id, minhash_signature(description.stemmed_text)
+            )
+            texts[description.id] = description.raw_text
+        if store:
+            await register_minhashes(descriptions_objects=list(descriptions))
+        after_description_id = descriptions[-1].id
+
+    report = []
+    for language, index in indexes.items():
+        for cluster in index.clusters(threshold=threshold):
+            head = index.signatures[cluster[0]]
+            report.append(
+                {
+                    "language": language,
+                    "size": len(cluster),
+                    "descriptions": [
+                        {
+                            "id": str(description_id),
+                            "similarity": round(
+                                similarity(head, index.signatures[description_id]), 3
+                            ),
+                            "raw_text": texts[description_id],
+                        }
+                        for description_id in cluster
+                    ],
+                }
+            )
+    report.sort(key=lambda cluster: -cluster["size"])
+
+    for cluster in report:
+        logger.info(f"{cluster['language']}: {cluster['size']} near-duplicates")
+        for description in cluster["descriptions"]:
+            logger.info(f"  {description['similarity']:.2f} {description['raw_text'][:100]!r}")
+    logger.info(
+        f"{len(report)} clusters covering {sum(c['size'] for c in report)} of {len(texts)} "
+        f"descriptions in {time.perf_counter() - started:.1f}s"
+    )
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Cluster near-duplicate descriptions with MinHash LSH"
+    )
+    p.add_argument("--batch-size", type=int, default=1000, help="Descriptions per batch")
+    p.add_argument(
+        "--threshold",
+        type=float,
+        default=NEAR_DUPLICATE_THRESHOLD,
+        help="Estimated Jaccard similarity of stemmed shingles",
+    )
+    p.add_argument(
+        "--store",
+        action="store_true",
+        help="Also persist signatures so ingestion checks cover existing descriptions",
+    )
+    p.add_argument("--output", default=None, help="Write clusters to this JSON file")
+    args = p.parse_args()
+
+    asyncio.run(
+        near_duplicates_report(
+            batch_size=args.batch_size,
+            threshold=args.threshold,
+            store=args.store,
+            output=args.output,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
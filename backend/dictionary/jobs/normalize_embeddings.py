@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import time
+import numpy as np
+from loguru import logger
+from dictionary.database.engine import async_session
+from dictionary.database.queries import (
+    select_embedding_vectors_batch,
+    update_embedding_vectors,
+)
+from dictionary.nlp.embeddings import normalize_vectors
+
+
+async def normalize_embeddings(batch_size: int, tolerance: float) -> None:
+    after_id = None
+    scanned = updated = 0
+    started = time.perf_counter()
+
+    while True:
+        async with async_session() as session:
+            rows = await select_embedding_vectors_batch(
+                after_id=after_id, limit=batch_size, session=session
+            )
+            if not rows:
+                break
+            after_id = rows[-1].id
+            scanned += len(rows)
+
+            matrix = np.asarray([row.embedding for row in rows], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1)
+            # already unit length, or all zero: nothing to rewrite
+            stale = (np.abs(norms - 1.0) > tolerance) & (norms > 0)
+            if stale.any():
+                stale_ids = [row.id for row, is_stale in zip(rows, stale) if is_stale]
+                await update_embedding_vectors(
+                    vectors=dict(zip(stale_ids, normalize_vectors(matrix[stale]))),
+                    session=session,
+                )
+                updated += len(stale_ids)
+
+        logger.info(
+            f"{scanned} vectors scanned, {updated} normalized "
+            f"({scanned / (time.perf_counter() - started):.1f}/s)"
+        )
+
+    logger.info(f"Done: {updated} of {scanned} vectors normalized")
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="One-off migration: L2-normalize stored embeddings in place"
+    )
+    p.add_argument("--batch-size", type=int, default=1000, help="Rows per update")
+    p.add_argument(
+        "--tolerance", type=float, default=1e-4, help="Allowed deviation of the norm from 1"
+    )
+    args = p.parse_args()
+
+    asyncio.run(normalize_embeddings(batch_size=args.batch_size, tolerance=args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
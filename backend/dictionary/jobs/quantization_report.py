@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import time
+from typing import List, Dict
+from loguru import logger
+from sqlalchemy import text, func
+from sqlmodel import select
+from dictionary.database.engine import async_session
+from dictionary.database.models import Embeddings, EMBEDDING_SHADOW_COLUMNS
+from dictionary.database.queries import nearest_embeddings
+from dictionary.nlp.embeddings import get_active_version
+from dictionary.background_tasks.background_embedding_versions import refresh_embedding_versions
+
+
+async def top_k(qv: List[float], k: int, quantization: str, exact: bool) -> List:
+    async with async_session() as session:
+        if exact:
+            # force a sequential scan so the ground truth is not itself approximate
+            await session.execute(text("SET LOCAL enable_indexscan = off"))
+            await session.execute(text("SET LOCAL enable_bitmapscan = off"))
+        nearest = nearest_embeddings(qv=qv, limit=k, quantization=quantization)
+        result = await session.execute(select(nearest.c.description_id))
+        return list(result.scalars().all())
+
+
+async def index_sizes() -> Dict[str, int]:
+    async with async_session() as session:
+        result = await session.execute(
+            text(
+                "SELECT indexname, pg_relation_size(quote_ident(indexname)::regclass) "
+                "FROM pg_indexes WHERE tablename = 'embeddings'"
+            )
+        )
+        return dict(result.all())
+
+
+async def quantization_report(queries: int, k: int) -> None:
+    await refresh_embedding_versions()
+    async with async_session() as session:
+        result = await session.execute(
+            select(Embeddings.embedding)
+            .where(Embeddings.model_version == get_active_version())
+            .order_by(func.random())
+            .limit(queries)
+        )
+        sample = [list(map(float, embedding)) for embedding in result.scalars().all()]
+    if not sample:
+        logger.error("No embeddings to sample queries from")
+        return
+
+    modes = ["none", *EMBEDDING_SHADOW_COLUMNS]
+    recall = {mode: 0.0 for mode in modes}
+    seconds = {mode: 0.0 for mode in modes}
+    for qv in sample:
+        truth = set(await top_k(qv=qv, k=k, quantization="none", exact=True))
+        for mode in modes:
+            started = time.perf_counter()
+            found = await top_k(qv=qv, k=k, quantization=mode, exact=False)
+            seconds[mode] += time.perf_counter() - started
+            recall[mode] += len(truth.intersection(found)) / max(1, len(truth))
+
+    for mode in modes:
+        logger.info(
+            f"{mode}: recall@{k}={recall[mode] / len(sample):.3f}, "
+            f"{1000 * seconds[mode] / len(sample):.1f} ms/query"
+        )
+    for name, size in sorted((await index_sizes()).items()):
+        logger.info(f"{name}: {size / 2 ** 20:.1f} MiB")
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Compare recall@k and index size of quantized embedding search"
+    )
+    p.add_argument("--queries", type=int, default=100, help="Sampled query vectors")
+    p.add_argument("-k", type=int, default=10, help="Neighbours per query")
+    args = p.parse_args()
+
+    asyncio.run(quantization_report(queries=args.queries, k=args.k))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import asyncio
+import time
+from loguru import logger
+from dictionary.database.engine import async_session
+from dictionary.database.queries import select_embeddings_batch, refresh_related_terms
+from dictionary.background_tasks.background_related_terms import RELATED_TERMS_N
+from dictionary.background_tasks.background_embedding_versions import refresh_embedding_versions
+
+
+async def rebuild_related_terms(batch_size: int, depth: int) -> None:
+    await refresh_embedding_versions()
+    after_description_id = None
+    processed = 0
+    started = time.perf_counter()
+
+    while True:
+        async with async_session() as session:
+            rows = await select_embeddings_batch(
+                after_description_id=after_description_id,
+                limit=batch_size,
+                session=session,
+            )
+            if not rows:
+                break
+            description_ids = [row.description_id for row in rows]
+            await refresh_related_terms(
+                description_ids=description_ids, depth=depth, session=session
+            )
+
+        after_description_id = description_ids[-1]
+        processed += len(description_ids)
+        elapsed = time.perf_counter() - started
+        logger.info(f"Related terms for {processed} descriptions ({processed / elapsed:.1f}/s)")
+
+    logger.info(f"Done: {processed} descriptions in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Recompute the related_terms table for every embedded description"
+    )
+    p.add_argument("--batch-size", type=int, default=200, help="Descriptions per batch")
+    p.add_argument(
+        "--depth", type=int, default=RELATED_TERMS_N, help="Neighbours kept per description"
+    )
+    args = p.parse_args()
+
+    asyncio.run(rebuild_related_terms(batch_size=args.batch_size, depth=args.depth))
+
+
+if __name__ == "__main__":
+    main()
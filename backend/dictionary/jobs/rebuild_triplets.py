@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import time
+from typing import Optional, Dict
+from loguru import logger
+from pydantic import UUID4
+from dictionary.database.engine import async_session
+from dictionary.database.queries import select_descriptions_batch
+from dictionary.nlp.languages import Lang
+from dictionary.background_tasks.background_triplets import create_triplets_and_graphs_batch
+
+
+async def rebuild_triplets(
+    batch_size: int, language: Optional[Lang] = None, incomplete_only: bool = False
+) -> None:
+    after_description_id: Optional[UUID4] = None
+    processed = 0
+    started = time.perf_counter()
+
+    while True:
+        async with async_session() as session:
+            descriptions = await select_descriptions_batch(
+                after_description_id=after_description_id,
+                limit=batch_size,
+                language=language.value if language else None,
+                incomplete_parse=incomplete_only,
+                session=session,
+            )
+        if not descriptions:
+            break
+
+        texts_by_lang: Dict[Lang, Dict[UUID4, str]] = {}
+        for description in descriptions:
+            texts_by_lang.setdefault(Lang(description.language), {})[
+                description.id
+            ] = description.raw_text
+        for lang, texts in texts_by_lang.items():
+            await create_triplets_and_graphs_batch(texts=texts, lang=lang)
+
+        after_description_id = descriptions[-1].id
+        processed += len(descriptions)
+        elapsed = time.perf_counter() - started
+        logger.info(f"Rebuilt {processed} descriptions ({processed / elapsed:.1f}/s)")
+
+    logger.info(f"Done: {processed} descriptions in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Re-parse descriptions and rebuild their triplets and graphs"
+    )
+    p.add_argument("--batch-size", type=int, default=200, help="Descriptions per batch")
+    p.add_argument(
+        "--language",
+        default=None,
+        choices=[lang.value for lang in Lang],
+        help="Only rebuild descriptions in this language",
+    )
+    p.add_argument(
+        "--incomplete-only",
+        action="store_true",
+        help="Only re-parse descriptions whose stored parse missed the time budget",
+    )
+    args = p.parse_args()
+
+    asyncio.run(
+        rebuild_triplets(
+            batch_size=args.batch_size,
+            language=Lang(args.language) if args.language else None,
+            incomplete_only=args.incomplete_only,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import time
+from typing import Optional
+from loguru import logger
+from pydantic import UUID4
+from dictionary.database.engine import async_session
+from dictionary.database.models import Triplets, Graphs
+from dictionary.database.queries import select_parses_batch, replace_triplets_and_graphs
+from dictionary.nlp.languages import Lang
+from dictionary.nlp.parses import from_conllu_document
+from dictionary.nlp.rules import TripletRules, load_rules, derive_triplets
+from dictionary.nlp.graphs import build_graph
+
+
+async def rederive_triplets(
+    rules: TripletRules, batch_size: int, language: Optional[Lang] = None
+) -> None:
+    after_description_id: Optional[UUID4] = None
+    processed = 0
+    started = time.perf_counter()
+
+    while True:
+        async with async_session() as session:
+            parses = await select_parses_batch(
+                after_description_id=after_description_id,
+                limit=batch_size,
+                language=language.value if language else None,
+                session=session,
+            )
+            if not parses:
+                break
+
+            triplets_objects = []
+            graphs_objects = []
+            for parse in parses:
+                lang = Lang(parse.language)
+                sentences = from_conllu_document(parse.conllu)
+                triplets = derive_triplets(sentences=sentences, lang=lang, rules=rules)
+
+                graphs_objects.append(
+                    Graphs(
+                        description_id=parse.description_id,
+                        triplet_count=len(triplets),
+                        graph=build_graph(triplets=triplets),
+                        language=lang.value,
+                    )
+                )
+
+                triplets_objects.extend(
+                    Triplets(
+                        description_id=parse.description_id,
+                        position=triplet.position,
+                        subject=triplet.subject,
+                        subject_type=triplet.subject_type,
+                        predicate=triplet.predicate,
+                        predicate_type=triplet.predicate_type,
+                        object=triplet.object,
+                        object_type=triplet.object_type,
+                        language=lang.value,
+                    )
+                    for triplet in triplets
+                )
+
+            await replace_triplets_and_graphs(
+                triplets=triplets_objects,
+                graphs=graphs_objects,
+                session=session,
+            )
+
+        after_description_id = parses[-1].description_id
+        processed += len(parses)
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Re-derived triplets for {processed} descriptions ({processed / elapsed:.1f}/s)"
+        )
+
+    logger.info(f"Done: {processed} descriptions in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Re-derive triplets and graphs from stored dependency parses"
+    )
+    p.add_argument("--rules", default=None, help="Path to JSON file with TripletRules")
+    p.add_argument("--batch-size", type=int, default=500, help="Descriptions per batch")
+    p.add_argument(
+        "--language",
+        default=None,
+        choices=[lang.value for lang in Lang],
+        help="Only re-derive descriptions in this language",
+    )
+    args = p.parse_args()
+
+    asyncio.run(
+        rederive_triplets(
+            rules=load_rules(args.rules),
+            batch_size=args.batch_size,
+            language=Lang(args.language) if args.language else None,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
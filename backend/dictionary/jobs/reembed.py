@@ -0,0 +1,277 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any
+from loguru import logger
+from pydantic import UUID4
+from dictionary.database.engine import async_session
+from dictionary.database.models import Descriptions, Embeddings, EmbeddingVersions
+from dictionary.database.queries import (
+    select_descriptions_batch,
+    count_descriptions,
+    upsert_embeddings,
+    save_embedding_version,
+)
+from dictionary.nlp.embeddings import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_DIM,
+    BACKEND_DIMS,
+    get_backend,
+    vectorize_texts,
+)
+from dictionary.nlp.languages import Lang
+from dictionary.background_tasks.background_embedding_versions import refresh_embedding_versions
+
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+
+async def fetch_batch(
+    after_description_id: Optional[UUID4],
+    batch_size: int,
+    language: Optional[Lang],
+    missing_version: Optional[str],
+) -> List[Descriptions]:
+    async with async_session() as session:
+        return list(
+            await select_descriptions_batch(
+                after_description_id=after_description_id,
+                limit=batch_size,
+                language=language.value if language else None,
+                missing_version=missing_version,
+                session=session,
+            )
+        )
+
+
+async def embed_batch(
+    descriptions: List[Descriptions],
+    model_version: str,
+    executor: ThreadPoolExecutor,
+    workers: int,
+) -> List[Embeddings]:
+    loop = asyncio.get_running_loop()
+    by_lang: Dict[str, List[Descriptions]] = {}
+    for description in descriptions:
+        by_lang.setdefault(description.language, []).append(description)
+
+    chunks, futures = [], []
+    for language, lang_descriptions in by_lang.items():
+        chunk_size = max(1, -(-len(lang_descriptions) // workers))
+        for start in range(0, len(lang_descriptions), chunk_size):
+            chunk = lang_descriptions[start:start + chunk_size]
+            chunks.append(chunk)
+            futures.append(
+                loop.run_in_executor(
+                    executor,
+                    vectorize_texts,
+                    [description.stemmed_text for description in chunk],
+                    Lang(language),
+                    model_version,
+                )
+            )
+
+    embeddings = []
+    for chunk, vectors in zip(chunks, await asyncio.gather(*futures)):
+        if vectors is None:
+            raise RuntimeError(f"Failed to vectorize {len(chunk)} descriptions")
+        embeddings.extend(
+            Embeddings(
+                description_id=description.id,
+                model_version=model_version,
+                embedding=vector,
+                language=description.language,
+            )
+            for description, vector in zip(chunk, vectors)
+        )
+    return embeddings
+
+
+async def reembed(
+    backend_name: str,
+    missing_only: bool,
+    batch_size: int,
+    workers: int,
+    checkpoint_path: str,
+    resume: bool,
+    max_rows_per_second: Optional[float],
+    pause: float,
+    language: Optional[Lang] = None,
+) -> None:
+    await refresh_embedding_versions()
+    backend = get_backend(backend_name)
+    if backend.dim != EMBEDDING_DIM:
+        raise SystemExit(
+            f"{backend.model_version} produces {backend.dim}-dim vectors, "
+            f"the embeddings column holds {EMBEDDING_DIM}"
+        )
+    model_version = backend.model_version
+    # a new version is back-filled next to the active one; re-running the
+    # active version overwrites its vectors in place
+    async with async_session() as session:
+        await save_embedding_version(
+            version=EmbeddingVersions(
+                model_version=model_version, status="backfilling", dim=backend.dim
+            ),
+            session=session,
+        )
+    missing_version = model_version if missing_only else None
+
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    if checkpoint and checkpoint["model_version"] != model_version:
+        raise SystemExit(
+            f"Checkpoint was written for {checkpoint['model_version']}, "
+            f"active backend is {model_version}; run without --resume"
+        )
+    after_description_id = (
+        uuid.UUID(checkpoint["after_description_id"])
+        if checkpoint and checkpoint["after_description_id"]
+        else None
+    )
+    processed = checkpoint["processed"] if checkpoint else 0
+
+    async with async_session() as session:
+        remaining = await count_descriptions(
+            after_description_id=after_description_id,
+            language=language.value if language else None,
+            missing_version=missing_version,
+            session=session,
+        )
+    logger.info(
+        f"Re-embedding {remaining} descriptions with {model_version}"
+        + (f", resuming after {processed}" if processed else "")
+    )
+
+    started = time.perf_counter()
+    done = 0
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reembed")
+    try:
+        # the next batch is read while the current one is embedded and written
+        next_batch = asyncio.create_task(
+            fetch_batch(after_description_id, batch_size, language, missing_version)
+        )
+        while True:
+            descriptions = await next_batch
+            if not descriptions:
+                break
+            after_description_id = descriptions[-1].id
+            next_batch = asyncio.create_task(
+                fetch_batch(after_description_id, batch_size, language, missing_version)
+            )
+            batch_started = time.perf_counter()
+
+            embeddings = await embed_batch(
+                descriptions=descriptions,
+                model_version=model_version,
+                executor=executor,
+                workers=workers,
+            )
+            async with async_session() as session:
+                await upsert_embeddings(embeddings=embeddings, session=session)
+
+            done += len(descriptions)
+            save_checkpoint(
+                checkpoint_path,
+                {
+                    "model_version": model_version,
+                    "after_description_id": str(after_description_id),
+                    "processed": processed + done,
+                },
+            )
+
+            elapsed = time.perf_counter() - started
+            rate = done / elapsed
+            eta = (remaining - done) / rate if rate else 0.0
+            logger.info(
+                f"{processed + done} re-embedded, {rate:.1f} rows/s, "
+                f"ETA {eta / 60:.1f} min"
+            )
+
+            # throttle so live traffic keeps its share of the database and CPU
+            delay = pause
+            if max_rows_per_second:
+                delay = max(
+                    delay,
+                    len(descriptions) / max_rows_per_second
+                    - (time.perf_counter() - batch_started),
+                )
+            if delay > 0:
+                await asyncio.sleep(delay)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(f"Done: {done} descriptions in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Re-embed every description, back-filling a new model version"
+    )
+    p.add_argument(
+        "--backend",
+        default=EMBEDDING_BACKEND,
+        choices=list(BACKEND_DIMS),
+        help="Embedding backend whose model version is written",
+    )
+    p.add_argument(
+        "--missing-only",
+        action="store_true",
+        help="Skip descriptions that already have a vector of this version",
+    )
+    p.add_argument("--batch-size", type=int, default=512, help="Descriptions per batch")
+    p.add_argument("--workers", type=int, default=4, help="Embedding threads per batch")
+    p.add_argument(
+        "--checkpoint", default="reembed.checkpoint.json", help="Progress file"
+    )
+    p.add_argument(
+        "--resume", action="store_true", help="Continue after the last checkpoint"
+    )
+    p.add_argument(
+        "--max-rows-per-second",
+        type=float,
+        default=None,
+        help="Throttle to at most this many descriptions per second",
+    )
+    p.add_argument(
+        "--pause", type=float, default=0.0, help="Seconds to sleep between batches"
+    )
+    p.add_argument(
+        "--language",
+        default=None,
+        choices=[lang.value for lang in Lang],
+        help="Only re-embed descriptions in this language",
+    )
+    args = p.parse_args()
+
+    asyncio.run(
+        reembed(
+            backend_name=args.backend,
+            missing_only=args.missing_only,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            checkpoint_path=args.checkpoint,
+            resume=args.resume,
+            max_rows_per_second=args.max_rows_per_second,
+            pause=args.pause,
+            language=Lang(args.language) if args.language else None,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 from loguru import logger
 import uvicorn
 from dictionary.webapp import app
+from dictionary.misc.prefork import WEB_WORKERS, serve
 
 if __name__ == "__main__":
     logger.info(f"Running app with proxy `{app.root_path}`")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if WEB_WORKERS > 1:
+        serve(app, host="0.0.0.0", port=8000, workers=WEB_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,220 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Coroutine, Dict, Set
+from fastapi import HTTPException, Request, status
+from loguru import logger
+from dictionary.misc.metrics import Counter, Gauge, Histogram
+from dictionary.misc.profiling import hold_current_profile
+
+
+ADMISSION_INTERACTIVE_WORKERS = int(os.environ.get("ADMISSION_INTERACTIVE_WORKERS", 4))
+ADMISSION_INTERACTIVE_MAX_PENDING = int(os.environ.get("ADMISSION_INTERACTIVE_MAX_PENDING", 200))
+ADMISSION_INTERACTIVE_VECTORIZERS = int(os.environ.get("ADMISSION_INTERACTIVE_VECTORIZERS", 4))
+ADMISSION_INTERACTIVE_MAX_WAITING = int(os.environ.get("ADMISSION_INTERACTIVE_MAX_WAITING", 64))
+ADMISSION_BULK_WORKERS = int(os.environ.get("ADMISSION_BULK_WORKERS", 2))
+ADMISSION_BULK_MAX_PENDING = int(os.environ.get("ADMISSION_BULK_MAX_PENDING", 2000))
+ADMISSION_BULK_VECTORIZERS = int(os.environ.get("ADMISSION_BULK_VECTORIZERS", 1))
+ADMISSION_BULK_MAX_WAITING = int(os.environ.get("ADMISSION_BULK_MAX_WAITING", 16))
+
+LANE_HEADER = "X-Client-Lane"
+
+# weight of the newest duration in the running averages behind Retry-After
+_SMOOTHING = 0.2
+
+LANE_QUEUE_SECONDS = Histogram(
+    "dictionary_lane_queue_seconds",
+    "Time an NLP task waited in its lane before a worker slot picked it up",
+    ("lane",),
+)
+
+
+class Lane:
+    def __init__(
+        self, name: str, workers: int, max_pending: int, vectorizers: int, max_waiting: int
+    ):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.vectorizers = vectorizers
+        self.max_waiting = max_waiting
+        self._worker_slots = asyncio.Semaphore(workers)
+        self._vectorizer_slots = asyncio.Semaphore(vectorizers)
+        # create_task only keeps a weak reference to the task
+        self._tasks: Set[asyncio.Task] = set()
+        self.pending = 0
+        self.running = 0
+        self.vectorizing = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.task_seconds = 1.0
+        self.vectorize_seconds = 0.1
+
+    def _reject(self, what: str, retry_after: float) -> None:
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many {what} in the {self.name} lane, retry later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def admit(self, tasks: int) -> "Admission":
+        # checked before anything is written, so a rejected request leaves no
+        # rows behind that would never get embeddings or triplets; the slots are
+        # taken right away, so requests awaiting between admit and spawn cannot
+        # all pass the same check
+        excess = self.pending + tasks - self.max_pending
+        if excess > 0:
+            self._reject("pending NLP tasks", excess * self.task_seconds / self.workers)
+        self.pending += tasks
+        return Admission(lane=self, tasks=tasks)
+
+    def _spawn(self, coro: Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(self._run(coro, time.perf_counter()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        # a profiled request keeps its profile open until its NLP work is done
+        profile = hold_current_profile()
+        if profile is not None:
+            task.add_done_callback(lambda _: profile.release())
+        return task
+
+    async def _run(self, coro: Coroutine, spawned: float) -> None:
+        try:
+            async with self._worker_slots:
+                self.running += 1
+                started = time.perf_counter()
+                LANE_QUEUE_SECONDS.observe(started - spawned, self.name)
+                try:
+                    await coro
+                except Exception as e:
+                    logger.error(f"{coro.__qualname__} failed in the {self.name} lane: {e!r}")
+                finally:
+                    self.running -= 1
+                    self.task_seconds += _SMOOTHING * (
+                        time.perf_counter() - started - self.task_seconds
+                    )
+        finally:
+            self.pending -= 1
+            # never started if cancelled while queued
+            coro.close()
+
+    @asynccontextmanager
+    async def vectorization(self):
+        if self.waiting >= self.max_waiting:
+            self._reject(
+                "queued vectorizations",
+                (self.waiting + 1) * self.vectorize_seconds / self.vectorizers,
+            )
+        self.waiting += 1
+        try:
+            await self._vectorizer_slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.vectorizing += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.vectorizing -= 1
+            self._vectorizer_slots.release()
+            self.vectorize_seconds += _SMOOTHING * (
+                time.perf_counter() - started - self.vectorize_seconds
+            )
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "running": self.running,
+            "max_pending": self.max_pending,
+            "workers": self.workers,
+            "vectorizing": self.vectorizing,
+            "waiting": self.waiting,
+            "vectorizers": self.vectorizers,
+            "max_waiting": self.max_waiting,
+            "rejected": self.rejected,
+            "task_seconds": self.task_seconds,
+            "vectorize_seconds": self.vectorize_seconds,
+        }
+
+
+# Slots reserved by `Lane.admit`. Each spawned task uses one and gives it back
+# when it finishes; slots still unused when the request leaves the block, e.g.
+# skipped bulk entries or a failed write, are given back on exit.
+class Admission:
+    def __init__(self, lane: Lane, tasks: int):
+        self.lane = lane
+        self.reserved = tasks
+
+    def spawn(self, coro: Coroutine) -> asyncio.Task:
+        if self.reserved > 0:
+            self.reserved -= 1
+        else:
+            self.lane.pending += 1
+        return self.lane._spawn(coro)
+
+    def __enter__(self) -> "Admission":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.lane.pending -= self.reserved
+        self.reserved = 0
+
+
+_lanes: Dict[str, Lane] = {
+    "interactive": Lane(
+        name="interactive",
+        workers=ADMISSION_INTERACTIVE_WORKERS,
+        max_pending=ADMISSION_INTERACTIVE_MAX_PENDING,
+        vectorizers=ADMISSION_INTERACTIVE_VECTORIZERS,
+        max_waiting=ADMISSION_INTERACTIVE_MAX_WAITING,
+    ),
+    "bulk": Lane(
+        name="bulk",
+        workers=ADMISSION_BULK_WORKERS,
+        max_pending=ADMISSION_BULK_MAX_PENDING,
+        vectorizers=ADMISSION_BULK_VECTORIZERS,
+        max_waiting=ADMISSION_BULK_MAX_WAITING,
+    ),
+}
+
+
+def get_bulk_lane() -> Lane:
+    return _lanes["bulk"]
+
+
+def get_lane(request: Request) -> Lane:
+    # loaders such as fill_db.py identify themselves with `X-Client-Lane: bulk`
+    # so their backlog never delays interactive edits and searches
+    name = request.headers.get(LANE_HEADER, "interactive").lower()
+    if name not in _lanes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{LANE_HEADER} must be one of {', '.join(_lanes)}",
+        )
+    return _lanes[name]
+
+
+def admission_report() -> Dict[str, Any]:
+    return {name: lane.report() for name, lane in _lanes.items()}
+
+
+def _lane_values(attribute: str):
+    return lambda: {(name,): getattr(lane, attribute) for name, lane in _lanes.items()}
+
+
+for _attribute, _help in (
+    ("pending", "NLP tasks queued or running per lane"),
+    ("running", "NLP tasks holding a worker slot per lane"),
+    ("vectorizing", "Query vectorizations in flight per lane"),
+    ("waiting", "Query vectorizations waiting for a slot per lane"),
+):
+    Gauge(f"dictionary_lane_{_attribute}", _help, ("lane",), collect=_lane_values(_attribute))
+Counter(
+    "dictionary_lane_rejected_total",
+    "Requests rejected with 429 per lane",
+    ("lane",),
+    collect=_lane_values("rejected"),
+)
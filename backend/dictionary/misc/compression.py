@@ -0,0 +1,166 @@
+import asyncio
+import gzip
+import os
+from typing import Optional, List, Dict, Callable
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from dictionary.misc.response_cache import RESPONSE_CACHE_TTL, ResponseCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_THREAD_SIZE = int(os.environ.get("COMPRESSION_THREAD_SIZE", 64 * 1024))
+COMPRESSION_CACHE_SIZE = int(os.environ.get("COMPRESSION_CACHE_SIZE", 256))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+ZSTD_LEVEL = int(os.environ.get("ZSTD_LEVEL", 3))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+def _zstd(body: bytes) -> bytes:
+    # compressor objects must not be shared between threads
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+
+# in order of preference when the client rates several encodings equally
+_encoders: Dict[str, Callable[[bytes], bytes]] = {}
+if zstandard is not None:
+    _encoders["zstd"] = _zstd
+if brotli is not None:
+    _encoders["br"] = _brotli
+_encoders["gzip"] = _gzip
+
+
+def available_encodings() -> List[str]:
+    return list(_encoders)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in _encoders:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def no_compression(endpoint):
+    endpoint.compress = False
+    return endpoint
+
+
+# Compressed bodies of responses that carry an ETag are kept per encoding: the
+# ETag changes with every write to the tables behind the response, so a hit is
+# always the compressed form of the current body.
+_compressed_cache = ResponseCache(
+    name="compressed", size=COMPRESSION_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL
+)
+
+
+def get_compressed_cache() -> ResponseCache:
+    return _compressed_cache
+
+
+async def compress(body: bytes, encoding: str, etag: Optional[str]) -> bytes:
+    if etag is not None:
+        hit, compressed = _compressed_cache.get(route=encoding, key=etag, tables=())
+        if hit:
+            return compressed
+    if len(body) >= COMPRESSION_THREAD_SIZE:
+        # zlib, brotli and zstd release the GIL, so large bodies compress in
+        # parallel without stalling the event loop
+        compressed = await asyncio.to_thread(_encoders[encoding], body)
+    else:
+        compressed = _encoders[encoding](body)
+    if etag is not None:
+        _compressed_cache.set(route=encoding, key=etag, versions=(), value=compressed)
+    return compressed
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, min_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            # streamed bodies, small or already encoded bodies, binary types
+            # and routes marked with no_compression go out as they are
+            if (
+                message.get("more_body", False)
+                or len(body) < self.min_size
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                or "no-transform" in headers.get("cache-control", "")
+                or not getattr(scope.get("endpoint"), "compress", True)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            etag = headers.get("etag")
+            compressed = await compress(body=body, encoding=encoding, etag=etag)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            if etag is not None and not etag.startswith("W/"):
+                # the compressed body is a different representation; If-None-Match
+                # uses the weak comparison, so revalidation still gets a 304
+                headers["ETag"] = f"W/{etag}"
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
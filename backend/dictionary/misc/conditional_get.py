@@ -0,0 +1,76 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from dictionary.database.engine import get_session
+from dictionary.database.queries import select_table_versions
+from dictionary.misc.response_cache import use_database_versions
+from dictionary.nlp.embeddings import get_active_version
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return any(
+        candidate.strip().removeprefix("W/") == etag for candidate in header.split(",")
+    )
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_get(*tables: str):
+    # Validators come from the write counters of the tables the endpoint reads,
+    # one primary-key lookup instead of building and hashing the body. They are
+    # read before the endpoint runs, so a body is never older than its ETag.
+    async def dependency(
+        request: Request,
+        response: Response,
+        session: AsyncSession = Depends(get_session),
+    ) -> None:
+        versions = sorted(
+            (version.table_name, version.version, version.updated_at)
+            for version in await select_table_versions(tables=tables, session=session)
+        )
+        use_database_versions({table_name: version for table_name, version, _ in versions})
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(request.url.path.encode())
+        digest.update(str(request.query_params).encode())
+        digest.update(get_active_version().encode())
+        for table_name, version, _ in versions:
+            digest.update(f"{table_name}:{version};".encode())
+        etag = f'"{digest.hexdigest()}"'
+        last_modified: Optional[datetime] = max(
+            (updated_at for _, _, updated_at in versions), default=None
+        )
+
+        headers = {"ETag": etag}
+        if last_modified is not None:
+            headers["Last-Modified"] = format_datetime(
+                last_modified.astimezone(timezone.utc), usegmt=True
+            )
+
+        if_none_match = request.headers.get("if-none-match")
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_none_match is not None:
+            not_modified = _etag_matches(if_none_match, etag)
+        elif if_modified_since is not None and last_modified is not None:
+            not_modified = _not_modified_since(if_modified_since, last_modified)
+        else:
+            not_modified = False
+        if not_modified:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response.headers.update(headers)
+
+    return dependency
@@ -0,0 +1,262 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", 5.0))
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+Labels = Tuple[str, ...]
+
+
+# Metrics are plain dicts keyed by label values: recording one is a dict lookup
+# and a few additions, cheap enough to leave on for every request and query.
+# NLP stages record from worker threads, hence the (uncontended) lock.
+class Metric:
+    kind: str
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...] = (),
+        collect: Optional[Callable[[], Dict[Labels, Any]]] = None,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        # read at scrape time, for values that already live somewhere else
+        self.collect = collect
+        self.series: Dict[Labels, Any] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def samples(self) -> Dict[Labels, Any]:
+        if self.collect is not None:
+            return self.collect()
+        with self._lock:
+            return {
+                labels: list(value) if isinstance(value, list) else value
+                for labels, value in self.series.items()
+            }
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self.series[label_values] = self.series.get(label_values, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self.series[label_values] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = buckets
+
+    def observe(self, value: float, *label_values: str) -> None:
+        # per-bucket counts, then sum and count; made cumulative when rendered
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+
+_registry: List[Metric] = []
+
+NLP_STAGE_SECONDS = Histogram(
+    "dictionary_nlp_stage_seconds", "Time spent in one NLP pipeline stage call", ("stage",)
+)
+QUERY_SECONDS = Histogram(
+    "dictionary_query_seconds", "Time spent in one database query function", ("query",)
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "dictionary_http_request_seconds",
+    "Time from receiving a request to sending the last byte of its response",
+    ("method", "route", "status"),
+)
+
+
+def timed(histogram: Histogram, *label_values: str):
+    def decorator(function: Callable):
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started, *label_values)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, *label_values)
+
+        return wrapper
+
+    return decorator
+
+
+def nlp_stage(stage: str):
+    return timed(NLP_STAGE_SECONDS, stage)
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # the router stores the matched route in the scope; labelling by its
+            # path template keeps ids out of the label values
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code),
+            )
+
+
+def snapshot() -> Dict[str, Any]:
+    return {
+        metric.name: [[list(labels), value] for labels, value in metric.samples().items()]
+        for metric in _registry
+    }
+
+
+# With forked workers every process records its own metrics; each one writes
+# a snapshot to METRICS_DIR and the worker that answers the scrape adds them up.
+def reset_metrics_dir(path: str) -> None:
+    # snapshots left by an earlier run would be added to this one
+    global METRICS_DIR
+    METRICS_DIR = path
+    os.makedirs(path, exist_ok=True)
+    for file_name in os.listdir(path):
+        if file_name.endswith(".json"):
+            os.remove(os.path.join(path, file_name))
+
+
+def flush_snapshot() -> None:
+    if METRICS_DIR is None:
+        return
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(path + ".tmp", path)
+
+
+def _merge(
+    merged: Dict[str, Dict[Labels, Any]], snapshot_data: Dict[str, Any], gauges: bool
+) -> None:
+    for metric in _registry:
+        if (metric.kind == "gauge") != gauges:
+            continue
+        target = merged.setdefault(metric.name, {})
+        for labels, value in snapshot_data.get(metric.name, []):
+            labels = tuple(labels)
+            if labels not in target:
+                target[labels] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                target[labels] = [a + b for a, b in zip(target[labels], value)]
+            else:
+                target[labels] += value
+
+
+def collect_all(live_pids: List[int]) -> Dict[str, Dict[Labels, Any]]:
+    if METRICS_DIR is None:
+        return {metric.name: dict(metric.samples()) for metric in _registry}
+    flush_snapshot()
+    merged: Dict[str, Dict[Labels, Any]] = {}
+    for file_name in os.listdir(METRICS_DIR):
+        if not file_name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, file_name), "r") as f:
+                snapshot_data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        # counters and histograms of exited workers still count; their gauges
+        # describe a process that is gone
+        _merge(merged, snapshot_data, gauges=False)
+        if int(file_name.removesuffix(".json")) in live_pids:
+            _merge(merged, snapshot_data, gauges=True)
+    return merged
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render(live_pids: List[int]) -> str:
+    merged = collect_all(live_pids)
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for labels, value in sorted(merged.get(metric.name, {}).items()):
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_labels(metric.labels, labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, "+Inf"), value):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(
+                    f"{metric.name}_bucket{_labels(metric.labels, labels, le)} {cumulative}"
+                )
+            lines.append(f"{metric.name}_sum{_labels(metric.labels, labels)} {value[-2]}")
+            lines.append(f"{metric.name}_count{_labels(metric.labels, labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
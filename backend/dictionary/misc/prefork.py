@@ -0,0 +1,175 @@
+import gc
+import os
+import signal
+import socket
+import tempfile
+import time
+from typing import Optional, List, Dict, Any
+import uvicorn
+from loguru import logger
+from dictionary.misc.utils import memory_rollup
+from dictionary.misc.metrics import METRICS_DIR, reset_metrics_dir
+
+
+_cpu_count = os.cpu_count() or 1
+WEB_WORKERS = (
+    _cpu_count
+    if os.environ.get("WEB_WORKERS", "1") == "auto"
+    else int(os.environ.get("WEB_WORKERS", 1))
+)
+# every worker runs its own torch intra-op pool; by default the cores are split
+# between workers so N workers do not start N * cores threads
+WORKER_TORCH_THREADS = int(os.environ.get("WORKER_TORCH_THREADS", 0))
+WORKER_MEMORY_REPORT_SECONDS = float(os.environ.get("WORKER_MEMORY_REPORT_SECONDS", 300))
+WORKER_RESTART_DELAY = float(os.environ.get("WORKER_RESTART_DELAY", 1.0))
+LISTEN_BACKLOG = int(os.environ.get("LISTEN_BACKLOG", 2048))
+
+# pid of the process that loaded the models and forked the workers; inherited
+# by the workers, None when the app runs as a single process
+_supervisor_pid: Optional[int] = None
+
+
+def preload_models() -> None:
+    # stanza pipelines are built when the module is imported; spaCy loads lazily
+    # and would otherwise be loaded again by every worker on its first request.
+    # onnxruntime starts its thread pools with the session, which do not survive
+    # fork, so the ONNX backend stays lazy
+    from dictionary.nlp import triplets  # noqa: F401
+    from dictionary.nlp.embeddings import get_backend
+
+    backend = get_backend()
+    if backend.name != "onnx":
+        backend.preload()
+
+
+def worker_pids() -> List[int]:
+    if _supervisor_pid is None:
+        return [os.getpid()]
+    try:
+        with open(f"/proc/{_supervisor_pid}/task/{_supervisor_pid}/children", "r") as f:
+            return [int(pid) for pid in f.read().split()]
+    except (OSError, ValueError):
+        return [os.getpid()]
+
+
+def memory_report() -> Dict[str, Any]:
+    processes = [
+        {"pid": pid, "role": "worker", **memory_rollup(str(pid))} for pid in worker_pids()
+    ]
+    if _supervisor_pid is not None:
+        processes.insert(
+            0,
+            {
+                "pid": _supervisor_pid,
+                "role": "supervisor",
+                **memory_rollup(str(_supervisor_pid)),
+            },
+        )
+    total_rss = sum(process["rss_bytes"] for process in processes)
+    total_pss = sum(process["pss_bytes"] for process in processes)
+    return {
+        "workers": len(processes) - (_supervisor_pid is not None),
+        "current_pid": os.getpid(),
+        "processes": processes,
+        "total_rss_bytes": total_rss,
+        "total_pss_bytes": total_pss,
+        "shared_savings_bytes": total_rss - total_pss if total_pss else None,
+    }
+
+
+def _log_memory_report() -> None:
+    report = memory_report()
+    mib = 1024 * 1024
+    logger.info(
+        f"{report['workers']} workers: Rss {report['total_rss_bytes'] / mib:.0f} MiB, "
+        f"Pss {report['total_pss_bytes'] / mib:.0f} MiB, "
+        f"shared pages save {(report['shared_savings_bytes'] or 0) / mib:.0f} MiB"
+    )
+
+
+def _run_worker(app, sock: socket.socket, torch_threads: int) -> None:
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        import torch
+
+        torch.set_num_threads(torch_threads)
+        # the engine, background tasks and caches are created by the lifespan,
+        # i.e. separately in every worker
+        uvicorn.Server(uvicorn.Config(app, lifespan="on")).run(sockets=[sock])
+    except BaseException as e:
+        logger.error(f"Worker {os.getpid()} failed: {e!r}")
+        os._exit(1)
+    os._exit(0)
+
+
+def serve(app, host: str, port: int, workers: int) -> None:
+    global _supervisor_pid
+    started = time.perf_counter()
+    preload_models()
+    logger.info(f"Models preloaded in {time.perf_counter() - started:.1f}s")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(LISTEN_BACKLOG)
+    sock.set_inheritable(True)
+
+    # objects allocated so far are moved out of the collector's reach, so a gc
+    # pass in a worker does not write to (and un-share) the pages holding them
+    gc.collect()
+    gc.freeze()
+    _supervisor_pid = os.getpid()
+    # every worker writes its metrics there and /metrics adds them up
+    reset_metrics_dir(METRICS_DIR or tempfile.mkdtemp(prefix="dictionary-metrics-"))
+
+    torch_threads = WORKER_TORCH_THREADS or max(1, _cpu_count // workers)
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, sock, torch_threads)
+        children[pid] = slot
+        logger.info(f"Started worker {slot} as pid {pid}")
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(
+        f"Serving on {host}:{port} with {workers} workers, {torch_threads} torch threads each"
+    )
+    for slot in range(workers):
+        spawn(slot)
+
+    next_report = time.monotonic() + WORKER_MEMORY_REPORT_SECONDS
+    while children:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if time.monotonic() >= next_report:
+                _log_memory_report()
+                next_report = time.monotonic() + WORKER_MEMORY_REPORT_SECONDS
+            time.sleep(0.5)
+            continue
+        slot = children.pop(pid, None)
+        if slot is None or stopping:
+            continue
+        logger.warning(
+            f"Worker {slot} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}, "
+            f"restarting"
+        )
+        time.sleep(WORKER_RESTART_DELAY)
+        if not stopping:
+            spawn(slot)
+    sock.close()
+    logger.info("All workers stopped")
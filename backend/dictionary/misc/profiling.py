@@ -0,0 +1,225 @@
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+from loguru import logger
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0.0))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", 60.0))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 200))
+# empty disables on-demand profiling and the profile endpoints; sampling by
+# PROFILE_SAMPLE_RATE still works
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+
+# `X-Profile: <token>` profiles that request; the profile endpoints take the
+# token in their own header so listing profiles does not profile the listing
+PROFILE_HEADER = "X-Profile"
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_SUFFIX = ".folded"
+
+# threads whose innermost frame is in one of these files are parked, e.g. pool
+# workers waiting for a job
+_IDLE_FILES = ("threading.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+
+_current_profile: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+_active_lock = threading.Lock()
+_active: Optional["Profile"] = None
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+# One sampler thread per profile walks the stacks of every thread: the event
+# loop running the handler and the pool threads running its offloaded NLP work.
+# Samples are folded into `thread;outer;...;inner count` lines, the input format
+# of flamegraph.pl, speedscope and inferno.
+class Profile:
+    def __init__(self, method: str, path: str):
+        self.id = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.status: Optional[int] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._holds = 0
+        self._started = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._sample, name=f"profiler-{self.id}", daemon=True
+        )
+
+    def start(self) -> None:
+        self._holds = 1
+        self._thread.start()
+
+    def hold(self) -> None:
+        self._holds += 1
+
+    def release(self) -> None:
+        # held by the request and by every lane task it spawned; the profile
+        # ends when the last of them is done
+        self._holds -= 1
+        if self._holds == 0:
+            self._stop.set()
+
+    def _sample(self) -> None:
+        global _active
+        own = threading.get_ident()
+        deadline = self._started + PROFILE_MAX_SECONDS
+        while not self._stop.wait(PROFILE_INTERVAL) and time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+        try:
+            self._write()
+        except OSError as e:
+            logger.error(f"Failed to write profile {self.id}: {e}")
+        finally:
+            with _active_lock:
+                _active = None
+
+    def _write(self) -> None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, self.id)
+        with open(path + PROFILE_SUFFIX, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(path + ".json", "w") as f:
+            json.dump(
+                {
+                    "method": self.method,
+                    "path": self.path,
+                    "status": self.status,
+                    "seconds": time.perf_counter() - self._started,
+                    "samples": self.samples,
+                    "interval": PROFILE_INTERVAL,
+                },
+                f,
+            )
+        logger.info(f"Profile {self.id} of {self.method} {self.path}: {self.samples} samples")
+        _rotate()
+
+
+def _rotate() -> None:
+    names = sorted(
+        name for name in os.listdir(PROFILE_DIR) if name.endswith(PROFILE_SUFFIX)
+    )
+    for name in names[:-PROFILE_MAX_FILES]:
+        profile_id = name.removesuffix(PROFILE_SUFFIX)
+        for suffix in (PROFILE_SUFFIX, ".json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def is_admin(token: Optional[str]) -> bool:
+    if not PROFILE_TOKEN or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def _start_profile(method: str, path: str) -> Optional[Profile]:
+    # stacks of all threads are sampled, so two profiles at once would each
+    # contain the other's work; requests arriving meanwhile are not profiled
+    global _active
+    with _active_lock:
+        if _active is not None:
+            return None
+        _active = Profile(method=method, path=path)
+    _active.start()
+    return _active
+
+
+def hold_current_profile() -> Optional[Profile]:
+    # for work that outlives the request, such as lane tasks
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.hold()
+    return profile
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith(PROFILE_SUFFIX):
+            continue
+        profile_id = name.removesuffix(PROFILE_SUFFIX)
+        try:
+            with open(os.path.join(PROFILE_DIR, profile_id + ".json"), "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        profiles.append(
+            {
+                "id": profile_id,
+                "size_bytes": os.path.getsize(os.path.join(PROFILE_DIR, name)),
+                **meta,
+            }
+        )
+    return profiles
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    if os.path.basename(profile_id) != profile_id:
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + PROFILE_SUFFIX)
+    return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = is_admin(Headers(scope=scope).get(PROFILE_HEADER))
+        if not requested and (not self.sample_rate or random.random() >= self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+        profile = _start_profile(method=scope["method"], path=scope["path"])
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = profile.id
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _current_profile.reset(token)
+            profile.release()
@@ -0,0 +1,204 @@
+import functools
+import os
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, Tuple, Hashable, Callable
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from dictionary.misc.metrics import Counter
+from dictionary.misc.prefork import WEB_WORKERS
+
+
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 4096))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 60.0))
+# forked workers each keep their own cache and only hear of each other's
+# writes through NOTIFY, so the listener is on by default with several workers
+RESPONSE_CACHE_LISTEN = (
+    os.environ.get("RESPONSE_CACHE_LISTEN", "1" if WEB_WORKERS > 1 else "0") == "1"
+)
+if WEB_WORKERS > 1 and not RESPONSE_CACHE_LISTEN:
+    raise ValueError(
+        f"{WEB_WORKERS=} needs RESPONSE_CACHE_LISTEN=1, or worker caches miss each other's writes"
+    )
+CHANGES_CHANNEL = "dictionary_changes"
+
+CACHED_TABLES = ("topics", "terms", "descriptions", "triplets", "graphs")
+
+_versions: Dict[str, int] = {table: 0 for table in CACHED_TABLES}
+
+_caches: Dict[str, "ResponseCache"] = {}
+
+# Table versions read from the database by `conditional_get` for the current
+# request. Entries of such requests are validated against them rather than the
+# per-process counters, which miss other processes' writes unless the listener
+# runs; a body therefore never outlives the ETag it is served under.
+_request_versions: ContextVar[Dict[str, int]] = ContextVar("request_versions", default={})
+
+
+def bump(*tables: str) -> None:
+    for table in tables:
+        if table in _versions:
+            _versions[table] += 1
+
+
+def bump_all() -> None:
+    bump(*CACHED_TABLES)
+
+
+def use_database_versions(versions: Dict[str, int]) -> None:
+    _request_versions.set({**_request_versions.get(), **versions})
+
+
+def current_versions(tables: Tuple[str, ...]) -> Tuple[Tuple[str, int], ...]:
+    database = _request_versions.get()
+    return tuple(
+        ("database", database[table]) if table in database else ("process", _versions[table])
+        for table in tables
+    )
+
+
+# Entries remember the versions of the tables they were read from; a write to
+# any of them makes the entry stale without scanning the cache.
+class ResponseCache:
+    def __init__(
+        self, name: str, size: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL
+    ):
+        self.name = name
+        self.size = size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Tuple, Any]]" = OrderedDict()
+        self.stats: Dict[str, Dict[str, int]] = {}
+        _caches[name] = self
+
+    def _count(self, route: str, outcome: str) -> None:
+        route_stats = self.stats.setdefault(
+            route, {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+        )
+        route_stats[outcome] += 1
+
+    def get(self, route: str, key: Hashable, tables: Tuple[str, ...]) -> Tuple[bool, Any]:
+        entry = self._entries.get((route, key))
+        if entry is not None:
+            expires_at, versions, value = entry
+            if expires_at > time.monotonic() and versions == current_versions(tables):
+                self._entries.move_to_end((route, key))
+                self._count(route, "hits")
+                return True, value
+            del self._entries[(route, key)]
+            self._count(route, "stale")
+        self._count(route, "misses")
+        return False, None
+
+    def set(self, route: str, key: Hashable, versions: Tuple, value: Any) -> None:
+        self._entries[(route, key)] = (time.monotonic() + self.ttl, versions, value)
+        self._entries.move_to_end((route, key))
+        while len(self._entries) > self.size:
+            (evicted_route, _), _ = self._entries.popitem(last=False)
+            self._count(evicted_route, "evictions")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.size,
+            "ttl_seconds": self.ttl,
+            "versions": dict(_versions),
+            "routes": {
+                route: {
+                    **route_stats,
+                    "hit_rate": route_stats["hits"]
+                    / max(1, route_stats["hits"] + route_stats["misses"]),
+                }
+                for route, route_stats in self.stats.items()
+            },
+        }
+
+
+_response_cache = ResponseCache(name="response")
+
+
+def get_response_cache() -> ResponseCache:
+    return _response_cache
+
+
+def _cache_events() -> Dict[Tuple[str, str, str], int]:
+    return {
+        (cache_name, route, outcome): count
+        for cache_name, cache in _caches.items()
+        for route, route_stats in cache.stats.items()
+        for outcome, count in route_stats.items()
+    }
+
+
+Counter(
+    "dictionary_cache_events_total",
+    "Cache lookups and evictions by cache, route and outcome (hits, misses, stale, evictions)",
+    ("cache", "route", "outcome"),
+    collect=_cache_events,
+)
+
+
+def cached_response(*tables: str):
+    # caches what the endpoint returns, keyed by its arguments except the session;
+    # versions are read before the endpoint runs, so a write that lands while it
+    # is querying leaves the entry already stale
+    def decorator(endpoint: Callable):
+        route = endpoint.__name__
+
+        @functools.wraps(endpoint)
+        async def wrapper(**kwargs):
+            key = tuple(
+                sorted(
+                    (name, value)
+                    for name, value in kwargs.items()
+                    if not isinstance(value, AsyncSession)
+                )
+            )
+            hit, value = _response_cache.get(route=route, key=key, tables=tables)
+            if hit:
+                return value
+            versions = current_versions(tables)
+            value = await endpoint(**kwargs)
+            _response_cache.set(route=route, key=key, versions=versions, value=value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+# Writes made through any session of this process bump the versions as soon
+# as they commit; writes from other processes arrive through NOTIFY.
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_tables(session, flush_context) -> None:
+    written = session.info.setdefault("written_tables", set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        written.add(getattr(instance, "__tablename__", None))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statement_tables(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            orm_execute_state.session.info.setdefault("written_tables", set()).add(
+                table.name
+            )
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_tables(session) -> None:
+    bump(*session.info.pop("written_tables", ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_tables(session) -> None:
+    session.info.pop("written_tables", None)
+
+
+def on_change_notification(connection, pid, channel, payload) -> None:
+    bump(payload)
@@ -0,0 +1,43 @@
+import functools
+import inspect
+from typing import Any
+import pydantic_core
+from fastapi import Response, status
+
+
+class JSONBytesResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return pydantic_core.to_json(content)
+
+
+def json_response(endpoint):
+    # the endpoint returns plain dicts already shaped like its response_model
+    # (see views.dump_*); they go to bytes in one pass instead of being built
+    # into models, validated against response_model and dumped again. The
+    # response_model stays on the route for the OpenAPI schema. FastAPI drops
+    # the headers dependencies set (ETag, Last-Modified) when an endpoint returns
+    # a Response, so the sub-response is requested here and its headers copied
+    signature = inspect.signature(endpoint)
+
+    @functools.wraps(endpoint)
+    async def wrapper(response: Response, **kwargs):
+        content = await endpoint(**kwargs)
+        json = JSONBytesResponse(
+            content=content, status_code=response.status_code or status.HTTP_200_OK
+        )
+        json.headers.raw.extend(response.headers.raw)
+        return json
+
+    wrapper.__signature__ = signature.replace(
+        parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter(
+                "response", inspect.Parameter.KEYWORD_ONLY, annotation=Response
+            ),
+        ]
+    )
+    return wrapper
@@ -1,3 +1,6 @@
+import os
+import resource
+from typing import Dict
 from nltk.data import find
 
 
@@ -7,3 +10,36 @@ def check_nltk_resource(resource_name: str) -> bool:
         return True
     except LookupError:
         return False
+
+
+def rss_bytes(pid: str = "self") -> int:
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def memory_rollup(pid: str = "self") -> Dict[str, int]:
+    # Pss splits every shared page between the processes mapping it, so summing
+    # it over forked workers gives their real footprint while Rss counts shared
+    # model weights once per worker
+    fields = {
+        "Rss": "rss_bytes",
+        "Pss": "pss_bytes",
+        "Shared_Clean": "shared_bytes",
+        "Shared_Dirty": "shared_bytes",
+        "Private_Clean": "private_bytes",
+        "Private_Dirty": "private_bytes",
+    }
+    rollup = dict.fromkeys(fields.values(), 0)
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in fields:
+                    rollup[fields[name]] += int(value.split()[0]) * 1024
+    except (OSError, ValueError):
+        rollup["rss_bytes"] = rss_bytes(pid)
+    return rollup
@@ -1,40 +1,317 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional, List, Dict, Any
+import numpy as np
 from loguru import logger
-from typing import Optional, List
-import spacy
 from dictionary.nlp.languages import Lang
-from pydantic import BaseModel
+from dictionary.misc.utils import rss_bytes
+from dictionary.misc.metrics import NLP_STAGE_SECONDS
 
 
-_nlp_en = None
-_nlp_ru = None
+BACKEND_DIMS = {
+    "spacy": 300,
+    "onnx": 384,
+    "hashing": 256,
+}
 
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "spacy")
+if EMBEDDING_BACKEND not in BACKEND_DIMS:
+    raise ValueError(f"Unsupported embedding backend: {EMBEDDING_BACKEND}")
+EMBEDDING_DIM = int(os.environ.get("EMBEDDING_DIM", BACKEND_DIMS[EMBEDDING_BACKEND]))
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 64))
 
-def _get_nlp(lang: Lang) -> Optional[spacy.language.Language]:
-    global _nlp_en, _nlp_ru
 
-    try:
-        if lang == Lang.English:
-            if _nlp_en is None:
-                _nlp_en = spacy.load("en_core_web_md")
-                logger.info("en_core_web_md loaded successfully!")
-            return _nlp_en
+def normalize_vectors(vectors: List[List[float]]) -> List[List[float]]:
+    # unit length, so the inner product is the cosine similarity and rankings do
+    # not depend on text length; all-zero vectors (no known tokens) stay zero
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.where(norms > 0, norms, 1.0)).tolist()
 
-        elif lang == Lang.Russian:
-            if _nlp_ru is None:
-                _nlp_ru = spacy.load("ru_core_news_md")
-                logger.info("ru_core_news_md loaded successfully!")
-            return _nlp_ru
 
-    except Exception as e:
-        logger.error(f"Failed to load spaCy model for {lang=}: {e}")
+class EmbeddingBackend(ABC):
+    name: str
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.texts = 0
+        self.seconds = 0.0
+        self.load_seconds = 0.0
+        self.load_rss_bytes = 0
+        # models load lazily on first use, which may come from several pool
+        # threads at once; without the lock each of them would load a copy
+        self._load_lock = threading.Lock()
+
+    @property
+    def model_id(self) -> str:
+        return self.name
+
+    @property
+    def model_version(self) -> str:
+        return f"{self.name}:{self.model_id}:{self.dim}"
+
+    @abstractmethod
+    def _vectorize_batch(self, texts: List[str], lang: Lang) -> List[List[float]]:
+        ...
+
+    def preload(self) -> None:
+        pass
+
+    def _track_load(self, started: float, rss_before: int) -> None:
+        self.load_seconds += time.perf_counter() - started
+        self.load_rss_bytes += max(0, rss_bytes() - rss_before)
+
+    def vectorize_batch(
+        self, texts: List[str], lang: Lang
+    ) -> Optional[List[List[float]]]:
+        if not texts:
+            return []
+        started = time.perf_counter()
+        try:
+            vectors = normalize_vectors(self._vectorize_batch(texts=texts, lang=lang))
+        except Exception as e:
+            logger.error(f"{self.name} backend failed to vectorize {len(texts)} texts: {e}")
+            return None
+        elapsed = time.perf_counter() - started
+        self.seconds += elapsed
+        self.texts += len(texts)
+        NLP_STAGE_SECONDS.observe(elapsed, f"vectorize_{self.name}")
+        return vectors
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "model_version": self.model_version,
+            "dim": self.dim,
+            "texts": self.texts,
+            "texts_per_second": self.texts / self.seconds if self.seconds else None,
+            "load_seconds": self.load_seconds,
+            "load_rss_bytes": self.load_rss_bytes,
+        }
+
+
+class SpacyBackend(EmbeddingBackend):
+    name = "spacy"
+
+    def __init__(self, dim: int):
+        super().__init__(dim=dim)
+        self.model_names = {
+            Lang.English: os.environ.get("SPACY_MODEL_EN", "en_core_web_md"),
+            Lang.Russian: os.environ.get("SPACY_MODEL_RU", "ru_core_news_md"),
+        }
+        self._nlp = {}
+
+    @property
+    def model_id(self) -> str:
+        return "+".join(self.model_names[lang] for lang in (Lang.English, Lang.Russian))
+
+    def _get_nlp(self, lang: Lang):
+        if lang not in self.model_names:
+            raise ValueError(f"Unsupported language: {lang}")
+        if lang in self._nlp:
+            return self._nlp[lang]
+        with self._load_lock:
+            if lang not in self._nlp:
+                import spacy
+
+                started, rss_before = time.perf_counter(), rss_bytes()
+                nlp = spacy.load(self.model_names[lang])
+                if nlp.vocab.vectors_length != self.dim:
+                    raise ValueError(
+                        f"{self.model_names[lang]} has {nlp.vocab.vectors_length}-dim vectors, "
+                        f"expected {self.dim}"
+                    )
+                self._nlp[lang] = nlp
+                self._track_load(started=started, rss_before=rss_before)
+                logger.info(f"{self.model_names[lang]} loaded successfully!")
+        return self._nlp[lang]
+
+    def preload(self) -> None:
+        for lang in self.model_names:
+            self._get_nlp(lang=lang)
+
+    def _vectorize_batch(self, texts: List[str], lang: Lang) -> List[List[float]]:
+        nlp = self._get_nlp(lang=lang)
+        return [
+            doc.vector.tolist()
+            for doc in nlp.pipe(texts, batch_size=EMBEDDING_BATCH_SIZE)
+        ]
+
+
+class OnnxBackend(EmbeddingBackend):
+    name = "onnx"
+
+    def __init__(self, dim: int):
+        super().__init__(dim=dim)
+        self.model_dir = os.environ.get("ONNX_MODEL_DIR", "models/sentence-encoder")
+        self.max_length = int(os.environ.get("ONNX_MAX_LENGTH", 256))
+        self._session = None
+        self._tokenizer = None
+
+    @property
+    def model_id(self) -> str:
+        return os.path.basename(os.path.normpath(self.model_dir))
+
+    def _load(self) -> None:
+        if self._session is not None:
+            return
+        with self._load_lock:
+            if self._session is not None:
+                return
+            import onnxruntime
+            from tokenizers import Tokenizer
+
+            started, rss_before = time.perf_counter(), rss_bytes()
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = (
+                onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            )
+            session = onnxruntime.InferenceSession(
+                os.path.join(self.model_dir, "model.onnx"),
+                sess_options=options,
+                providers=["CPUExecutionProvider"],
+            )
+            self._tokenizer = Tokenizer.from_file(
+                os.path.join(self.model_dir, "tokenizer.json")
+            )
+            self._tokenizer.enable_truncation(max_length=self.max_length)
+            self._tokenizer.enable_padding()
+            # published last: callers that skip the lock check `_session` only
+            self._session = session
+            self._track_load(started=started, rss_before=rss_before)
+            logger.info(f"ONNX sentence encoder {self.model_dir} loaded successfully!")
+
+    def _vectorize_batch(self, texts: List[str], lang: Lang) -> List[List[float]]:
+        self._load()
+        vectors = []
+        input_names = {i.name for i in self._session.get_inputs()}
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            encodings = self._tokenizer.encode_batch(
+                texts[start:start + EMBEDDING_BATCH_SIZE]
+            )
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array(
+                [e.attention_mask for e in encodings], dtype=np.int64
+            )
+            inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in input_names:
+                inputs["token_type_ids"] = np.zeros_like(input_ids)
+            token_embeddings = self._session.run(None, inputs)[0]
+
+            # mean pooling over non-padding tokens
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(
+                mask.sum(axis=1), 1e-9, None
+            )
+            if pooled.shape[1] != self.dim:
+                raise ValueError(
+                    f"{self.model_dir} produces {pooled.shape[1]}-dim vectors, expected {self.dim}"
+                )
+            vectors.extend(pooled.tolist())
+        return vectors
+
+
+class HashingBackend(EmbeddingBackend):
+    name = "hashing"
+
+    _token_pattern = re.compile(r"\w+")
+
+    @property
+    def model_id(self) -> str:
+        return "blake2b-signed"
+
+    def _vectorize_batch(self, texts: List[str], lang: Lang) -> List[List[float]]:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in self._token_pattern.findall(text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dim] += sign
+        return vectors.tolist()
+
+
+_backend_classes = {
+    "spacy": SpacyBackend,
+    "onnx": OnnxBackend,
+    "hashing": HashingBackend,
+}
+
+_backends: Dict[str, EmbeddingBackend] = {}
+
+
+def get_backend(name: str = EMBEDDING_BACKEND) -> EmbeddingBackend:
+    if name not in _backends:
+        dim = EMBEDDING_DIM if name == EMBEDDING_BACKEND else BACKEND_DIMS[name]
+        _backends[name] = _backend_classes[name](dim=dim)
+    return _backends[name]
+
+
+# Set from the `embedding_versions` table: searches vectorize queries with the
+# active version, writes also go to versions that are being back-filled.
+_active_version: Optional[str] = None
+_backfilling_versions: List[str] = []
+# versions with rows in `embeddings`, retired ones included until gc
+_stored_version_count = 1
+
+
+def get_version_backend(version: str) -> Optional[EmbeddingBackend]:
+    name = version.split(":", 1)[0]
+    if name not in _backend_classes:
+        return None
+    backend = get_backend(name)
+    if backend.model_version != version or backend.dim != EMBEDDING_DIM:
         return None
+    return backend
+
+
+def get_active_version() -> str:
+    return _active_version or get_backend().model_version
+
+
+def get_write_versions() -> List[str]:
+    return [get_active_version(), *_backfilling_versions]
 
-    raise ValueError(f"Unsupported language: {lang}")
+
+def get_stored_version_count() -> int:
+    return _stored_version_count
+
+
+def set_embedding_versions(active: str, backfilling: List[str], stored: int = 1) -> None:
+    global _active_version, _backfilling_versions, _stored_version_count
+    _stored_version_count = max(stored, 1)
+    if get_version_backend(active) is None:
+        logger.error(f"Active embedding version {active} cannot be computed by this process")
+    elif active != _active_version:
+        logger.info(f"Active embedding version is {active}")
+        _active_version = active
+    _backfilling_versions = [
+        version
+        for version in backfilling
+        if version != _active_version and get_version_backend(version) is not None
+    ]
+
+
+def vectorize_texts(
+    texts: List[str], lang: Lang, version: Optional[str] = None
+) -> Optional[List[List[float]]]:
+    version = version or get_active_version()
+    backend = get_version_backend(version)
+    if backend is None:
+        logger.error(f"No backend for embedding version {version}")
+        return None
+    return backend.vectorize_batch(texts=texts, lang=lang)
 
 
-def vectorize_text(text: str, lang: Lang) -> Optional[List[float]]:
-    nlp = _get_nlp(lang=lang)
-    if not nlp:
+def vectorize_text(
+    text: str, lang: Lang, version: Optional[str] = None
+) -> Optional[List[float]]:
+    vectors = vectorize_texts(texts=[text], lang=lang, version=version)
+    if not vectors:
         logger.error(f"Failed to vectorize {text=}")
         return None
-    return nlp(text).vector.tolist()
+    return vectors[0]
@@ -1,57 +1,115 @@
-from typing import List, Dict, Any
-import networkx as nx
-from networkx.classes import DiGraph
-from networkx.readwrite import json_graph
-from dictionary.nlp.triplets import TripletData
+from typing import List, Dict, Any, Tuple
+from dictionary.nlp.rules import TripletData
+from dictionary.misc.metrics import nlp_stage
 
 
-async def serialize_graph(graph: DiGraph) -> Dict[str, Any]:
-    return json_graph.node_link_data(graph)
+# Graphs are stored in networkx node-link format ("links" edges key), but are
+# built and edited here as plain dicts; networkx is only imported by
+# `to_networkx` when a caller actually needs graph algorithms.
+Nodes = Dict[str, Dict[str, Any]]
+Adjacency = Dict[str, Dict[str, Dict[str, Any]]]
 
 
-async def deserialize_graph(graph_data: Dict[str, Any]) -> nx.DiGraph:
-    return json_graph.node_link_graph(graph_data)
+@nlp_stage("graph_load")
+def _load(graph_data: Dict[str, Any]) -> Tuple[Nodes, Adjacency]:
+    nodes: Nodes = {}
+    adjacency: Adjacency = {}
+    for node in graph_data.get("nodes", []):
+        attrs = dict(node)
+        node_id = attrs.pop("id")
+        nodes[node_id] = attrs
+        adjacency[node_id] = {}
+    for link in graph_data.get("links", graph_data.get("edges", [])):
+        attrs = dict(link)
+        source = attrs.pop("source")
+        target = attrs.pop("target")
+        for node_id in (source, target):
+            if node_id not in nodes:
+                nodes[node_id] = {}
+                adjacency[node_id] = {}
+        adjacency[source][target] = attrs
+    return nodes, adjacency
 
 
-async def create_graph() -> DiGraph:
-    return nx.DiGraph()
+@nlp_stage("graph_serialize")
+def _dump(nodes: Nodes, adjacency: Adjacency) -> Dict[str, Any]:
+    return {
+        "directed": True,
+        "multigraph": False,
+        "graph": {},
+        "nodes": [{**attrs, "id": node_id} for node_id, attrs in nodes.items()],
+        "links": [
+            {**attrs, "source": source, "target": target}
+            for source in nodes
+            for target, attrs in adjacency[source].items()
+        ],
+    }
 
 
-async def add_triplets_to_graph(graph: DiGraph, triplets: List[TripletData]) -> DiGraph:
+def _add(nodes: Nodes, adjacency: Adjacency, triplets: List[TripletData]) -> None:
     for triplet in triplets:
-        graph.add_node(triplet.subject, type=triplet.subject_type)
-        graph.add_node(triplet.object, type=triplet.object_type)
-        graph.add_edge(
-            triplet.subject,
-            triplet.object,
-            predicate=triplet.predicate,
-            predicate_type=triplet.predicate_type,
-            position=triplet.position,
-        )
-
-    return graph
-
-
-async def remove_triplets_from_graph(
-    graph: nx.DiGraph, triplets: List[TripletData]
-) -> DiGraph:
+        for node_id, node_type in (
+            (triplet.subject, triplet.subject_type),
+            (triplet.object, triplet.object_type),
+        ):
+            if node_id not in nodes:
+                nodes[node_id] = {}
+                adjacency[node_id] = {}
+            nodes[node_id]["type"] = node_type
+
+        edge = adjacency[triplet.subject].setdefault(triplet.object, {})
+        edge["predicate"] = triplet.predicate
+        edge["predicate_type"] = triplet.predicate_type
+        edge["position"] = triplet.position
+
+
+def _is_isolated(node_id: str, adjacency: Adjacency) -> bool:
+    if adjacency[node_id]:
+        return False
+    return not any(node_id in targets for targets in adjacency.values())
+
+
+@nlp_stage("build_graph")
+def build_graph(triplets: List[TripletData]) -> Dict[str, Any]:
+    nodes: Nodes = {}
+    adjacency: Adjacency = {}
+    _add(nodes=nodes, adjacency=adjacency, triplets=triplets)
+    return _dump(nodes=nodes, adjacency=adjacency)
+
+
+@nlp_stage("add_triplets_to_graph")
+def add_triplets_to_graph(
+    graph_data: Dict[str, Any], triplets: List[TripletData]
+) -> Dict[str, Any]:
+    nodes, adjacency = _load(graph_data)
+    _add(nodes=nodes, adjacency=adjacency, triplets=triplets)
+    return _dump(nodes=nodes, adjacency=adjacency)
+
+
+@nlp_stage("remove_triplets_from_graph")
+def remove_triplets_from_graph(
+    graph_data: Dict[str, Any], triplets: List[TripletData]
+) -> Dict[str, Any]:
+    nodes, adjacency = _load(graph_data)
     for triplet in triplets:
-        if graph.has_edge(triplet.subject, triplet.object):
-            edge_data = graph.get_edge_data(triplet.subject, triplet.object)
-            if (
-                edge_data.get("predicate") == triplet.predicate
-                and edge_data.get("predicate_type") == triplet.predicate_type
-            ):
-                graph.remove_edge(triplet.subject, triplet.object)
-
-                if (
-                    graph.in_degree(triplet.subject) == 0
-                    and graph.out_degree(triplet.subject) == 0
-                ):
-                    graph.remove_node(triplet.subject)
-                if (
-                    graph.in_degree(triplet.object) == 0
-                    and graph.out_degree(triplet.object) == 0
-                ):
-                    graph.remove_node(triplet.object)
-    return graph
+        edge_data = adjacency.get(triplet.subject, {}).get(triplet.object)
+        if edge_data is None:
+            continue
+        if (
+            edge_data.get("predicate") == triplet.predicate
+            and edge_data.get("predicate_type") == triplet.predicate_type
+        ):
+            del adjacency[triplet.subject][triplet.object]
+
+            for node_id in (triplet.subject, triplet.object):
+                if node_id in nodes and _is_isolated(node_id, adjacency):
+                    del nodes[node_id]
+                    del adjacency[node_id]
+    return _dump(nodes=nodes, adjacency=adjacency)
+
+
+def to_networkx(graph_data: Dict[str, Any]):
+    from networkx.readwrite import json_graph
+
+    edges = "edges" if "edges" in graph_data else "links"
+    return json_graph.node_link_graph(graph_data, edges=edges)
@@ -1,5 +1,6 @@
 from enum import Enum
 import langid
+from dictionary.misc.metrics import nlp_stage
 
 
 class Lang(Enum):
@@ -10,6 +11,7 @@ class Lang(Enum):
 langid.set_languages(["en", "ru"])
 
 
+@nlp_stage("detect_language")
 def detect_language(text: str) -> Lang:
     code, _ = langid.classify(text)
     if code == "en":
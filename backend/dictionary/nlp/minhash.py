@@ -0,0 +1,146 @@
+import hashlib
+import os
+from typing import List, Dict, Set, Tuple, Hashable
+import numpy as np
+
+
+NEAR_DUPLICATE_MODE = os.environ.get("NEAR_DUPLICATE_MODE", "flag")
+if NEAR_DUPLICATE_MODE not in ("off", "flag", "reject"):
+    raise ValueError(f"Unsupported near-duplicate mode: {NEAR_DUPLICATE_MODE}")
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", 0.7))
+MINHASH_PERMUTATIONS = int(os.environ.get("MINHASH_PERMUTATIONS", 128))
+MINHASH_BANDS = int(os.environ.get("MINHASH_BANDS", 32))
+MINHASH_SHINGLE_SIZE = int(os.environ.get("MINHASH_SHINGLE_SIZE", 1))
+if MINHASH_PERMUTATIONS % MINHASH_BANDS:
+    raise ValueError(f"{MINHASH_PERMUTATIONS=} must be divisible by {MINHASH_BANDS=}")
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(tokens: List[str], size: int = MINHASH_SHINGLE_SIZE) -> Set[str]:
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+class MinHasher:
+    def __init__(self, permutations: int = MINHASH_PERMUTATIONS, seed: int = 1):
+        # a, b < 2^31 and 32-bit shingle hashes keep a * x + b inside uint64
+        generator = np.random.RandomState(seed)
+        self.a = generator.randint(1, 1 << 31, size=permutations).astype(np.uint64)
+        self.b = generator.randint(0, 1 << 31, size=permutations).astype(np.uint64)
+        self.permutations = permutations
+
+    def signature(self, tokens: List[str]) -> np.ndarray:
+        values = shingles(tokens)
+        if not values:
+            return np.full(self.permutations, _MAX_HASH, dtype=np.uint32)
+        hashes = np.array(
+            [
+                int.from_bytes(
+                    hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little"
+                )
+                for value in values
+            ],
+            dtype=np.uint64,
+        )
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+class LSHIndex:
+    def __init__(self, permutations: int = MINHASH_PERMUTATIONS, bands: int = MINHASH_BANDS):
+        self.bands = bands
+        self.rows = permutations // bands
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, Set[Hashable]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def add(self, key: Hashable, signature: np.ndarray) -> None:
+        self.remove(key)
+        self.signatures[key] = signature
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del buckets[band_key]
+
+    def candidates(self, signature: np.ndarray) -> Set[Hashable]:
+        found: Set[Hashable] = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            found |= buckets.get(band_key, set())
+        return found
+
+    def query(
+        self, signature: np.ndarray, threshold: float = NEAR_DUPLICATE_THRESHOLD
+    ) -> List[Tuple[Hashable, float]]:
+        matches = [
+            (key, similarity(signature, self.signatures[key]))
+            for key in self.candidates(signature)
+        ]
+        return sorted(
+            [(key, score) for key, score in matches if score >= threshold],
+            key=lambda match: -match[1],
+        )
+
+    def clusters(self, threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[List[Hashable]]:
+        parents = {key: key for key in self.signatures}
+
+        def find(key):
+            while parents[key] != key:
+                parents[key] = parents[parents[key]]
+                key = parents[key]
+            return key
+
+        for key, signature in self.signatures.items():
+            for other, _ in self.query(signature, threshold=threshold):
+                if other != key:
+                    parents[find(other)] = find(key)
+
+        groups: Dict[Hashable, List[Hashable]] = {}
+        for key in self.signatures:
+            groups.setdefault(find(key), []).append(key)
+        return sorted(
+            [group for group in groups.values() if len(group) > 1], key=len, reverse=True
+        )
+
+
+_hasher = MinHasher()
+_indexes: Dict[str, LSHIndex] = {}
+
+
+def get_hasher() -> MinHasher:
+    return _hasher
+
+
+def get_lsh_index(language: str) -> LSHIndex:
+    if language not in _indexes:
+        _indexes[language] = LSHIndex()
+    return _indexes[language]
+
+
+def forget_minhashes(keys: List[Hashable]) -> None:
+    for index in _indexes.values():
+        for key in keys:
+            index.remove(key)
@@ -0,0 +1,98 @@
+import hashlib
+from typing import Optional, List
+from pydantic import BaseModel
+from dictionary.nlp.languages import Lang
+
+
+class TokenizedSentence(BaseModel):
+    text: str
+    tokens: List[str]
+
+
+class ParsedWord(BaseModel):
+    id: int
+    text: str
+    lemma: Optional[str]
+    upos: Optional[str]
+    head: int
+    deprel: Optional[str]
+
+
+class ParsedSentence(BaseModel):
+    text: str
+    words: List[ParsedWord]
+
+
+def sentence_hash(text: str, lang: Lang, model_version: str) -> str:
+    key = f"{model_version}\x00{lang.value}\x00{text}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _conllu_field(value: Optional[str]) -> str:
+    if not value:
+        return "_"
+    return value.replace("\t", " ").replace("\n", " ")
+
+
+def _conllu_value(value: str) -> Optional[str]:
+    return None if value == "_" else value
+
+
+def to_conllu(sentence: ParsedSentence) -> str:
+    lines = [f"# text = {_conllu_field(sentence.text)}"]
+    for word in sentence.words:
+        lines.append(
+            "\t".join(
+                (
+                    str(word.id),
+                    _conllu_field(word.text),
+                    _conllu_field(word.lemma),
+                    _conllu_field(word.upos),
+                    "_",
+                    "_",
+                    str(word.head),
+                    _conllu_field(word.deprel),
+                    "_",
+                    "_",
+                )
+            )
+        )
+    return "\n".join(lines)
+
+
+def from_conllu(block: str) -> ParsedSentence:
+    text = ""
+    words = []
+    for line in block.splitlines():
+        if not line:
+            continue
+        if line.startswith("# text = "):
+            text = line[len("# text = "):]
+            continue
+        if line.startswith("#"):
+            continue
+        columns = line.split("\t")
+        if not columns[0].isdigit():
+            # multi-word token ranges and empty nodes carry no dependency
+            continue
+        words.append(
+            ParsedWord(
+                id=int(columns[0]),
+                text=columns[1],
+                lemma=_conllu_value(columns[2]),
+                upos=_conllu_value(columns[3]),
+                head=int(columns[6]),
+                deprel=_conllu_value(columns[7]),
+            )
+        )
+    return ParsedSentence(text=text, words=words)
+
+
+def to_conllu_document(sentences: List[ParsedSentence]) -> str:
+    return "\n\n".join(to_conllu(sentence) for sentence in sentences) + "\n"
+
+
+def from_conllu_document(document: str) -> List[ParsedSentence]:
+    return [
+        from_conllu(block) for block in document.split("\n\n") if block.strip()
+    ]
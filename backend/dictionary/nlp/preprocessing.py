@@ -3,6 +3,7 @@ import string
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from dictionary.nlp.languages import Lang
+from dictionary.misc.metrics import nlp_stage
 
 
 stopwords_map = {
@@ -11,6 +12,7 @@ stopwords_map = {
 }
 
 
+@nlp_stage("clean_text")
 def clean_text(text: str, language: Lang) -> list[str]:
     text = text.lower()
     text = re.sub(r"[^a-zа-яё\s]", "", text)
@@ -0,0 +1,86 @@
+import os
+from typing import Optional, List
+from pydantic import BaseModel
+from loguru import logger
+from dictionary.nlp.languages import Lang
+from dictionary.nlp.parses import ParsedSentence
+from dictionary.misc.metrics import nlp_stage
+
+
+class TripletData(BaseModel):
+    position: int
+    subject: str
+    subject_type: Optional[str]
+    predicate: str
+    predicate_type: Optional[str]
+    object: str
+    object_type: Optional[str]
+    language: Lang
+
+
+class TripletRules(BaseModel):
+    subject_deprels: List[str] = ["nsubj", "nsubj:pass"]
+    object_deprels: List[str] = ["obj", "iobj", "obl", "xcomp", "attr"]
+
+
+def load_rules(path: Optional[str] = None) -> TripletRules:
+    path = path or os.environ.get("TRIPLET_RULES_PATH")
+    if not path:
+        return TripletRules()
+    with open(path, "r", encoding="utf-8") as f:
+        rules = TripletRules.model_validate_json(f.read())
+    logger.info(f"Loaded triplet rules from {path=}: {rules}")
+    return rules
+
+
+def clean_type(t: str) -> Optional[str]:
+    return t if t else None
+
+
+@nlp_stage("derive_triplets")
+def derive_triplets(
+    sentences: List[ParsedSentence], lang: Lang, rules: Optional[TripletRules] = None
+) -> List[TripletData]:
+    rules = rules or _default_rules
+    subject_deprels = set(rules.subject_deprels)
+    object_deprels = set(rules.object_deprels)
+    triplets = []
+
+    for sentence in sentences:
+        root = next((w for w in sentence.words if w.head == 0), None)
+        if not root:
+            continue
+
+        predicate = root.lemma
+        predicate_type = clean_type(root.upos)
+
+        subjects = []
+        objects = []
+
+        for word in sentence.words:
+            if word.head != root.id:
+                continue
+            if word.deprel in subject_deprels:
+                subjects.append((word.text, clean_type(word.upos)))
+            elif word.deprel in object_deprels:
+                objects.append((word.text, clean_type(word.upos)))
+
+        for i, (subj_text, subj_type) in enumerate(subjects):
+            for obj_text, obj_type in objects:
+                triplets.append(
+                    TripletData(
+                        position=i,
+                        subject=subj_text,
+                        subject_type=subj_type,
+                        predicate=predicate,
+                        predicate_type=predicate_type,
+                        object=obj_text,
+                        object_type=obj_type,
+                        language=lang,
+                    )
+                )
+
+    return triplets
+
+
+_default_rules = load_rules()
@@ -1,6 +1,7 @@
 from typing import List
 from nltk.stem.snowball import SnowballStemmer
 from dictionary.nlp.languages import Lang
+from dictionary.misc.metrics import nlp_stage
 
 
 stemmer_map = {
@@ -9,6 +10,7 @@ stemmer_map = {
 }
 
 
+@nlp_stage("stem_tokens")
 def stem_tokens(tokens: List[str], language: Lang) -> List[str]:
     stemmer = stemmer_map[language.value]
 
@@ -1,84 +1,269 @@
-from typing import Optional, List
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, TypeVar
 import stanza
 from loguru import logger
 from dictionary.nlp.languages import Lang
-from pydantic import BaseModel
+from dictionary.nlp.parses import TokenizedSentence, ParsedWord, ParsedSentence
+from dictionary.nlp.rules import TripletData, clean_type, derive_triplets
+from dictionary.misc.metrics import nlp_stage
 
 
-class TripletData(BaseModel):
-    position: int
-    subject: str
-    subject_type: Optional[str]
-    predicate: str
-    predicate_type: Optional[str]
-    object: str
-    object_type: Optional[str]
-    language: Lang
+PARSER_MODEL_VERSION = os.environ.get(
+    "PARSER_MODEL_VERSION", f"stanza-{stanza.__version__}"
+)
+
+
+TOKENIZE_BATCH_SIZE = int(os.environ.get("STANZA_TOKENIZE_BATCH_SIZE", 64))
+POS_BATCH_SIZE = int(os.environ.get("STANZA_POS_BATCH_SIZE", 5000))
+LEMMA_BATCH_SIZE = int(os.environ.get("STANZA_LEMMA_BATCH_SIZE", 200))
+DEPPARSE_BATCH_SIZE = int(os.environ.get("STANZA_DEPPARSE_BATCH_SIZE", 5000))
+
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+PARSE_CHUNK_SENTENCES = int(os.environ.get("PARSE_CHUNK_SENTENCES", 64))
+PARSE_TIME_BUDGET = float(os.environ.get("PARSE_TIME_BUDGET", 10.0))
+PARSE_MAX_TEXT_CHARS = int(os.environ.get("PARSE_MAX_TEXT_CHARS", 20000))
+PARSE_MAX_SENTENCES = int(os.environ.get("PARSE_MAX_SENTENCES", 300))
+# depparse time grows faster than linearly with sentence length
+PARSE_MAX_SENTENCE_TOKENS = int(os.environ.get("PARSE_MAX_SENTENCE_TOKENS", 150))
+
+
+K = TypeVar("K")
 
 
 for lang_code in ("ru", "en"):
     stanza.download(lang_code, verbose=False)
 
 
+_tokenize_pipelines = {
+    Lang.English: stanza.Pipeline(
+        lang="en",
+        processors="tokenize",
+        tokenize_batch_size=TOKENIZE_BATCH_SIZE,
+        use_gpu=False,
+    ),
+    Lang.Russian: stanza.Pipeline(
+        lang="ru",
+        processors="tokenize",
+        tokenize_batch_size=TOKENIZE_BATCH_SIZE,
+        use_gpu=False,
+    ),
+}
+
+
 _nlp_pipelines = {
     Lang.English: stanza.Pipeline(
-        lang="en", processors="tokenize,pos,lemma,depparse", use_gpu=False
+        lang="en",
+        processors="tokenize,pos,lemma,depparse",
+        tokenize_pretokenized=True,
+        pos_batch_size=POS_BATCH_SIZE,
+        lemma_batch_size=LEMMA_BATCH_SIZE,
+        depparse_batch_size=DEPPARSE_BATCH_SIZE,
+        use_gpu=False,
     ),
     Lang.Russian: stanza.Pipeline(
-        lang="ru", processors="tokenize,pos,lemma,depparse", use_gpu=False
+        lang="ru",
+        processors="tokenize,pos,lemma,depparse",
+        tokenize_pretokenized=True,
+        pos_batch_size=POS_BATCH_SIZE,
+        lemma_batch_size=LEMMA_BATCH_SIZE,
+        depparse_batch_size=DEPPARSE_BATCH_SIZE,
+        use_gpu=False,
     ),
 }
 
 
-def clean_type(t: str) -> Optional[str]:
-    return t if t else None
+_parse_executor = ThreadPoolExecutor(
+    max_workers=PARSE_WORKERS, thread_name_prefix="stanza-parse"
+)
+
+
+def _limit_text(text: str) -> str:
+    if len(text) <= PARSE_MAX_TEXT_CHARS:
+        return text
+    logger.warning(
+        f"Text of {len(text)} chars exceeds {PARSE_MAX_TEXT_CHARS=}, truncating"
+    )
+    return text[:PARSE_MAX_TEXT_CHARS]
+
+
+def _to_tokenized(doc: stanza.Document) -> List[TokenizedSentence]:
+    sentences = doc.sentences
+    if len(sentences) > PARSE_MAX_SENTENCES:
+        logger.warning(
+            f"Document with {len(sentences)} sentences exceeds {PARSE_MAX_SENTENCES=}, "
+            f"extracting from the first {PARSE_MAX_SENTENCES} only"
+        )
+        sentences = sentences[:PARSE_MAX_SENTENCES]
+    tokenized = []
+    for sentence in sentences:
+        tokens = [token.text for token in sentence.tokens]
+        if len(tokens) > PARSE_MAX_SENTENCE_TOKENS:
+            logger.warning(
+                f"Sentence of {len(tokens)} tokens exceeds {PARSE_MAX_SENTENCE_TOKENS=}, "
+                "parsing its beginning only"
+            )
+            tokens = tokens[:PARSE_MAX_SENTENCE_TOKENS]
+        tokenized.append(TokenizedSentence(text=sentence.text, tokens=tokens))
+    return tokenized
+
+
+@nlp_stage("split_sentences")
+def split_sentences(text: str, lang: Lang) -> List[TokenizedSentence]:
+    doc = _tokenize_pipelines[lang](_limit_text(text))
+    return _to_tokenized(doc)
+
+
+@nlp_stage("split_sentences_batch")
+def split_sentences_batch(
+    texts: List[str], lang: Lang
+) -> List[List[TokenizedSentence]]:
+    if not texts:
+        return []
+
+    docs = _tokenize_pipelines[lang].bulk_process(
+        [stanza.Document([], text=_limit_text(text)) for text in texts]
+    )
+    return [_to_tokenized(doc) for doc in docs]
 
 
+def _parse_chunk(
+    sentences: List[TokenizedSentence], lang: Lang
+) -> List[ParsedSentence]:
+    nlp = _nlp_pipelines[lang]
+    doc = nlp([sentence.tokens for sentence in sentences])
+
+    return [
+        ParsedSentence(
+            text=sentence.text,
+            words=[
+                ParsedWord(
+                    id=word.id,
+                    text=word.text,
+                    lemma=word.lemma,
+                    upos=clean_type(word.upos),
+                    head=word.head,
+                    deprel=word.deprel,
+                )
+                for word in parsed.words
+            ],
+        )
+        for sentence, parsed in zip(sentences, doc.sentences)
+    ]
+
+
+class _DocumentBudget:
+    # the clock starts when the document's first chunk starts running, so time
+    # spent queued behind other documents is not charged to it
+    def __init__(self, seconds: Optional[float]):
+        self.seconds = seconds
+        self.deadline: Optional[float] = None
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def admit(self) -> bool:
+        if self.seconds is None:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self.deadline is None:
+                self.deadline = now + self.seconds
+            if now < self.deadline:
+                return True
+            self.dropped += 1
+            return False
+
+
+def _parse_budgeted_chunk(
+    sentences: List[TokenizedSentence], lang: Lang, budget: _DocumentBudget
+) -> Optional[List[ParsedSentence]]:
+    # a running chunk cannot be interrupted, but chunks of a document over its
+    # budget are skipped instead of occupying the executor; sentence length is
+    # capped in `_to_tokenized`, so no single chunk runs unbounded
+    if not budget.admit():
+        return None
+    return _parse_chunk(sentences, lang)
+
+
+@nlp_stage("parse_sentences")
+def parse_documents(
+    documents: List[List[TokenizedSentence]],
+    lang: Lang,
+    time_budget: Optional[float] = PARSE_TIME_BUDGET,
+) -> List[List[Optional[ParsedSentence]]]:
+    # aligned with `documents`; `time_budget` applies to every document on its
+    # own and sentences of chunks that miss it come back as None
+    chunks = [
+        [
+            sentences[i:i + PARSE_CHUNK_SENTENCES]
+            for i in range(0, len(sentences), PARSE_CHUNK_SENTENCES)
+        ]
+        for sentences in documents
+    ]
+    budgets = [_DocumentBudget(time_budget) for _ in documents]
+    futures = [
+        [
+            _parse_executor.submit(_parse_budgeted_chunk, chunk, lang, budget)
+            for chunk in document_chunks
+        ]
+        for document_chunks, budget in zip(chunks, budgets)
+    ]
+
+    parsed_documents = []
+    for document_chunks, budget, document_futures in zip(chunks, budgets, futures):
+        parsed: List[Optional[ParsedSentence]] = []
+        for chunk, future in zip(document_chunks, document_futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Failed to parse chunk: {e}")
+                result = None
+            parsed.extend(result if result is not None else [None] * len(chunk))
+        if budget.dropped:
+            logger.warning(
+                f"Parsing exceeded {time_budget=}s: {budget.dropped} of "
+                f"{len(document_chunks)} chunks dropped"
+            )
+        parsed_documents.append(parsed)
+    return parsed_documents
+
+
+def parse_sentences(
+    sentences: List[TokenizedSentence],
+    lang: Lang,
+    time_budget: Optional[float] = PARSE_TIME_BUDGET,
+) -> List[Optional[ParsedSentence]]:
+    return parse_documents(documents=[sentences], lang=lang, time_budget=time_budget)[0]
+
+
+@nlp_stage("extract_triplets")
 def extract_triplets(text: str, lang: Lang) -> List[TripletData]:
     if lang not in _nlp_pipelines:
         logger.error(f"Unsupported language: {lang}")
         return []
 
-    nlp = _nlp_pipelines[lang]
-    doc = nlp(text)
-    triplets = []
-
-    for sentence in doc.sentences:
-        root = next((w for w in sentence.words if w.head == 0), None)
-        if not root:
-            continue
-
-        predicate = root.lemma
-        predicate_type = clean_type(root.upos)
-
-        subjects = []
-        objects = []
-
-        for word in sentence.words:
-            if word.head == root.id and word.deprel in ("nsubj", "nsubj:pass"):
-                subjects.append((word.text, clean_type(word.upos)))
-            elif word.head == root.id and word.deprel in (
-                "obj",
-                "iobj",
-                "obl",
-                "xcomp",
-                "attr",
-            ):
-                objects.append((word.text, clean_type(word.upos)))
-
-        for i, (subj_text, subj_type) in enumerate(subjects):
-            for obj_text, obj_type in objects:
-                triplets.append(
-                    TripletData(
-                        position=i,
-                        subject=subj_text,
-                        subject_type=subj_type,
-                        predicate=predicate,
-                        predicate_type=predicate_type,
-                        object=obj_text,
-                        object_type=obj_type,
-                        language=lang,
-                    )
-                )
+    sentences = parse_sentences(split_sentences(text=text, lang=lang), lang=lang)
+    return derive_triplets(
+        sentences=[sentence for sentence in sentences if sentence], lang=lang
+    )
+
+
+@nlp_stage("extract_triplets_batch")
+def extract_triplets_batch(
+    texts: Dict[K, str], lang: Lang
+) -> Dict[K, List[TripletData]]:
+    if lang not in _nlp_pipelines:
+        logger.error(f"Unsupported language: {lang}")
+        return {key: [] for key in texts}
 
-    return triplets
+    keys = list(texts.keys())
+    split = split_sentences_batch(texts=[texts[key] for key in keys], lang=lang)
+    parsed = parse_documents(documents=split, lang=lang)
+    return {
+        key: derive_triplets(
+            sentences=[sentence for sentence in sentences if sentence], lang=lang
+        )
+        for key, sentences in zip(keys, parsed)
+    }
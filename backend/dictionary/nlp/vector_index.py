@@ -0,0 +1,262 @@
+import fcntl
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Tuple, Iterator
+import numpy as np
+from loguru import logger
+from dictionary.nlp.embeddings import EMBEDDING_DIM, get_active_version
+
+
+VECTOR_SEARCH_ENGINE = os.environ.get("VECTOR_SEARCH_ENGINE", "database")
+if VECTOR_SEARCH_ENGINE not in ("database", "memory"):
+    raise ValueError(f"Unsupported vector search engine: {VECTOR_SEARCH_ENGINE}")
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", "vector_index")
+# `embedding_changes` rows older than this are pruned whatever the engine, so
+# older snapshots cannot be caught up from the feed and are exported anew
+VECTOR_INDEX_CHANGES_RETENTION = float(os.environ.get("VECTOR_INDEX_CHANGES_RETENTION", 86400))
+
+MANIFEST = "manifest.json"
+
+
+# A snapshot is a raw float32 matrix of unit vectors plus raw 16-byte description
+# ids, both memory-mapped read-only so every worker on the host shares the same
+# page cache. Rows changed since the snapshot are masked and served from a small
+# in-memory delta until the next snapshot is written.
+class _State:
+    def __init__(
+        self,
+        change_id: int,
+        matrix: np.ndarray,
+        ids: np.ndarray,
+        rows: Dict[bytes, int],
+    ):
+        self.change_id = change_id
+        self.matrix = matrix
+        self.ids = ids
+        self.rows = rows
+        self.masked = np.zeros(len(ids), dtype=bool)
+        self.delta: Dict[bytes, np.ndarray] = {}
+        self.delta_ids = np.empty((0, 16), dtype=np.uint8)
+        self.delta_matrix = np.empty((0, matrix.shape[1]), dtype=np.float32)
+
+
+class SnapshotWriter:
+    def __init__(
+        self, directory: str, change_id: int, model_version: str, dim: int = EMBEDDING_DIM
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.change_id = change_id
+        self.model_version = model_version
+        self.dim = dim
+        self.count = 0
+        self.ids: List[bytes] = []
+        # every export gets fresh file names: a re-export at the same change id
+        # must not rewrite files other workers still have mapped
+        self.generation = uuid.uuid4().hex
+        self.vectors_file = f"vectors-{self.generation}.f32"
+        self.ids_file = f"ids-{self.generation}.npy"
+        self._vectors = open(os.path.join(directory, self.vectors_file + ".tmp"), "wb")
+
+    def append(self, ids: List[bytes], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        self._vectors.write(vectors.tobytes())
+        self.ids.extend(ids)
+        self.count += len(ids)
+
+    def commit(self) -> None:
+        self._vectors.close()
+        ids_path = os.path.join(self.directory, self.ids_file)
+        with open(ids_path + ".tmp", "wb") as f:
+            np.save(f, _ids_array(self.ids))
+        os.replace(ids_path + ".tmp", ids_path)
+        os.replace(
+            os.path.join(self.directory, self.vectors_file + ".tmp"),
+            os.path.join(self.directory, self.vectors_file),
+        )
+
+        manifest = {
+            "generation": self.generation,
+            "change_id": self.change_id,
+            "model_version": self.model_version,
+            "count": self.count,
+            "dim": self.dim,
+            "vectors": self.vectors_file,
+            "ids": self.ids_file,
+            "exported_at": time.time(),
+        }
+        manifest_path = os.path.join(self.directory, MANIFEST)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+        # workers still mapping an older snapshot keep it alive until they reload
+        current = {self.vectors_file, self.ids_file, MANIFEST, "export.lock"}
+        for name in os.listdir(self.directory):
+            if name not in current and not name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))
+        logger.info(f"Wrote vector snapshot of {self.count} rows at change {self.change_id}")
+
+
+def _ids_array(ids: List[bytes]) -> np.ndarray:
+    # uuid bytes as uint8 rows; numpy "S16" would strip trailing zero bytes
+    return np.frombuffer(b"".join(ids), dtype=np.uint8).reshape(-1, 16)
+
+
+@contextmanager
+def export_lock(directory: str) -> Iterator[bool]:
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "export.lock"), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_manifest(directory: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k < len(scores):
+        candidates = np.argpartition(scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    def __init__(self, directory: str = VECTOR_INDEX_DIR, dim: int = EMBEDDING_DIM):
+        self.directory = directory
+        self.dim = dim
+        self._state: Optional[_State] = None
+        self._generation: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._state is not None
+
+    @property
+    def generation(self) -> Optional[str]:
+        return self._generation if self._state else None
+
+    @property
+    def change_id(self) -> int:
+        return self._state.change_id if self._state else 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._state.delta) + int(self._state.masked.sum()) if self._state else 0
+
+    def load(self) -> bool:
+        manifest = read_manifest(self.directory)
+        if manifest is None:
+            return False
+        if manifest.get("model_version") != get_active_version():
+            # vectors of another model are useless for queries of the active one
+            self._state = None
+            self._generation = None
+            return False
+        # generations, not change ids: after the feed is pruned a new snapshot
+        # can sit at a lower change id than the loaded one
+        generation = manifest.get("generation", str(manifest["change_id"]))
+        if self._state is not None and generation == self._generation:
+            return True
+        if time.time() - manifest.get("exported_at", 0) > VECTOR_INDEX_CHANGES_RETENTION:
+            logger.info("Vector snapshot is older than the change feed retention")
+            return False
+        if manifest["dim"] != self.dim:
+            logger.error(f"Vector snapshot has dim {manifest['dim']}, expected {self.dim}")
+            return False
+
+        count = manifest["count"]
+        if count:
+            matrix = np.memmap(
+                os.path.join(self.directory, manifest["vectors"]),
+                dtype=np.float32,
+                mode="r",
+                shape=(count, self.dim),
+            )
+        else:
+            matrix = np.empty((0, self.dim), dtype=np.float32)
+        ids = np.load(os.path.join(self.directory, manifest["ids"]), mmap_mode="r")
+        rows = {description_id.tobytes(): row for row, description_id in enumerate(ids)}
+
+        self._state = _State(
+            change_id=manifest["change_id"], matrix=matrix, ids=ids, rows=rows
+        )
+        self._generation = generation
+        logger.info(f"Loaded vector snapshot of {count} rows at change {manifest['change_id']}")
+        return True
+
+    def apply(self, updates: Dict[bytes, Optional[List[float]]], change_id: int) -> None:
+        # `None` removes the description; states are swapped whole so concurrent
+        # searches in worker threads never see a half-applied batch
+        old = self._state
+        state = _State(
+            change_id=change_id, matrix=old.matrix, ids=old.ids, rows=old.rows
+        )
+        state.masked = old.masked.copy()
+        state.delta = dict(old.delta)
+        for description_id, vector in updates.items():
+            row = state.rows.get(description_id)
+            if row is not None:
+                state.masked[row] = True
+            if vector is None:
+                state.delta.pop(description_id, None)
+            else:
+                state.delta[description_id] = np.asarray(vector, dtype=np.float32)
+
+        if state.delta:
+            state.delta_ids = _ids_array(list(state.delta.keys()))
+            state.delta_matrix = np.stack(list(state.delta.values()))
+        self._state = state
+
+    def search(self, qv: List[float], k: int) -> List[Tuple[uuid.UUID, float]]:
+        state = self._state
+        q = np.asarray(qv, dtype=np.float32)
+
+        # negative inner product of unit vectors, as `<#>` in the database
+        scores_parts, ids_parts = [], []
+        if len(state.ids):
+            scores = -(state.matrix @ q)
+            scores[state.masked] = np.inf
+            top = _top_k(scores, k)
+            scores_parts.append(scores[top])
+            ids_parts.append(state.ids[top])
+        if len(state.delta_ids):
+            scores = -(state.delta_matrix @ q)
+            top = _top_k(scores, k)
+            scores_parts.append(scores[top])
+            ids_parts.append(state.delta_ids[top])
+        if not scores_parts:
+            return []
+
+        scores = np.concatenate(scores_parts)
+        ids = np.concatenate(ids_parts)
+        top = _top_k(scores, k)
+        distances = 1.0 + scores[top]
+        return [
+            (uuid.UUID(bytes=ids[i].tobytes()), float(distance))
+            for i, distance in zip(top, distances)
+            if np.isfinite(scores[i])
+        ]
+
+
+_vector_index = VectorIndex()
+
+
+def get_vector_index() -> VectorIndex:
+    return _vector_index
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, status
+from typing import Dict, Any
+from dictionary.misc.admission import admission_report
+
+
+router = APIRouter(
+    prefix="/admission",
+    tags=["Admission"],
+)
+
+
+@router.get(
+    "",
+    status_code=status.HTTP_200_OK,
+    summary="Pending NLP tasks, in-flight vectorizations and rejections per lane",
+    response_model=Dict[str, Any],
+)
+async def fetch_admission_report():
+    return admission_report()
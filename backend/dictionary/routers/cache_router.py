@@ -0,0 +1,35 @@
+from fastapi import APIRouter, status
+from typing import Dict, Any
+from dictionary.misc.response_cache import get_response_cache
+from dictionary.misc.compression import available_encodings, get_compressed_cache
+
+
+router = APIRouter(
+    prefix="/cache",
+    tags=["Cache"],
+)
+
+
+@router.get(
+    "",
+    status_code=status.HTTP_200_OK,
+    summary="Response cache size, table versions and per-route hit/miss counts",
+    response_model=Dict[str, Any],
+)
+async def fetch_cache_report():
+    compressed = get_compressed_cache().report()
+    del compressed["versions"]
+    return {
+        **get_response_cache().report(),
+        "compressed": {**compressed, "encodings": available_encodings()},
+    }
+
+
+@router.delete(
+    "",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Drop every cached response and compressed body",
+)
+async def clear_cache():
+    get_response_cache().clear()
+    get_compressed_cache().clear()
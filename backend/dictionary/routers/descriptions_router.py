@@ -1,27 +1,46 @@
-import asyncio
+import os
+from typing import Optional, List, Dict
+from loguru import logger
 from pydantic import UUID4
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from dictionary.database.engine import get_session
+from dictionary.misc.conditional_get import conditional_get
 from dictionary.database.models import Descriptions
 from dictionary.views import (
     Description,
     DescriptionsResponse,
     ProcessedDescription,
+    dump_description,
 )
 from dictionary.database.queries import (
     save_description,
+    save_descriptions,
     select_description_by_id,
     select_description_by_raw_text,
     select_description_by_cleaned_text,
     select_description_by_stemmed_text,
     select_description_by_term_id,
+    select_description_ids_by_term_ids,
 )
 from dictionary.nlp.languages import Lang, detect_language
 from dictionary.nlp.preprocessing import clean_text
 from dictionary.nlp.stemming import stem_tokens
+from dictionary.nlp.minhash import NEAR_DUPLICATE_MODE, LSHIndex
+from dictionary.misc.response_cache import cached_response
+from dictionary.misc.serialization import json_response
+from dictionary.misc.admission import Lane, get_lane, get_bulk_lane
 from dictionary.background_tasks.background_embeddings import create_embedding, update_embedding
-from dictionary.background_tasks.background_triplets import create_triplets_and_graphs, update_triplets_and_graphs
+from dictionary.background_tasks.background_near_duplicates import (
+    minhash_signature,
+    find_near_duplicates,
+    register_minhashes,
+)
+from dictionary.background_tasks.background_triplets import (
+    create_triplets_and_graphs,
+    create_triplets_and_graphs_batch,
+    update_triplets_and_graphs,
+)
 
 
 router = APIRouter(
@@ -31,15 +50,12 @@ router = APIRouter(
 )
 
 
-@router.post(
-    "",
-    status_code=status.HTTP_200_OK,
-    summary="Add description to term",
-    response_model=DescriptionsResponse,
-)
-async def create_description(
-    body_obj: Description, session: AsyncSession = Depends(get_session)
-):
+BULK_MAX_DESCRIPTIONS = int(os.environ.get("BULK_MAX_DESCRIPTIONS", 500))
+
+
+async def prepare_description(
+    body_obj: Description, session: AsyncSession
+) -> Descriptions:
     raw_text_descriptions_object = await select_description_by_raw_text(
         raw_text=body_obj.raw_text, session=session
     )
@@ -73,32 +89,44 @@ async def create_description(
             status_code=status.HTTP_409_CONFLICT,
             detail="Description with the same stemmed text already exists.",
         )
-    descriptions_object = Descriptions(
+    return Descriptions(
         term_id=body_obj.term_id,
         language=lang.value,
         raw_text=body_obj.raw_text,
-        cleaned_text=" ".join(cleaned_tokens),
-        stemmed_text=" ".join(stemmed_tokens),
+        cleaned_text=cleaned_text,
+        stemmed_text=stemmed_text,
         info=body_obj.info,
     )
-    descriptions_object = await save_description(
-        description=descriptions_object, session=session
-    )
-    asyncio.create_task(
-        create_embedding(
-            text=" ".join(stemmed_tokens),
-            lang=lang,
-            description_id=descriptions_object.id,
-        )
+
+
+async def check_near_duplicates(
+    descriptions_object: Descriptions,
+    session: AsyncSession,
+    batch_index: Optional[LSHIndex] = None,
+) -> List[UUID4]:
+    if NEAR_DUPLICATE_MODE == "off":
+        return []
+    signature = minhash_signature(descriptions_object.stemmed_text)
+    matches = await find_near_duplicates(
+        signature=signature, language=descriptions_object.language, session=session
     )
-    asyncio.create_task(
-        create_triplets_and_graphs(
-            text=body_obj.raw_text,
-            lang=lang,
-            description_id=descriptions_object.id,
+    if batch_index is not None:
+        matches += batch_index.query(signature)
+
+    if matches and NEAR_DUPLICATE_MODE == "reject":
+        description_id, score = max(matches, key=lambda match: match[1])
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Description is a near-duplicate of {description_id} (similarity {score:.2f}).",
         )
-    )
+    if batch_index is not None:
+        batch_index.add(descriptions_object.id, signature)
+    return [description_id for description_id, _ in matches]
 
+
+def to_descriptions_response(
+    descriptions_object: Descriptions, near_duplicates: Optional[List[UUID4]] = None
+) -> DescriptionsResponse:
     return DescriptionsResponse(
         id=descriptions_object.id,
         description=Description(
@@ -112,9 +140,151 @@ async def create_description(
             info=descriptions_object.info,
         ),
         created_at=descriptions_object.created_at,
+        near_duplicates=near_duplicates or None,
     )
 
 
+@router.post(
+    "",
+    status_code=status.HTTP_200_OK,
+    summary="Add description to term",
+    response_model=DescriptionsResponse,
+)
+async def create_description(
+    body_obj: Description,
+    session: AsyncSession = Depends(get_session),
+    lane: Lane = Depends(get_lane),
+):
+    with lane.admit(tasks=2) as admission:
+        descriptions_object = await prepare_description(body_obj=body_obj, session=session)
+        near_duplicates = await check_near_duplicates(
+            descriptions_object=descriptions_object, session=session
+        )
+        descriptions_object = await save_description(
+            description=descriptions_object, session=session
+        )
+        await register_minhashes(descriptions_objects=[descriptions_object])
+        lang = Lang(descriptions_object.language)
+        admission.spawn(
+            create_embedding(
+                text=descriptions_object.stemmed_text,
+                lang=lang,
+                description_id=descriptions_object.id,
+            )
+        )
+        admission.spawn(
+            create_triplets_and_graphs(
+                text=descriptions_object.raw_text,
+                lang=lang,
+                description_id=descriptions_object.id,
+            )
+        )
+
+    return to_descriptions_response(descriptions_object, near_duplicates=near_duplicates)
+
+
+@router.post(
+    "/bulk",
+    status_code=status.HTTP_200_OK,
+    summary="Add descriptions to terms in bulk",
+    response_model=List[DescriptionsResponse],
+)
+@json_response
+async def create_descriptions_bulk(
+    body_objs: List[Description], session: AsyncSession = Depends(get_session)
+):
+    if len(body_objs) > BULK_MAX_DESCRIPTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_MAX_DESCRIPTIONS} descriptions per request.",
+        )
+    # one embedding per description plus at most one parse batch per language
+    lane = get_bulk_lane()
+    with lane.admit(tasks=len(body_objs) + len(Lang)) as admission:
+
+        # descriptions.term_id is unique and must reference a term; entries that
+        # would violate either are skipped here so they cannot fail the whole insert
+        described_terms = await select_description_ids_by_term_ids(
+            term_ids=[body_obj.term_id for body_obj in body_objs], session=session
+        )
+        descriptions_objects = []
+        near_duplicates: Dict[UUID4, List[UUID4]] = {}
+        seen_texts = set()
+        seen_term_ids = set()
+        batch_indexes: Dict[str, LSHIndex] = {}
+        for body_obj in body_objs:
+            if body_obj.term_id not in described_terms:
+                logger.warning(f"Skipping description for {body_obj.term_id=}: term not found")
+                continue
+            if described_terms[body_obj.term_id] is not None or body_obj.term_id in seen_term_ids:
+                logger.warning(
+                    f"Skipping description for {body_obj.term_id=}: term already has one"
+                )
+                continue
+            try:
+                descriptions_object = await prepare_description(
+                    body_obj=body_obj, session=session
+                )
+            except HTTPException as e:
+                logger.warning(f"Skipping description for {body_obj.term_id=}: {e.detail}")
+                continue
+
+            texts = {
+                descriptions_object.raw_text,
+                descriptions_object.cleaned_text,
+                descriptions_object.stemmed_text,
+            }
+            if texts & seen_texts:
+                logger.warning(f"Skipping duplicate description for {body_obj.term_id=}")
+                continue
+
+            try:
+                near_duplicates[descriptions_object.id] = await check_near_duplicates(
+                    descriptions_object=descriptions_object,
+                    session=session,
+                    batch_index=batch_indexes.setdefault(descriptions_object.language, LSHIndex()),
+                )
+            except HTTPException as e:
+                logger.warning(f"Skipping description for {body_obj.term_id=}: {e.detail}")
+                continue
+            seen_texts |= texts
+            seen_term_ids.add(body_obj.term_id)
+            descriptions_objects.append(descriptions_object)
+
+        if not descriptions_objects:
+            return []
+
+        descriptions_objects = await save_descriptions(
+            descriptions=descriptions_objects, session=session
+        )
+        await register_minhashes(descriptions_objects=descriptions_objects)
+
+        texts_by_lang: Dict[Lang, Dict[UUID4, str]] = {}
+        for descriptions_object in descriptions_objects:
+            lang = Lang(descriptions_object.language)
+            admission.spawn(
+                create_embedding(
+                    text=descriptions_object.stemmed_text,
+                    lang=lang,
+                    description_id=descriptions_object.id,
+                )
+            )
+            texts_by_lang.setdefault(lang, {})[descriptions_object.id] = (
+                descriptions_object.raw_text
+            )
+
+        for lang, texts in texts_by_lang.items():
+            admission.spawn(create_triplets_and_graphs_batch(texts=texts, lang=lang))
+
+    return [
+        dump_description(
+            descriptions_object,
+            near_duplicates=near_duplicates.get(descriptions_object.id),
+        )
+        for descriptions_object in descriptions_objects
+    ]
+
+
 @router.put(
     "/raw_text/{new_descriptions_raw_text}",
     status_code=status.HTTP_200_OK,
@@ -122,7 +292,10 @@ async def create_description(
     response_model=DescriptionsResponse,
 )
 async def change_descriptions_raw_text(
-    description_id: UUID4, new_descriptions_raw_text: str, session: AsyncSession = Depends(get_session)
+    description_id: UUID4,
+    new_descriptions_raw_text: str,
+    session: AsyncSession = Depends(get_session),
+    lane: Lane = Depends(get_lane),
 ):
     descriptions_object = await select_description_by_id(
         id=description_id, session=session
@@ -136,39 +309,41 @@ async def change_descriptions_raw_text(
 
     lang=Lang(descriptions_object.language)
     if new_descriptions_raw_text != descriptions_object.raw_text:
-        descriptions_object.raw_text = new_descriptions_raw_text
+        with lane.admit(tasks=2) as admission:
+            descriptions_object.raw_text = new_descriptions_raw_text
 
-        asyncio.create_task(
-            update_triplets_and_graphs(
-                text=new_descriptions_raw_text,
-                lang=lang,
-                description_id=descriptions_object.id,
+            admission.spawn(
+                update_triplets_and_graphs(
+                    text=new_descriptions_raw_text,
+                    lang=lang,
+                    description_id=descriptions_object.id,
+                )
             )
-        )
 
-        cleaned_tokens = clean_text(text=new_descriptions_raw_text, language=lang)
-        cleaned_text = " ".join(cleaned_tokens)
+            cleaned_tokens = clean_text(text=new_descriptions_raw_text, language=lang)
+            cleaned_text = " ".join(cleaned_tokens)
 
-        if cleaned_text != descriptions_object.cleaned_text:
-            descriptions_object.cleaned_text = cleaned_text
+            if cleaned_text != descriptions_object.cleaned_text:
+                descriptions_object.cleaned_text = cleaned_text
 
-            stemmed_tokens = stem_tokens(cleaned_tokens, language=lang)
-            stemmed_text = " ".join(stemmed_tokens)
+                stemmed_tokens = stem_tokens(cleaned_tokens, language=lang)
+                stemmed_text = " ".join(stemmed_tokens)
 
-            if stemmed_text != descriptions_object.stemmed_text:
-                descriptions_object.stemmed_text = stemmed_text
+                if stemmed_text != descriptions_object.stemmed_text:
+                    descriptions_object.stemmed_text = stemmed_text
 
-                asyncio.create_task(
-                    update_embedding(
-                        text=stemmed_text,
-                        lang=lang,
-                        description_id=descriptions_object.id,
+                    admission.spawn(
+                        update_embedding(
+                            text=stemmed_text,
+                            lang=lang,
+                            description_id=descriptions_object.id,
+                        )
                     )
-                )
 
-        descriptions_object = await save_description(
-            description=descriptions_object, session=session
-        )
+            descriptions_object = await save_description(
+                description=descriptions_object, session=session
+            )
+            await register_minhashes(descriptions_objects=[descriptions_object])
 
     return DescriptionsResponse(
         id=descriptions_object.id,
@@ -193,7 +368,10 @@ async def change_descriptions_raw_text(
     response_model=DescriptionsResponse,
 )
 async def change_descriptions_cleaned_text(
-    description_id: UUID4, new_descriptions_cleaned_text: str, session: AsyncSession = Depends(get_session)
+    description_id: UUID4,
+    new_descriptions_cleaned_text: str,
+    session: AsyncSession = Depends(get_session),
+    lane: Lane = Depends(get_lane),
 ):
     descriptions_object = await select_description_by_id(
         id=description_id, session=session
@@ -207,27 +385,29 @@ async def change_descriptions_cleaned_text(
 
     lang=Lang(descriptions_object.language)
     if new_descriptions_cleaned_text != descriptions_object.cleaned_text:
-        descriptions_object.cleaned_text = new_descriptions_cleaned_text
+        with lane.admit(tasks=1) as admission:
+            descriptions_object.cleaned_text = new_descriptions_cleaned_text
 
-        cleaned_tokens = new_descriptions_cleaned_text.split()
-        stemmed_tokens = stem_tokens(cleaned_tokens, language=lang)
-        stemmed_text = " ".join(stemmed_tokens)
+            cleaned_tokens = new_descriptions_cleaned_text.split()
+            stemmed_tokens = stem_tokens(cleaned_tokens, language=lang)
+            stemmed_text = " ".join(stemmed_tokens)
 
-        if stemmed_text != descriptions_object.stemmed_text:
+            if stemmed_text != descriptions_object.stemmed_text:
 
-            descriptions_object.stemmed_text = stemmed_text
+                descriptions_object.stemmed_text = stemmed_text
 
-            asyncio.create_task(
-                update_embedding(
-                    text=stemmed_text,
-                    lang=lang,
-                    description_id=descriptions_object.id,
+                admission.spawn(
+                    update_embedding(
+                        text=stemmed_text,
+                        lang=lang,
+                        description_id=descriptions_object.id,
+                    )
                 )
-            )
 
-        descriptions_object = await save_description(
-            description=descriptions_object, session=session
-        )
+            descriptions_object = await save_description(
+                description=descriptions_object, session=session
+            )
+            await register_minhashes(descriptions_objects=[descriptions_object])
 
     return DescriptionsResponse(
         id=descriptions_object.id,
@@ -252,7 +432,10 @@ async def change_descriptions_cleaned_text(
     response_model=DescriptionsResponse,
 )
 async def change_descriptions_stemmed_text(
-    description_id: UUID4, new_descriptions_stemmed_text: str, session: AsyncSession = Depends(get_session)
+    description_id: UUID4,
+    new_descriptions_stemmed_text: str,
+    session: AsyncSession = Depends(get_session),
+    lane: Lane = Depends(get_lane),
 ):
     descriptions_object = await select_description_by_id(
         id=description_id, session=session
@@ -266,19 +449,21 @@ async def change_descriptions_stemmed_text(
 
     lang=Lang(descriptions_object.language)
     if new_descriptions_stemmed_text != descriptions_object.stemmed_text:
-        descriptions_object.stemmed_text = new_descriptions_stemmed_text
+        with lane.admit(tasks=1) as admission:
+            descriptions_object.stemmed_text = new_descriptions_stemmed_text
 
-        descriptions_object = await save_description(
-            description=descriptions_object, session=session
-        )
+            descriptions_object = await save_description(
+                description=descriptions_object, session=session
+            )
+            await register_minhashes(descriptions_objects=[descriptions_object])
 
-        asyncio.create_task(
-            update_embedding(
-                text=new_descriptions_stemmed_text,
-                lang=lang,
-                description_id=descriptions_object.id,
+            admission.spawn(
+                update_embedding(
+                    text=new_descriptions_stemmed_text,
+                    lang=lang,
+                    description_id=descriptions_object.id,
+                )
             )
-        )
 
     return DescriptionsResponse(
         id=descriptions_object.id,
@@ -335,7 +520,10 @@ async def change_descriptions_stemmed_text(
     status_code=status.HTTP_200_OK,
     summary="Get description by term_id",
     response_model=DescriptionsResponse,
+    dependencies=[Depends(conditional_get("descriptions"))],
 )
+@json_response
+@cached_response("descriptions")
 async def fetch_description_by_term_id(
     term_id: UUID4, session: AsyncSession = Depends(get_session)
 ):
@@ -348,17 +536,4 @@ async def fetch_description_by_term_id(
             status_code=404, detail=f"Description related with {term_id=} not found!"
         )
 
-    return DescriptionsResponse(
-        id=descriptions_object.id,
-        description=Description(
-            term_id=descriptions_object.term_id,
-            language=Lang(descriptions_object.language),
-            raw_text=descriptions_object.raw_text,
-            processed_text=ProcessedDescription(
-                cleaned_text=descriptions_object.cleaned_text,
-                stemmed_text=descriptions_object.stemmed_text,
-            ),
-            info=descriptions_object.info,
-        ),
-        created_at=descriptions_object.created_at,
-    )
+    return dump_description(descriptions_object)
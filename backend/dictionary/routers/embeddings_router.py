@@ -1,23 +1,115 @@
+import asyncio
+import os
 from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
+from typing import Optional, List, Dict, Any, Tuple
+from loguru import logger
 from pydantic import BaseModel, UUID4
 from sqlalchemy.ext.asyncio import AsyncSession
 from dictionary.database.engine import get_session
-from dictionary.database.queries import search_terms_by_embedding
-from dictionary.nlp.embeddings import vectorize_text
+from dictionary.database.models import Terms
+from dictionary.database.queries import (
+    search_terms_by_embedding,
+    search_terms_hybrid,
+    search_terms_by_embeddings_batch,
+    select_terms_by_description_ids,
+    search_results_by_embedding,
+    select_search_results,
+)
+from dictionary.nlp.embeddings import (
+    vectorize_text,
+    vectorize_texts,
+    get_active_version,
+    get_version_backend,
+    get_write_versions,
+)
 from dictionary.nlp.languages import detect_language, Lang
 from dictionary.nlp.preprocessing import clean_text
 from dictionary.nlp.stemming import stem_tokens
-from dictionary.views import Term, ProcessedTerm, TermsResponse
+from dictionary.nlp.vector_index import VECTOR_SEARCH_ENGINE, get_vector_index
+from dictionary.misc.serialization import json_response
+from dictionary.misc.admission import Lane, get_lane
+from dictionary.views import (
+    TermsResponse,
+    SearchMode,
+    BatchSearchRequest,
+    dump_term,
+)
 
 router = APIRouter(tags=["search"])
 
 
+SEARCH_LEXICAL_DEPTH = int(os.environ.get("SEARCH_LEXICAL_DEPTH", 50))
+SEARCH_VECTOR_DEPTH = int(os.environ.get("SEARCH_VECTOR_DEPTH", 50))
+SEARCH_MAX_DEPTH = int(os.environ.get("SEARCH_MAX_DEPTH", 500))
+SEARCH_RRF_K = int(os.environ.get("SEARCH_RRF_K", 60))
+SEARCH_BATCH_MAX_QUERIES = int(os.environ.get("SEARCH_BATCH_MAX_QUERIES", 100))
+SEARCH_TRIPLET_SUMMARY_LIMIT = int(os.environ.get("SEARCH_TRIPLET_SUMMARY_LIMIT", 5))
+
+
 class SearchResult(BaseModel):
     id: UUID4
     term: str
+    language: Lang
+    description_id: UUID4
     definition: str
     distance: float
+    triplets: Optional[List[str]] = None
+
+
+async def vectorize_query(query: str, lane: Lane) -> Tuple[Lang, List[float]]:
+    try:
+        lang: Lang = detect_language(query)
+    except ValueError as e:
+        raise HTTPException(400, f"Language detection failed: {e}")
+
+    cleaned_tokens = clean_text(text=query, language=lang)
+    stemmed_tokens = stem_tokens(cleaned_tokens, language=lang)
+    stemmed_text = " ".join(stemmed_tokens)
+    async with lane.vectorization():
+        vec = await asyncio.to_thread(vectorize_text, stemmed_text, lang)
+    if vec is None:
+        raise HTTPException(500, "Failed to vectorize your query")
+    return lang, vec
+
+
+async def search_terms_in_memory_batch(
+    qvs: List[List[float]], ks: List[int], session: AsyncSession
+) -> Optional[List[List[Terms]]]:
+    # None means "ask the database": engine disabled, snapshot not loaded yet or failed
+    index = get_vector_index()
+    if VECTOR_SEARCH_ENGINE != "memory" or not index.ready:
+        return None
+
+    def search_all():
+        return [index.search(qv, k) for qv, k in zip(qvs, ks)]
+
+    try:
+        hits_by_query = await asyncio.to_thread(search_all)
+    except Exception as e:
+        logger.error(f"In-process vector search failed, falling back to the database: {e}")
+        return None
+
+    description_ids = [
+        description_id for hits in hits_by_query for description_id, _ in hits
+    ]
+    terms_by_description = await select_terms_by_description_ids(
+        description_ids=description_ids, session=session
+    )
+    return [
+        [
+            terms_by_description[description_id]
+            for description_id, _ in hits
+            if description_id in terms_by_description
+        ]
+        for hits in hits_by_query
+    ]
+
+
+async def search_terms_in_memory(
+    qv: List[float], k: int, session: AsyncSession
+) -> Optional[List[Terms]]:
+    terms_by_query = await search_terms_in_memory_batch(qvs=[qv], ks=[k], session=session)
+    return terms_by_query[0] if terms_by_query is not None else None
 
 
 @router.post(
@@ -25,40 +117,140 @@ class SearchResult(BaseModel):
     summary="Vector‐search for terms by natural‐language query",
     response_model=List[TermsResponse],
 )
+@json_response
 async def search_terms(
     query: str,
     k: int = Query(10, ge=1, le=100, description="How many results to return"),
+    mode: SearchMode = Query(SearchMode.Vector, description="Vector-only or hybrid full-text + vector ranking"),
+    lexical_depth: int = Query(SEARCH_LEXICAL_DEPTH, ge=1, le=SEARCH_MAX_DEPTH, description="Full-text candidates fused in hybrid mode"),
+    vector_depth: int = Query(SEARCH_VECTOR_DEPTH, ge=1, le=SEARCH_MAX_DEPTH, description="Vector candidates fused in hybrid mode"),
     session: AsyncSession = Depends(get_session),
+    lane: Lane = Depends(get_lane),
 ):
-    try:
-        lang: Lang = detect_language(query)
-    except ValueError as e:
-        raise HTTPException(400, f"Language detection failed: {e}")
+    lang, vec = await vectorize_query(query, lane)
+
+    if mode == SearchMode.Hybrid:
+        terms_objects = await search_terms_hybrid(
+            query=query,
+            qv=vec,
+            language=lang.value,
+            k=k,
+            lexical_depth=lexical_depth,
+            vector_depth=vector_depth,
+            rrf_k=SEARCH_RRF_K,
+            session=session,
+        )
+    else:
+        terms_objects = await search_terms_in_memory(qv=vec, k=k, session=session)
+        if terms_objects is None:
+            terms_objects = await search_terms_by_embedding(qv=vec, k=k, session=session)
+
+    return [dump_term(terms_object) for terms_object in terms_objects]
 
-    cleaned_tokens = clean_text(text=query, language=lang)
-    stemmed_tokens = stem_tokens(cleaned_tokens, language=lang)
-    stemmed_text = " ".join(stemmed_tokens)
-    vec = vectorize_text(stemmed_text, lang)
-    if vec is None:
-        raise HTTPException(500, "Failed to vectorize your query")
 
-    terms_objects = await search_terms_by_embedding(qv=vec, k=k, session=session)
+@router.post(
+    "/search/results",
+    summary="Vector-search returning distance, description text and triplets per hit",
+    response_model=List[SearchResult],
+)
+@json_response
+async def search_results(
+    query: str,
+    k: int = Query(10, ge=1, le=100, description="How many results to return"),
+    include_triplets: bool = Query(False, description="Attach a short triplet summary to every hit"),
+    session: AsyncSession = Depends(get_session),
+    lane: Lane = Depends(get_lane),
+):
+    _, vec = await vectorize_query(query, lane)
+    triplet_limit = SEARCH_TRIPLET_SUMMARY_LIMIT if include_triplets else 0
+
+    rows = None
+    index = get_vector_index()
+    if VECTOR_SEARCH_ENGINE == "memory" and index.ready:
+        try:
+            hits = await asyncio.to_thread(index.search, vec, k)
+            rows = await select_search_results(
+                hits=hits, triplet_limit=triplet_limit, session=session
+            )
+        except Exception as e:
+            logger.error(f"In-process vector search failed, falling back to the database: {e}")
+    if rows is None:
+        rows = await search_results_by_embedding(
+            qv=vec, k=k, triplet_limit=triplet_limit, session=session
+        )
 
     return [
-        TermsResponse(
-            id=terms_object.id,
-            term=Term(
-                topic_id=terms_object.topic_id,
-                language=Lang(terms_object.language),
-                raw_text=terms_object.raw_text,
-                processed_text=ProcessedTerm(
-                    cleaned_text=terms_object.cleaned_text,
-                    stemmed_text=terms_object.stemmed_text,
-                    first_letter=terms_object.first_letter,
-                ),
-                info=terms_object.info,
-            ),
-            created_at=terms_object.created_at,
+        {
+            "id": row.term_id,
+            "term": row.term,
+            "language": row.language,
+            "description_id": row.description_id,
+            "definition": row.definition,
+            "distance": row.distance,
+            "triplets": row.triplets if include_triplets else None,
+        }
+        for row in rows
+    ]
+
+
+@router.post(
+    "/search/batch",
+    summary="Vector-search for many queries at once, results in input order",
+    response_model=List[List[TermsResponse]],
+)
+@json_response
+async def search_terms_batch(
+    body: BatchSearchRequest,
+    session: AsyncSession = Depends(get_session),
+    lane: Lane = Depends(get_lane),
+):
+    if len(body.queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            413, f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch, got {len(body.queries)}"
+        )
+
+    positions_by_lang: Dict[Lang, List[int]] = {}
+    stemmed_texts: List[str] = []
+    for position, search_query in enumerate(body.queries):
+        try:
+            lang: Lang = detect_language(search_query.query)
+        except ValueError as e:
+            raise HTTPException(400, f"Language detection failed for query {position}: {e}")
+        cleaned_tokens = clean_text(text=search_query.query, language=lang)
+        stemmed_texts.append(" ".join(stem_tokens(cleaned_tokens, language=lang)))
+        positions_by_lang.setdefault(lang, []).append(position)
+
+    vectors: List[Optional[List[float]]] = [None] * len(body.queries)
+    for lang, positions in positions_by_lang.items():
+        async with lane.vectorization():
+            lang_vectors = await asyncio.to_thread(
+                vectorize_texts, [stemmed_texts[position] for position in positions], lang
+            )
+        if lang_vectors is None:
+            raise HTTPException(500, "Failed to vectorize your queries")
+        for position, vector in zip(positions, lang_vectors):
+            vectors[position] = vector
+
+    ks = [search_query.k for search_query in body.queries]
+    terms_by_query = await search_terms_in_memory_batch(qvs=vectors, ks=ks, session=session)
+    if terms_by_query is None:
+        terms_by_query = await search_terms_by_embeddings_batch(
+            qvs=vectors, ks=ks, session=session
         )
-        for terms_object in terms_objects
+
+    return [
+        [dump_term(terms_object) for terms_object in terms_objects]
+        for terms_objects in terms_by_query
     ]
+
+
+@router.get(
+    "/embedding_backend",
+    summary="Active embedding backend with its throughput and memory footprint",
+    response_model=Dict[str, Any],
+)
+async def fetch_embedding_backend():
+    return {
+        **get_version_backend(get_active_version()).report(),
+        "write_versions": get_write_versions(),
+    }
@@ -2,12 +2,14 @@ from pydantic import UUID4
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from dictionary.database.engine import get_session
+from dictionary.misc.conditional_get import conditional_get
 from dictionary.database.queries import (
     select_description_by_id,
     select_graph_by_description_id,
 )
-from dictionary.views import Graph, GraphsResponse
-from dictionary.nlp.languages import Lang
+from dictionary.views import GraphsResponse, dump_graph
+from dictionary.misc.response_cache import cached_response
+from dictionary.misc.serialization import json_response
 
 
 router = APIRouter(
@@ -22,7 +24,10 @@ router = APIRouter(
     status_code=status.HTTP_200_OK,
     summary="Get graph by description_id",
     response_model=GraphsResponse,
+    dependencies=[Depends(conditional_get("descriptions", "graphs"))],
 )
+@json_response
+@cached_response("descriptions", "triplets", "graphs")
 async def fetch_graph_by_description_id(
     description_id: UUID4, session: AsyncSession = Depends(get_session)
 ):
@@ -45,14 +50,4 @@ async def fetch_graph_by_description_id(
             detail=f"Graphs object with {description_id=} not found!",
         )
 
-    return GraphsResponse(
-            id=graphs_object.id,
-            graph=Graph(
-                description_id=graphs_object.description_id,
-                triplet_count=graphs_object.triplet_count,
-                graph=graphs_object.graph,
-                info=graphs_object.info,
-                language=Lang(graphs_object.language),
-            ),
-            created_at=graphs_object.created_at,
-        )
+    return dump_graph(graphs_object)
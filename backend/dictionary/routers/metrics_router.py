@@ -0,0 +1,27 @@
+import os
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+from dictionary.misc.compression import no_compression
+from dictionary.misc.metrics import render
+from dictionary.misc.prefork import worker_pids
+
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"],
+)
+
+
+@router.get(
+    "",
+    status_code=status.HTTP_200_OK,
+    summary="Request, NLP stage, query, lane, pool and cache metrics in Prometheus text format",
+    response_class=PlainTextResponse,
+)
+# rendered anew for every scrape and read on the same host or network
+@no_compression
+async def fetch_metrics():
+    return PlainTextResponse(
+        render(live_pids=[os.getpid(), *worker_pids()]),
+        media_type="text/plain; version=0.0.4",
+    )
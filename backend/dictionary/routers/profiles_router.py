@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import FileResponse
+from typing import Dict, Any, List, Optional
+from dictionary.misc.compression import no_compression
+from dictionary.misc.profiling import PROFILE_TOKEN, PROFILE_TOKEN_HEADER, is_admin, list_profiles, profile_path
+
+
+def require_admin(
+    token: Optional[str] = Header(None, alias=PROFILE_TOKEN_HEADER),
+) -> None:
+    if not PROFILE_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profiles are disabled, PROFILE_TOKEN is not set",
+        )
+    if not is_admin(token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"{PROFILE_TOKEN_HEADER} header with the profiling token is required",
+        )
+
+
+router = APIRouter(
+    prefix="/profiles",
+    tags=["Profiles"],
+    dependencies=[Depends(require_admin)],
+)
+
+
+@router.get(
+    "",
+    status_code=status.HTTP_200_OK,
+    summary="Recorded request profiles, newest first",
+    response_model=List[Dict[str, Any]],
+)
+async def fetch_profiles():
+    return list_profiles()
+
+
+@router.get(
+    "/{profile_id}",
+    status_code=status.HTTP_200_OK,
+    summary="Download a profile as collapsed stacks for flamegraph.pl or speedscope",
+    response_class=FileResponse,
+)
+# served as a file so Range requests work; compressing would break their offsets
+@no_compression
+async def fetch_profile(profile_id: str):
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
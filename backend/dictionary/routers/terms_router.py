@@ -1,10 +1,13 @@
+import os
 from pydantic import UUID4
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Optional, List
 from dictionary.database.engine import get_session
+from dictionary.misc.admission import Lane, get_lane
+from dictionary.misc.conditional_get import conditional_get
 from dictionary.database.models import Terms
-from dictionary.views import Term, ProcessedTerm, TermsResponse
+from dictionary.views import Term, ProcessedTerm, TermsResponse, dump_term
 from dictionary.database.queries import (
     save_term,
     select_terms_by_first_letter,
@@ -13,6 +16,16 @@ from dictionary.database.queries import (
     select_term_by_stemmed_text,
     select_term_by_id,
     delete_term_by_id,
+    select_similar_terms,
+    select_description_ids,
+    select_related_terms_by_term_id,
+)
+from dictionary.nlp.minhash import forget_minhashes
+from dictionary.misc.response_cache import cached_response
+from dictionary.misc.serialization import json_response
+from dictionary.background_tasks.background_related_terms import (
+    RELATED_TERMS_N,
+    remove_related_terms,
 )
 from dictionary.nlp.languages import Lang, detect_language
 from dictionary.nlp.preprocessing import clean_text
@@ -26,6 +39,9 @@ router = APIRouter(
 )
 
 
+SIMILAR_TERMS_OVERFETCH = int(os.environ.get("SIMILAR_TERMS_OVERFETCH", 3))
+
+
 @router.post(
     "",
     status_code=status.HTTP_200_OK,
@@ -232,7 +248,9 @@ async def change_terms_stemmed_text(term_id: UUID4, new_terms_stemmed_text: str,
     summary="Delete term",
 )
 async def delete_term(
-    term_id: UUID4, session: AsyncSession = Depends(get_session)
+    term_id: UUID4,
+    session: AsyncSession = Depends(get_session),
+    lane: Lane = Depends(get_lane),
 ):
     terms_object = await select_term_by_id(id=term_id, session=session)
 
@@ -241,7 +259,11 @@ async def delete_term(
             status_code=404,
             detail=f"Term with {term_id=} not found",
         )
-    await delete_term_by_id(id=term_id, session=session)
+    description_ids = await select_description_ids(term_id=term_id, session=session)
+    with lane.admit(tasks=1) as admission:
+        await delete_term_by_id(id=term_id, session=session)
+        forget_minhashes(description_ids)
+        admission.spawn(remove_related_terms(description_ids=description_ids))
 
 
 @router.get(
@@ -249,7 +271,10 @@ async def delete_term(
     status_code=status.HTTP_200_OK,
     summary="Get term by first letter and topic id",
     response_model=List[TermsResponse],
+    dependencies=[Depends(conditional_get("terms"))],
 )
+@json_response
+@cached_response("terms")
 async def fetch_terms_by_letter(
     first_letter: str,
     topic_id: UUID4,
@@ -261,24 +286,7 @@ async def fetch_terms_by_letter(
         first_letter=first_letter, topic_id=topic_id, limit=limit, session=session
     )
 
-    return [
-        TermsResponse(
-            id=terms_object.id,
-            term=Term(
-                topic_id=terms_object.topic_id,
-                language=Lang(terms_object.language),
-                raw_text=terms_object.raw_text,
-                processed_text=ProcessedTerm(
-                    cleaned_text=terms_object.cleaned_text,
-                    stemmed_text=terms_object.stemmed_text,
-                    first_letter=terms_object.first_letter,
-                ),
-                info=terms_object.info,
-            ),
-            created_at=terms_object.created_at,
-        )
-        for terms_object in terms_objects
-    ]
+    return [dump_term(terms_object) for terms_object in terms_objects]
 
 
 @router.get(
@@ -286,7 +294,10 @@ async def fetch_terms_by_letter(
     status_code=status.HTTP_200_OK,
     summary="Get term by id",
     response_model=TermsResponse,
+    dependencies=[Depends(conditional_get("terms"))],
 )
+@json_response
+@cached_response("terms")
 async def fetch_terms_by_id(
     term_id: UUID4, session: AsyncSession = Depends(get_session)
 ):
@@ -295,18 +306,60 @@ async def fetch_terms_by_id(
     if terms_object is None:
         raise HTTPException(status_code=404, detail=f"Term with {term_id=} not found!")
 
-    return TermsResponse(
-        id=terms_object.id,
-        term=Term(
-            topic_id=terms_object.topic_id,
-            language=Lang(terms_object.language),
-            raw_text=terms_object.raw_text,
-            processed_text=ProcessedTerm(
-                cleaned_text=terms_object.cleaned_text,
-                stemmed_text=terms_object.stemmed_text,
-                first_letter=terms_object.first_letter,
-            ),
-            info=terms_object.info,
-        ),
-        created_at=terms_object.created_at,
+    return dump_term(terms_object)
+
+
+@router.get(
+    "/{term_id}/similar",
+    status_code=status.HTTP_200_OK,
+    summary="Get terms whose descriptions are closest to this term's descriptions",
+    response_model=List[TermsResponse],
+    dependencies=[
+        Depends(
+            conditional_get("terms", "descriptions", "embeddings", "embedding_versions")
+        )
+    ],
+)
+@json_response
+async def fetch_similar_terms(
+    term_id: UUID4,
+    k: int = Query(10, ge=1, le=100, description="How many terms to return"),
+    topic_id: Optional[UUID4] = None,
+    language: Optional[Lang] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    terms_object = await select_term_by_id(id=term_id, session=session)
+
+    if terms_object is None:
+        raise HTTPException(status_code=404, detail=f"Term with {term_id=} not found!")
+
+    terms_objects = await select_similar_terms(
+        term_id=term_id,
+        k=k,
+        depth=k * SIMILAR_TERMS_OVERFETCH,
+        topic_id=topic_id,
+        language=language.value if language else None,
+        session=session,
     )
+
+    return [dump_term(terms_object) for terms_object in terms_objects]
+
+
+@router.get(
+    "/{term_id}/related",
+    status_code=status.HTTP_200_OK,
+    summary="Get precomputed related terms",
+    response_model=List[TermsResponse],
+    dependencies=[Depends(conditional_get("terms", "related_terms"))],
+)
+@json_response
+async def fetch_related_terms(
+    term_id: UUID4,
+    k: int = Query(10, ge=1, le=RELATED_TERMS_N, description="How many terms to return"),
+    session: AsyncSession = Depends(get_session),
+):
+    terms_objects = await select_related_terms_by_term_id(
+        term_id=term_id, k=k, session=session
+    )
+
+    return [dump_term(terms_object) for terms_object in terms_objects]
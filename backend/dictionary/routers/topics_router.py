@@ -3,6 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from dictionary.database.engine import get_session
+from dictionary.misc.admission import Lane, get_lane
+from dictionary.misc.conditional_get import conditional_get
 from dictionary.database.models import Topics
 from dictionary.database.queries import (
     select_topic_by_name,
@@ -10,8 +12,13 @@ from dictionary.database.queries import (
     select_topic_by_id,
     select_all_topics,
     delete_topic_by_id,
+    select_description_ids,
 )
-from dictionary.views import Topic, TopicsResponse
+from dictionary.nlp.minhash import forget_minhashes
+from dictionary.misc.response_cache import cached_response
+from dictionary.misc.serialization import json_response
+from dictionary.background_tasks.background_related_terms import remove_related_terms
+from dictionary.views import Topic, TopicsResponse, dump_topic
 
 
 router = APIRouter(
@@ -78,7 +85,9 @@ async def change_topic(
     summary="Delete topic",
 )
 async def delete_topic(
-    topic_id: UUID4, session: AsyncSession = Depends(get_session)
+    topic_id: UUID4,
+    session: AsyncSession = Depends(get_session),
+    lane: Lane = Depends(get_lane),
 ):
     topics_object = await select_topic_by_id(topic_id=topic_id, session=session)
 
@@ -87,7 +96,11 @@ async def delete_topic(
             status_code=404,
             detail=f"Topic with id {topic_id} not found",
         )
-    await delete_topic_by_id(topic_id=topic_id, session=session)
+    description_ids = await select_description_ids(topic_id=topic_id, session=session)
+    with lane.admit(tasks=1) as admission:
+        await delete_topic_by_id(topic_id=topic_id, session=session)
+        forget_minhashes(description_ids)
+        admission.spawn(remove_related_terms(description_ids=description_ids))
 
 
 @router.get(
@@ -95,18 +108,14 @@ async def delete_topic(
     status_code=200,
     summary="Get topics",
     response_model=List[TopicsResponse],
+    dependencies=[Depends(conditional_get("topics"))],
 )
+@json_response
+@cached_response("topics")
 async def fetch_topics(session: AsyncSession = Depends(get_session)):
     topics_objects = await select_all_topics(session=session)
 
-    return [
-        TopicsResponse(
-            id=topics_object.id,
-            topic=Topic(name=topics_object.name, info=topics_object.info),
-            created_at=topics_object.created_at,
-        )
-        for topics_object in topics_objects
-    ]
+    return [dump_topic(topics_object) for topics_object in topics_objects]
 
 
 @router.get(
@@ -114,7 +123,10 @@ async def fetch_topics(session: AsyncSession = Depends(get_session)):
     status_code=200,
     summary="Get topic by id",
     response_model=TopicsResponse,
+    dependencies=[Depends(conditional_get("topics"))],
 )
+@json_response
+@cached_response("topics")
 async def fetch_topic_by_id(
     topic_id: UUID4, session: AsyncSession = Depends(get_session)
 ):
@@ -125,11 +137,7 @@ async def fetch_topic_by_id(
             status_code=404, detail=f"Topic with {topic_id=} not found!"
         )
 
-    return TopicsResponse(
-        id=topics_object.id,
-        topic=Topic(name=topics_object.name, info=topics_object.info),
-        created_at=topics_object.created_at,
-    )
+    return dump_topic(topics_object)
 
 
 @router.get(
@@ -137,7 +145,10 @@ async def fetch_topic_by_id(
     status_code=200,
     summary="Get topic by name",
     response_model=TopicsResponse,
+    dependencies=[Depends(conditional_get("topics"))],
 )
+@json_response
+@cached_response("topics")
 async def fetch_topic_by_name(
     topic_name: str, session: AsyncSession = Depends(get_session)
 ):
@@ -148,8 +159,4 @@ async def fetch_topic_by_name(
             status_code=404, detail=f"Topic with {topic_name=} not found!"
         )
 
-    return TopicsResponse(
-        id=topics_object.id,
-        topic=Topic(name=topics_object.name, info=topics_object.info),
-        created_at=topics_object.created_at,
-    )
+    return dump_topic(topics_object)
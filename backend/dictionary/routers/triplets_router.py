@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from dictionary.database.engine import get_session
+from dictionary.misc.conditional_get import conditional_get
 from dictionary.database.models import Triplets
 from dictionary.database.queries import (
     save_triplet,
@@ -13,7 +14,8 @@ from dictionary.database.queries import (
     select_triplet_by_id,
     delete_triplet_by_id,
 )
-from dictionary.views import Triplet, TripletsResponse
+from dictionary.views import Triplet, TripletsResponse, dump_triplet
+from dictionary.misc.serialization import json_response
 from dictionary.nlp.triplets import TripletData
 from dictionary.nlp.languages import Lang
 from dictionary.background_tasks.background_triplets import (
@@ -244,7 +246,9 @@ async def delete_triplet(
     status_code=status.HTTP_200_OK,
     summary="Get triplet by description_id",
     response_model=List[TripletsResponse],
+    dependencies=[Depends(conditional_get("descriptions", "triplets"))],
 )
+@json_response
 async def fetch_triplets_by_description_id(
     description_id: UUID4, session: AsyncSession = Depends(get_session)
 ):
@@ -261,23 +265,4 @@ async def fetch_triplets_by_description_id(
         description_id=description_id, session=session
     )
 
-    return [
-        TripletsResponse(
-            id=triplets_object.id,
-            triplet=Triplet(
-                description_id=triplets_object.description_id,
-                data=TripletData(
-                    position=triplets_object.position,
-                    subject=triplets_object.subject,
-                    subject_type=triplets_object.subject_type,
-                    predicate=triplets_object.predicate,
-                    predicate_type=triplets_object.predicate_type,
-                    object=triplets_object.object,
-                    object_type=triplets_object.object_type,
-                    language=Lang(triplets_object.language),
-                ),
-            ),
-            created_at=triplets_object.created_at,
-        )
-        for triplets_object in triplets_objects
-    ]
+    return [dump_triplet(triplets_object) for triplets_object in triplets_objects]
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, status
+from typing import Dict, Any
+from dictionary.misc.prefork import memory_report
+
+
+router = APIRouter(
+    prefix="/workers",
+    tags=["Workers"],
+)
+
+
+@router.get(
+    "/memory",
+    status_code=status.HTTP_200_OK,
+    summary="Rss, Pss, shared and private memory of the supervisor and every worker",
+    response_model=Dict[str, Any],
+)
+async def fetch_workers_memory():
+    return memory_report()
@@ -1,8 +1,10 @@
-from pydantic import BaseModel, UUID4
-from typing import Optional, Any, Dict
+from pydantic import BaseModel, UUID4, Field
+from typing import Optional, Any, Dict, List
 from datetime import datetime
 from dictionary.nlp.languages import Lang
 from dictionary.nlp.triplets import TripletData
+from dictionary.database.models import Topics, Terms, Descriptions, Triplets, Graphs
+from enum import Enum
 
 
 class Topic(BaseModel):
@@ -53,6 +55,7 @@ class DescriptionsResponse(BaseModel):
     id: UUID4
     description: Description
     created_at: datetime
+    near_duplicates: Optional[List[UUID4]] = None
 
 
 class Triplet(BaseModel):
@@ -79,3 +82,101 @@ class GraphsResponse(BaseModel):
     id: UUID4
     graph: Graph
     created_at: datetime
+
+
+class SearchMode(Enum):
+    Vector = "vector"
+    Hybrid = "hybrid"
+
+
+class SearchQuery(BaseModel):
+    query: str
+    k: int = Field(10, ge=1, le=100)
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchQuery]
+
+
+# Plain-dict twins of the response models above, for routes that serialize
+# rows straight to JSON (misc.serialization.json_response). Keys and nesting
+# must follow the models field for field.
+def dump_topic(topics_object: Topics) -> Dict[str, Any]:
+    return {
+        "id": topics_object.id,
+        "topic": {"name": topics_object.name, "info": topics_object.info},
+        "created_at": topics_object.created_at,
+    }
+
+
+def dump_term(terms_object: Terms) -> Dict[str, Any]:
+    return {
+        "id": terms_object.id,
+        "term": {
+            "topic_id": terms_object.topic_id,
+            "raw_text": terms_object.raw_text,
+            "processed_text": {
+                "cleaned_text": terms_object.cleaned_text,
+                "stemmed_text": terms_object.stemmed_text,
+                "first_letter": terms_object.first_letter,
+            },
+            "language": terms_object.language,
+            "info": terms_object.info,
+        },
+        "created_at": terms_object.created_at,
+    }
+
+
+def dump_description(
+    descriptions_object: Descriptions, near_duplicates: Optional[List[UUID4]] = None
+) -> Dict[str, Any]:
+    return {
+        "id": descriptions_object.id,
+        "description": {
+            "term_id": descriptions_object.term_id,
+            "raw_text": descriptions_object.raw_text,
+            "processed_text": {
+                "cleaned_text": descriptions_object.cleaned_text,
+                "stemmed_text": descriptions_object.stemmed_text,
+            },
+            "language": descriptions_object.language,
+            "info": descriptions_object.info,
+        },
+        "created_at": descriptions_object.created_at,
+        "near_duplicates": near_duplicates or None,
+    }
+
+
+def dump_triplet(triplets_object: Triplets) -> Dict[str, Any]:
+    return {
+        "id": triplets_object.id,
+        "triplet": {
+            "description_id": triplets_object.description_id,
+            "data": {
+                "position": triplets_object.position,
+                "subject": triplets_object.subject,
+                "subject_type": triplets_object.subject_type,
+                "predicate": triplets_object.predicate,
+                "predicate_type": triplets_object.predicate_type,
+                "object": triplets_object.object,
+                "object_type": triplets_object.object_type,
+                "language": triplets_object.language,
+            },
+            "info": None,
+        },
+        "created_at": triplets_object.created_at,
+    }
+
+
+def dump_graph(graphs_object: Graphs) -> Dict[str, Any]:
+    return {
+        "id": graphs_object.id,
+        "graph": {
+            "description_id": graphs_object.description_id,
+            "triplet_count": graphs_object.triplet_count,
+            "graph": graphs_object.graph,
+            "info": graphs_object.info,
+            "language": graphs_object.language,
+        },
+        "created_at": graphs_object.created_at,
+    }
@@ -1,4 +1,5 @@
 from loguru import logger
+import asyncio
 import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
@@ -6,6 +7,22 @@ from fastapi.middleware.cors import CORSMiddleware
 from dictionary.database.models import *
 from dictionary.database.engine import init_db
 from dictionary.misc.utils import check_nltk_resource
+from dictionary.nlp.vector_index import VECTOR_SEARCH_ENGINE
+from dictionary.background_tasks.background_vector_index import (
+    run_vector_index_refresher,
+    run_embedding_changes_pruner,
+)
+from dictionary.misc.response_cache import RESPONSE_CACHE_LISTEN
+from dictionary.misc.compression import CompressionMiddleware
+from dictionary.misc.metrics import MetricsMiddleware
+from dictionary.misc.profiling import ProfilingMiddleware
+from dictionary.background_tasks.background_response_cache import run_change_listener
+from dictionary.background_tasks.background_metrics import run_metrics_flusher
+from dictionary.background_tasks.background_table_versions import run_table_changes_compactor
+from dictionary.background_tasks.background_embedding_versions import (
+    refresh_embedding_versions,
+    run_embedding_version_refresher,
+)
 from dictionary.routers import (
     topics_router,
     terms_router,
@@ -13,6 +30,11 @@ from dictionary.routers import (
     triplets_router,
     graphs_router,
     embeddings_router,
+    cache_router,
+    workers_router,
+    admission_router,
+    metrics_router,
+    profiles_router,
 )
 
 
@@ -23,6 +45,11 @@ routers = [
     triplets_router.router,
     graphs_router.router,
     embeddings_router.router,
+    cache_router.router,
+    workers_router.router,
+    admission_router.router,
+    metrics_router.router,
+    profiles_router.router,
 ]
 
 
@@ -42,8 +69,30 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Database initialized OK")
 
+    await refresh_embedding_versions()
+    version_refresher = asyncio.create_task(run_embedding_version_refresher())
+    metrics_flusher = asyncio.create_task(run_metrics_flusher())
+    table_changes_compactor = asyncio.create_task(run_table_changes_compactor())
+
+    change_listener = None
+    if RESPONSE_CACHE_LISTEN:
+        change_listener = asyncio.create_task(run_change_listener())
+
+    if VECTOR_SEARCH_ENGINE == "memory":
+        logger.info("Starting in-process vector index refresher")
+        refresher = asyncio.create_task(run_vector_index_refresher())
+    else:
+        refresher = asyncio.create_task(run_embedding_changes_pruner())
+
     yield
 
+    version_refresher.cancel()
+    metrics_flusher.cancel()
+    table_changes_compactor.cancel()
+    if change_listener is not None:
+        change_listener.cancel()
+    refresher.cancel()
+
 
 app = FastAPI(
     root_path=os.environ.get("APP_PREFIX", "/"),
@@ -58,6 +107,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+# added last, so it is outermost and the measured time includes compression
+# and profiling
+app.add_middleware(MetricsMiddleware)
 
 for r in routers:
     app.include_router(r)
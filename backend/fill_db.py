@@ -1,16 +1,29 @@
 #!/usr/bin/env python3
 import json
 import sys
+import time
 import argparse
 import requests
-from typing import Optional
+from typing import Optional, List
 
 # --------------------------------------------------------------------------------------------------
 # Usage:
-#   loader.py --json path/to/file.json --topic "Physical Terms" --info "Термины по физике"
+#   loader.py --json path/to/file.json --topic "Physical Terms" --info "Термины по физике" [--batch-size 64]
 # --------------------------------------------------------------------------------------------------
 
 BASE_URL = "http://localhost:8000"  # adjust if your API lives elsewhere
+# the bulk lane keeps this loader's NLP backlog away from interactive users
+HEADERS = {"X-Client-Lane": "bulk"}
+MAX_RETRIES = 20
+
+def post(url: str, payload) -> requests.Response:
+    # the API answers 429 while its NLP backlog is full; wait as told and retry
+    for _ in range(MAX_RETRIES):
+        r = requests.post(url, json=payload, headers=HEADERS)
+        if r.status_code != 429:
+            return r
+        time.sleep(int(r.headers.get("Retry-After", 1)))
+    return r
 
 def load_entries(path: str):
     try:
@@ -24,7 +37,7 @@ def create_topic(name: str, info: Optional[str]) -> str:
     payload = {"name": name}
     if info:
         payload["info"] = info
-    r = requests.post(f"{BASE_URL}/topics", json=payload)
+    r = post(f"{BASE_URL}/topics", payload)
     r.raise_for_status()
     tid = r.json().get("id")
     print(f"→ created topic '{name}' with id {tid}")
@@ -36,7 +49,7 @@ def create_term(topic_id: str, lang: str, raw_text: str) -> Optional[str]:
         "language": lang,
         "raw_text": raw_text,
     }
-    r = requests.post(f"{BASE_URL}/terms", json=payload)
+    r = post(f"{BASE_URL}/terms", payload)
     if not r.ok:
         print(f"[{lang}] term error '{raw_text}': {r.status_code} {r.text}", file=sys.stderr)
         return None
@@ -44,19 +57,42 @@ def create_term(topic_id: str, lang: str, raw_text: str) -> Optional[str]:
 
 def create_description(term_id: str, raw_text: str) -> None:
     payload = {"term_id": term_id, "raw_text": raw_text}
-    r = requests.post(f"{BASE_URL}/descriptions", json=payload)
+    r = post(f"{BASE_URL}/descriptions", payload)
     if not r.ok:
         print(f" desc error for term_id={term_id}: {r.status_code} {r.text}", file=sys.stderr)
 
+def create_descriptions_bulk(pending: List[dict]) -> None:
+    if not pending:
+        return
+    batch = list(pending)
+    pending.clear()
+    r = post(f"{BASE_URL}/descriptions/bulk", batch)
+    if not r.ok:
+        print(f" bulk desc error for {len(batch)} descriptions: {r.status_code} {r.text}", file=sys.stderr)
+        return
+    skipped = len(batch) - len(r.json())
+    if skipped:
+        print(f" {skipped} of {len(batch)} descriptions skipped as duplicates", file=sys.stderr)
+
 def main():
     p = argparse.ArgumentParser(description="Load terms/descriptions from JSON into your API")
     p.add_argument("--json",    required=True, help="Path to JSON file")
     p.add_argument("--topic",   required=True, help="Topic name")
     p.add_argument("--info",    default=None, help="Optional topic info")
+    p.add_argument("--batch-size", type=int, default=64, help="Descriptions per bulk request (1 disables bulk)")
     args = p.parse_args()
 
     entries = load_entries(args.json)
     topic_id = create_topic(args.topic, args.info)
+    pending: List[dict] = []
+
+    def add_description(term_id: str, raw_text: str) -> None:
+        if args.batch_size <= 1:
+            create_description(term_id, raw_text)
+            return
+        pending.append({"term_id": term_id, "raw_text": raw_text})
+        if len(pending) >= args.batch_size:
+            create_descriptions_bulk(pending)
 
     for e in entries:
         # Russian: translation → definition
@@ -65,7 +101,7 @@ def main():
         if ru_term and ru_def:
             tid = create_term(topic_id, "russian", ru_term)
             if tid:
-                create_description(tid, ru_def)
+                add_description(tid, ru_def)
 
         # English: term → definition_translated
         en_term = e.get("term", "").strip()
@@ -73,8 +109,9 @@ def main():
         if en_term and en_def:
             tid = create_term(topic_id, "english", en_term)
             if tid:
-                create_description(tid, en_def)
+                add_description(tid, en_def)
 
+    create_descriptions_bulk(pending)
     print("Done loading", args.json)
 
 if __name__ == "__main__":